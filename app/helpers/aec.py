@@ -0,0 +1,326 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from noisereduce import reduce_noise
+
+from app.helpers.dsp import RingBuffer
+
+
+class IAecEngine(ABC):
+    """
+    Acoustic echo cancellation (AEC) engine.
+
+    An engine is stateful and dedicated to a single call. Frames must be processed in order, one at a time.
+    """
+
+    @abstractmethod
+    def process(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray | None:
+        """
+        Remove the echo of the reference signal from the microphone signal.
+
+        Both signals are float (-1.0 to 1.0) frames of the same size.
+
+        Returns the echo-cancelled signal, or `None` if the microphone signal has been left untouched. The returned array may be reused by the engine, it is only valid until the next call.
+        """
+        pass
+
+
+class NoiseReduceAecEngine(IAecEngine):
+    """
+    Echo reduction by stationary noise reduction.
+
+    The recent bot voice is used as the noise profile, re-estimated on each frame. Expensive, and not a real echo canceller, kept for compatibility.
+    """
+
+    _bot_voice_buffer: RingBuffer
+    _sample_rate: int
+
+    def __init__(
+        self,
+        max_delay_ms: int,
+        sample_rate: int,
+    ):
+        self._sample_rate = sample_rate
+        self._bot_voice_buffer = RingBuffer(int(max_delay_ms / 1000 * sample_rate))
+
+    def process(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray | None:
+        # Update the input buffer with the reference signal
+        self._bot_voice_buffer.write(reference)
+
+        # Reference signal is empty, skip noise reduction
+        if not reference.any():
+            return None
+
+        # Apply noise reduction
+        return reduce_noise(
+            # Input signal
+            sr=self._sample_rate,
+            y=mic,
+            # Quality
+            n_fft=128,
+            # Since the reference signal is already noise-reduced, we can assume it's stationary
+            clip_noise_stationary=False,  # Noise is longer than the signal
+            stationary=True,
+            y_noise=self._bot_voice_buffer.view(),
+            # Output quality
+            prop_decrease=0.75,  # Reduce noise by 75%
+        )
+
+
+class NlmsAecEngine(IAecEngine):
+    """
+    Echo cancellation with a partitioned-block frequency-domain NLMS adaptive filter.
+
+    The echo path is modelled by a FIR filter of `tail_ms`, split in partitions of one frame each. The filter is kept across frames, so it converges once and then only tracks the echo path changes. Each frame costs one FFT of the reference, one inverse FFT for the echo estimate and one FFT of the error, plus a constraint FFT pair on a single partition, in rotation.
+
+    Adaptation is frozen while the reference is silent, and the filter is bypassed once the whole echo tail is silent. All the buffers are allocated once, FFTs write in place.
+
+    See: https://en.wikipedia.org/wiki/Least_mean_squares_filter#Normalized_least_mean_squares_filter_(NLMS)
+    """
+
+    _constraint_index: int
+    _echo_block: np.ndarray
+    _echo_spectrum: np.ndarray
+    _error: np.ndarray
+    _error_block: np.ndarray
+    _error_spectrum: np.ndarray
+    _frame_size: int
+    _impulse: np.ndarray
+    _normalization: np.ndarray
+    _partitions: int
+    _power: np.ndarray
+    _product: np.ndarray
+    _reference_history: RingBuffer
+    _silent_frames: int
+    _spectrums: np.ndarray
+    _spectrums_head: int
+    _step: float
+    _weights: np.ndarray
+
+    def __init__(
+        self,
+        frame_size: int,
+        sample_rate: int,
+        tail_ms: int,
+        step: float = 0.5,
+    ):
+        self._frame_size = frame_size
+        self._step = step
+
+        tail_samples = int(tail_ms / 1000 * sample_rate)
+        self._partitions = max(1, -(-tail_samples // frame_size))  # Ceil division
+        bins = frame_size + 1  # Real FFT of 2 frames
+
+        # Filter state
+        self._constraint_index = 0
+        self._power = np.zeros(bins, dtype=np.float32)
+        self._reference_history = RingBuffer(frame_size * 2)
+        self._silent_frames = self._partitions + 1  # Start bypassed
+        # Reference spectrums are mirrored in a double-sized buffer, so the latest partitions are always a contiguous view, from the newest to the oldest
+        self._spectrums = np.zeros((self._partitions * 2, bins), dtype=np.complex64)
+        self._spectrums_head = 0
+        self._weights = np.zeros((self._partitions, bins), dtype=np.complex64)
+
+        # Scratch buffers
+        self._echo_block = np.zeros(frame_size * 2, dtype=np.float32)
+        self._echo_spectrum = np.zeros(bins, dtype=np.complex64)
+        self._error = np.zeros(frame_size, dtype=np.float32)
+        self._error_block = np.zeros(
+            frame_size * 2, dtype=np.float32
+        )  # First half is kept to zero
+        self._error_spectrum = np.zeros(bins, dtype=np.complex64)
+        self._impulse = np.zeros(frame_size * 2, dtype=np.float32)
+        self._normalization = np.zeros(bins, dtype=np.float32)
+        self._product = np.zeros((self._partitions, bins), dtype=np.complex64)
+
+    def process(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray | None:
+        n = self._frame_size
+        p = self._partitions
+
+        # Bypass the filter once the whole echo tail is silent
+        reference_active = reference.any()
+        if reference_active:
+            self._silent_frames = 0
+        else:
+            self._silent_frames += 1
+        if self._silent_frames > p:
+            return None
+
+        # Push the spectrum of the last two reference frames in the delay line
+        self._reference_history.write(reference)
+        head = self._spectrums_head = (self._spectrums_head - 1) % p
+        np.fft.rfft(self._reference_history.view(), out=self._spectrums[head])
+        self._spectrums[head + p] = self._spectrums[head]
+        spectrums = self._spectrums[head : head + p]
+
+        # Estimate the echo and remove it, overlap-save keeps the last frame only
+        np.multiply(self._weights, spectrums, out=self._product)
+        self._product.sum(axis=0, out=self._echo_spectrum)
+        np.fft.irfft(self._echo_spectrum, out=self._echo_block)
+        np.subtract(mic, self._echo_block[n:], out=self._error)
+
+        # Adapt only while the bot speaks, the filter would learn the user voice otherwise
+        if reference_active:
+            # Smooth the reference power per bin, for the normalization
+            np.abs(spectrums[0], out=self._normalization)
+            self._normalization **= 2
+            self._normalization *= 0.1
+            self._power *= 0.9
+            self._power += self._normalization
+            np.multiply(self._power, p, out=self._normalization)
+            self._normalization += 1e-6
+
+            # Normalized gradient
+            self._error_block[n:] = self._error
+            np.fft.rfft(self._error_block, out=self._error_spectrum)
+            self._error_spectrum /= self._normalization
+            self._error_spectrum *= self._step
+            np.conjugate(spectrums, out=self._product)
+            self._product *= self._error_spectrum
+            self._weights += self._product
+
+            # Constrain one partition to a causal filter, in rotation
+            i = self._constraint_index
+            np.fft.irfft(self._weights[i], out=self._impulse)
+            self._impulse[n:] = 0
+            np.fft.rfft(self._impulse, out=self._weights[i])
+            self._constraint_index = (i + 1) % p
+
+        # Filter is diverging, keep the microphone signal
+        if np.dot(self._error, self._error) > np.dot(mic, mic):
+            return None
+
+        return self._error
+
+
+class ReferenceAligner:
+    """
+    Align the reference signal with the microphone signal, by compensating the echo path delay.
+
+    The bot voice comes back in the microphone after the network, playback and acoustic latency, often longer than the echo canceller tail. The bulk delay is estimated with a phase transform cross-correlation (GCC-PHAT) between the recent microphone and reference signals, re-estimated periodically while the bot speaks. The reference is then delayed accordingly, so the canceller only models the short residual echo path.
+
+    See: https://en.wikipedia.org/wiki/Generalized_cross-correlation
+    """
+
+    _correlation: np.ndarray
+    _cross_spectrum: np.ndarray
+    _delay: int
+    _fft_size: int
+    _frame_size: int
+    _frames_since_estimation: int
+    _interval_frames: int
+    _magnitude: np.ndarray
+    _margin: int
+    _max_delay: int
+    _mic_block: np.ndarray
+    _mic_history: RingBuffer
+    _mic_spectrum: np.ndarray
+    _reference_active: bool
+    _reference_history: RingBuffer
+    _reference_spectrum: np.ndarray
+    _sample_rate: int
+    _window: int
+
+    def __init__(  # noqa: PLR0913
+        self,
+        frame_size: int,
+        interval_ms: int,
+        max_delay_ms: int,
+        sample_rate: int,
+        window_ms: int,
+        margin_ms: int = 5,
+    ):
+        self._frame_size = frame_size
+        self._sample_rate = sample_rate
+
+        self._interval_frames = max(
+            1, int(interval_ms / 1000 * sample_rate) // frame_size
+        )
+        self._margin = int(margin_ms / 1000 * sample_rate)
+        self._max_delay = int(max_delay_ms / 1000 * sample_rate)
+        self._window = max(frame_size, int(window_ms / 1000 * sample_rate))
+
+        # Estimation state
+        self._delay = 0
+        self._frames_since_estimation = 0
+        self._reference_active = False
+        # Reference history is both the delay line and the estimation window
+        self._mic_history = RingBuffer(self._window)
+        self._reference_history = RingBuffer(self._window + self._max_delay)
+
+        # Scratch buffers, the FFT is large enough to avoid circular correlation
+        self._fft_size = 1 << (self._window * 2 + self._max_delay - 1).bit_length()
+        bins = self._fft_size // 2 + 1
+        self._correlation = np.zeros(self._fft_size, dtype=np.float32)
+        self._cross_spectrum = np.zeros(bins, dtype=np.complex64)
+        self._magnitude = np.zeros(bins, dtype=np.float32)
+        self._mic_block = np.zeros(self._fft_size, dtype=np.float32)
+        self._mic_spectrum = np.zeros(bins, dtype=np.complex64)
+        self._reference_spectrum = np.zeros(bins, dtype=np.complex64)
+
+    @property
+    def delay_ms(self) -> float:
+        """
+        Delay currently applied to the reference, in milliseconds.
+        """
+        return self._delay / self._sample_rate * 1000
+
+    def align(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """
+        Push a frame of both signals, and get the reference frame matching the microphone frame.
+
+        The returned array is a view on the history, it is only valid until the next call.
+        """
+        self._mic_history.write(mic)
+        self._reference_history.write(reference)
+        self._reference_active = self._reference_active or bool(reference.any())
+
+        # Re-estimate the delay periodically, only if the bot spoke in the meantime
+        self._frames_since_estimation += 1
+        if (
+            self._frames_since_estimation >= self._interval_frames
+            and self._reference_active
+        ):
+            self._frames_since_estimation = 0
+            self._reference_active = False
+            delay = self._estimate_delay()
+            if delay is not None:
+                self._delay = delay
+
+        # Read the reference frame played the delay ago
+        return self._reference_history.view(size=self._delay + self._frame_size)[
+            : self._frame_size
+        ]
+
+    def _estimate_delay(self) -> int | None:
+        """
+        Estimate the echo path delay, in samples.
+
+        Returns the delay to apply to the reference, or `None` if no echo can be reliably detected.
+        """
+        # Reference covers the microphone window, plus the maximum delay before it
+        np.fft.rfft(
+            self._reference_history.view(),
+            n=self._fft_size,
+            out=self._reference_spectrum,
+        )
+        self._mic_block[: self._window] = self._mic_history.view()
+        np.fft.rfft(self._mic_block, out=self._mic_spectrum)
+
+        # Phase transform, whiten the cross spectrum so the peak is sharp whatever the voice spectrum
+        np.conjugate(self._mic_spectrum, out=self._cross_spectrum)
+        self._cross_spectrum *= self._reference_spectrum
+        np.abs(self._cross_spectrum, out=self._magnitude)
+        self._magnitude += 1e-9
+        self._cross_spectrum /= self._magnitude
+        np.fft.irfft(self._cross_spectrum, out=self._correlation)
+
+        # Lag k in the correlation is a delay of "max delay - k"
+        lags = self._correlation[: self._max_delay + 1]
+        peak = int(np.argmax(lags))
+        # Peak must clearly stand out, the user may be talking over the bot
+        if lags[peak] < 5 * np.mean(np.abs(lags)):
+            return None
+
+        # Keep a small margin, the canceller only models causal echo paths
+        return max(0, self._max_delay - peak - self._margin)
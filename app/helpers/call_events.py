@@ -30,11 +30,14 @@ from app.helpers.call_utils import (
     handle_realtime_tts,
     handle_recognize_ivr,
     start_audio_streaming,
+    stream_audio_format,
 )
+from app.helpers.channel import AudioChannel
 from app.helpers.config import CONFIG
 from app.helpers.features import recognition_retry_max, recording_enabled
 from app.helpers.llm_worker import completion_sync
 from app.helpers.logging import logger
+from app.helpers.media import PlayoutMark
 from app.helpers.monitoring import SpanAttributeEnum, tracer
 from app.models.call import CallStateModel
 from app.models.message import (
@@ -67,6 +70,7 @@ async def on_new_call(
 
     streaming_options = MediaStreamingOptions(
         audio_channel_type=MediaStreamingAudioChannelType.UNMIXED,
+        audio_format=stream_audio_format(),
         content_type=MediaStreamingContentType.AUDIO,
         enable_bidirectional=True,
         start_media_streaming=False,
@@ -168,8 +172,8 @@ async def on_call_disconnected(
 
 @tracer.start_as_current_span("on_audio_connected")
 async def on_audio_connected(  # noqa: PLR0913
-    audio_in: asyncio.Queue[bytes],
-    audio_out: asyncio.Queue[bytes | bool],
+    audio_in: AudioChannel[bytes],
+    audio_out: AudioChannel[bytes | bool | PlayoutMark],
     audio_sample_rate: int,
     call: CallStateModel,
     client: CallAutomationClient,
@@ -180,7 +184,7 @@ async def on_audio_connected(  # noqa: PLR0913
     """
     Callback for when the audio stream is connected.
 
-    Starts the real-time conversation with the LLM.
+    Starts the real-time conversation with the LLM. Audio is exchanged at `audio_sample_rate`, the format announced by the stream.
     """
     await load_llm_chat(
         audio_in=audio_in,
@@ -271,6 +275,7 @@ async def on_realtime_recognize_error(
 
     # Play a timeout prompt
     await handle_realtime_tts(
+        cache=True,
         call=call,
         scheduler=scheduler,
         store=False,
@@ -288,17 +293,25 @@ async def hangup_realtime_now(
 ) -> None:
     """
     Hangup the call and play a goodbye.
+
+    The call is hung up once the goodbye is played, at most after the playout timeout.
     """
     # Play TTS
-    await handle_realtime_tts(
+    mark = await handle_realtime_tts(
+        cache=True,
         call=call,
         scheduler=scheduler,
         store=False,  # Do not store timeout prompt as it perturbs the LLM and makes it hallucinate
         text=await CONFIG.prompts.tts.goodbye(call),
         tts_client=tts_client,
     )
-    # TODO: Hack to avoid the call to close before TTS is played
-    await asyncio.sleep(10)
+    # Wait for the goodbye to be played, hanging up would cut it
+    if not await mark.wait(CONFIG.audio.pacer.playout_timeout_sec):
+        logger.warning(
+            "Goodbye %s not played after %i sec, hanging up",
+            mark.id,
+            CONFIG.audio.pacer.playout_timeout_sec,
+        )
     # Hangup
     await hangup_now(
         call=call,
@@ -1,8 +1,10 @@
 import asyncio
 import time
-from collections.abc import Awaitable, Callable
-from datetime import UTC, datetime, timedelta
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
 from functools import wraps
+from uuid import uuid4
 
 from aiojobs import Scheduler
 from azure.cognitiveservices.speech import (
@@ -10,20 +12,28 @@ from azure.cognitiveservices.speech import (
 )
 from azure.communication.callautomation.aio import CallAutomationClient
 from openai import APIError
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
 
 from app.helpers.call_utils import (
     AECStream,
+    SentenceSegmenter,
     SttClient,
-    handle_media,
+    TtsStream,
     handle_realtime_tts,
-    tts_sentence_split,
+    tts_cancel,
+    tts_first_audio_watch,
+    tts_turn_start,
     use_tts_client,
 )
+from app.helpers.channel import AudioChannel
 from app.helpers.config import CONFIG
+from app.helpers.config_models.audio import TtsModeEnum
 from app.helpers.features import (
     answer_hard_timeout_sec,
     answer_soft_timeout_sec,
+    llm_continuation_max,
     phone_silence_timeout_sec,
+    recognition_speculation_stable_ms,
     vad_cutoff_timeout_ms,
     vad_silence_timeout_ms,
 )
@@ -34,12 +44,17 @@ from app.helpers.llm_worker import (
     completion_stream,
 )
 from app.helpers.logging import logger
+from app.helpers.media import PlayoutMark
 from app.helpers.monitoring import (
     SpanAttributeEnum,
     call_cutoff_latency,
+    call_llm_continuations,
+    counter_add,
     gauge_set,
     tracer,
 )
+from app.helpers.speculation import Speculation, Speculator
+from app.helpers.turn import AnswerSupervisor, TurnTaking
 from app.models.call import CallStateModel
 from app.models.message import (
     ActionEnum as MessageAction,
@@ -56,8 +71,8 @@ _db = CONFIG.database.instance()
 # TODO: Refacto, this function is too long
 @tracer.start_as_current_span("call_load_llm_chat")
 async def load_llm_chat(  # noqa: PLR0913
-    audio_in: asyncio.Queue[bytes],
-    audio_out: asyncio.Queue[bytes | bool],
+    audio_in: AudioChannel[bytes],
+    audio_out: AudioChannel[bytes | bool | PlayoutMark],
     audio_sample_rate: int,
     automation_client: CallAutomationClient,
     call: CallStateModel,
@@ -66,12 +81,14 @@ async def load_llm_chat(  # noqa: PLR0913
     training_callback: Callable[[CallStateModel], Awaitable[None]],
 ) -> None:
     # Init language recognition
-    audio_tts: asyncio.Queue[bytes] = asyncio.Queue()
+    audio_tts: AudioChannel[bytes | PlayoutMark] = CONFIG.audio.channel_tts.instance(
+        name="tts"
+    )
 
     async with (
         SttClient(
             call=call,
-            sample_rate=audio_sample_rate,
+            sample_rate=CONFIG.audio.sample_rate,
             scheduler=scheduler,
         ) as stt_client,
         use_tts_client(
@@ -82,12 +99,24 @@ async def load_llm_chat(  # noqa: PLR0913
             in_raw_queue=audio_in,
             in_reference_queue=audio_tts,
             out_queue=audio_out,
-            sample_rate=audio_sample_rate,
+            sample_rate=CONFIG.audio.sample_rate,
             scheduler=scheduler,
+            stream_sample_rate=audio_sample_rate,
+            tts_sample_rate=CONFIG.audio.tts_sample_rate,
         ) as aec,
+        # Speculate the answer on stable partial recognitions, if enabled
+        _use_speculator(
+            automation_client=automation_client,
+            call=call,
+            post_callback=post_callback,
+            scheduler=scheduler,
+            stt_client=stt_client,
+            tts_client=tts_client,
+        ) as speculator,
     ):
         # Build scheduler
         last_chat: asyncio.Task | None = None
+        last_turn: str | None = None
 
         async def _timeout_callback() -> None:
             """
@@ -119,13 +148,16 @@ async def load_llm_chat(  # noqa: PLR0913
             if last_chat:
                 last_chat.cancel()
 
-            # Stop TTS task
+            # Drop the speech of the previous chat not sent yet, the prompts out of the chat are kept
+            if last_turn:
+                tts_cancel(tts_client, last_turn)
+
+            # Stop TTS task and loading sound
+            aec.loading_stop()
             tts_client.stop_speaking_async()
 
-            # Clear the out buffer
-            while not audio_out.empty():
-                audio_out.get_nowait()
-                audio_out.task_done()
+            # Clear the buffers, the speech already synthesized is stale
+            aec.flush()
 
             # Send a stop signal
             await audio_out.put(False)
@@ -138,6 +170,7 @@ async def load_llm_chat(  # noqa: PLR0913
 
         async def _commit_answer(
             wait: bool,
+            speculation: Speculation | None = None,
             tool_blacklist: set[str] = set(),
         ) -> None:
             """
@@ -146,16 +179,20 @@ async def load_llm_chat(  # noqa: PLR0913
             Start the chat task and wait for its response if needed. Job is stored in `last_response` shared variable.
             """
             # Start chat task
-            nonlocal last_chat
+            nonlocal last_chat, last_turn
+            last_turn = uuid4().hex
             last_chat = asyncio.create_task(
                 _continue_chat(
+                    aec=aec,
                     call=call,
                     client=automation_client,
                     post_callback=post_callback,
                     scheduler=scheduler,
+                    speculation=speculation,
                     tool_blacklist=tool_blacklist,
                     training_callback=training_callback,
                     tts_client=tts_client,
+                    turn=last_turn,
                 )
             )
 
@@ -163,11 +200,37 @@ async def load_llm_chat(  # noqa: PLR0913
             if wait:
                 await last_chat
 
+        async def _commit_recognition(stt_text: str) -> None:
+            """
+            Store the recognition, then process the response.
+            """
+            # Add it to the call history and update last interaction
+            logger.info("Voice stored: %s", stt_text)
+            async with _db.call_transac(
+                call=call,
+                scheduler=scheduler,
+            ):
+                call.last_interaction_at = datetime.now(UTC)
+                call.messages.append(
+                    MessageModel(
+                        content=stt_text,
+                        persona=MessagePersonaEnum.HUMAN,
+                    )
+                )
+
+            # Process the response and wait for latency metrics, from the speculated answer if it matches
+            await _commit_answer(
+                speculation=speculator.take(call) if speculator else None,
+                wait=False,
+            )
+
         async def _response_callback(_retry: bool = False) -> None:
             """
             Triggered when the audio buffer needs to be processed.
 
             If the recognition is empty, retry the recognition once. Otherwise, process the response.
+
+            Cancelled if the user speaks again, until the recognition is committed.
             """
             # Report the answer latency
             aec.answer_start()
@@ -187,27 +250,14 @@ async def load_llm_chat(  # noqa: PLR0913
             # Stop any previous response, but keep the metrics
             await _stop_callback()
 
-            # Add it to the call history and update last interaction
-            logger.info("Voice stored: %s", stt_text)
-            async with _db.call_transac(
-                call=call,
-                scheduler=scheduler,
-            ):
-                call.last_interaction_at = datetime.now(UTC)
-                call.messages.append(
-                    MessageModel(
-                        content=stt_text,
-                        persona=MessagePersonaEnum.HUMAN,
-                    )
-                )
-
-            # Process the response and wait for latency metrics
-            await _commit_answer(wait=False)
+            # Commit the recognition, once started it is not cancelled by the user speaking again
+            await asyncio.shield(_commit_recognition(stt_text))
 
         # First call
         if len(call.messages) <= 1:
             # Welcome with a pre-recorded message
             await handle_realtime_tts(
+                cache=True,
                 call=call,
                 tts_client=tts_client,
                 scheduler=scheduler,
@@ -232,22 +282,90 @@ async def load_llm_chat(  # noqa: PLR0913
         )
 
 
-# TODO: Refacto, this function is too long (and remove PLR0912/PLR0915 ignore)
+@asynccontextmanager
+async def _use_speculator(  # noqa: PLR0913
+    automation_client: CallAutomationClient,
+    call: CallStateModel,
+    post_callback: Callable[[CallStateModel], Awaitable[None]],
+    scheduler: Scheduler,
+    stt_client: SttClient,
+    tts_client: SpeechSynthesizer,
+) -> AsyncGenerator[Speculator | None, None]:
+    """
+    Use a speculator for the call, fed by the partial recognitions.
+
+    Speculated answers are streamed with the tools described but never executed.
+
+    Yields None if speculation is disabled. The speculator is closed once the context is exited.
+    """
+    stable_ms = await recognition_speculation_stable_ms()
+    if not stable_ms:
+        yield None
+        return
+
+    def _speculative_stream(
+        speculative_call: CallStateModel,
+    ) -> AsyncGenerator[ChoiceDelta, None]:
+        """
+        Stream the answer of a speculated user turn.
+        """
+
+        async def _tts_callback(_: str) -> None:
+            pass
+
+        return _completion_stream(
+            call=speculative_call,
+            plugins=DefaultPlugin(
+                call=speculative_call,
+                client=automation_client,
+                post_callback=post_callback,
+                scheduler=scheduler,
+                tts_callback=_tts_callback,
+                tts_client=tts_client,
+            ),
+            tool_blacklist=set(),
+            use_tools=True,
+        )
+
+    speculator = Speculator(
+        call=call,
+        stable_ms=stable_ms,
+        stream=_speculative_stream,
+        wheel=CONFIG.audio.timer.instance(),
+    )
+    stt_client.transcript_callback = speculator.on_transcript
+
+    # Return
+    try:
+        yield speculator
+
+    # Cancel the timer and the running speculation
+    finally:
+        speculator.close()
+
+
 @tracer.start_as_current_span("call_continue_chat")
-async def _continue_chat(  # noqa: PLR0915, PLR0913
+async def _continue_chat(  # noqa: PLR0913
+    aec: AECStream,
     call: CallStateModel,
     client: CallAutomationClient,
     post_callback: Callable[[CallStateModel], Awaitable[None]],
     scheduler: Scheduler,
     training_callback: Callable[[CallStateModel], Awaitable[None]],
     tts_client: SpeechSynthesizer,
+    speculation: Speculation | None = None,
     tool_blacklist: set[str] = set(),
+    turn: str | None = None,
     _iterations_remaining: int = 3,
 ) -> CallStateModel:
     """
     Handle the intelligence of the call, including: LLM chat, TTS, and media play.
 
-    Play the loading sound while waiting for the intelligence to be processed. If the intelligence is not processed after few secs, play the timeout sound. If the intelligence is not processed after more secs, stop the intelligence processing and play the error sound.
+    Each iteration answers with the LLM, then the chat continues with a new iteration, up to `_iterations_remaining`, after an error (retry) or when tools were called. The iterations run in a loop, each one starting as soon as the previous is done.
+
+    If `speculation` is set, the completion already started ahead is used for the first iteration, instead of starting a new one. Retries and tools iterations always start a new one.
+
+    If `turn` is set, the speech of the chat belongs to it, to be cancelled on barge-in.
 
     Returns the updated call model.
     """
@@ -255,6 +373,10 @@ async def _continue_chat(  # noqa: PLR0915, PLR0913
     SpanAttributeEnum.CALL_CHANNEL.attribute("voice")
     SpanAttributeEnum.CALL_MESSAGE.attribute(call.messages[-1].content)
 
+    # Speech sent from this task and its children belongs to the turn
+    if turn:
+        tts_turn_start(turn)
+
     # Reset recognition retry counter
     async with _db.call_transac(
         call=call,
@@ -262,9 +384,91 @@ async def _continue_chat(  # noqa: PLR0915, PLR0913
     ):
         call.recognition_retry = 0
 
+    while True:
+        is_error, continue_chat, call = await _chat_iteration(
+            aec=aec,
+            call=call,
+            client=client,
+            post_callback=post_callback,
+            scheduler=scheduler,
+            speculation=speculation,
+            tool_blacklist=tool_blacklist,
+            training_callback=training_callback,
+            tts_client=tts_client,
+            use_tools=_iterations_remaining > 0,
+        )
+        # Speculation only applies to the first iteration
+        speculation = None
+
+        # Error during chat
+        if is_error:
+            # Maximum retries reached
+            if not continue_chat or _iterations_remaining < 1:
+                logger.warning("Maximum retries reached, stopping chat")
+                content = await CONFIG.prompts.tts.error(call)
+                # Speak the error
+                await handle_realtime_tts(
+                    cache=True,
+                    call=call,
+                    scheduler=scheduler,
+                    text=content,
+                    tts_client=tts_client,
+                )
+                # Never store the error message in the call history, it has caused hallucinations in the LLM
+                break
+
+            # Retry chat after an error
+            logger.info("Retrying chat, %s remaining", _iterations_remaining - 1)
+
+        # Contiue chat (like for tools)
+        elif continue_chat and _iterations_remaining > 0:
+            logger.info("Continuing chat, %s remaining", _iterations_remaining - 1)
+
+        # End chat
+        else:
+            break
+
+        _iterations_remaining -= 1
+
+    return call
+
+
+@tracer.start_as_current_span("call_chat_iteration")
+async def _chat_iteration(  # noqa: PLR0913
+    aec: AECStream,
+    call: CallStateModel,
+    client: CallAutomationClient,
+    post_callback: Callable[[CallStateModel], Awaitable[None]],
+    scheduler: Scheduler,
+    speculation: Speculation | None,
+    tool_blacklist: set[str],
+    training_callback: Callable[[CallStateModel], Awaitable[None]],
+    tts_client: SpeechSynthesizer,
+    use_tools: bool,
+) -> tuple[bool, bool, CallStateModel]:
+    """
+    Answer once with the LLM, supervising the answer with the timeouts and the loading sound.
+
+    Play the loading sound, in the media stream, while waiting for the intelligence to be processed. If the intelligence is not processed after few secs, play the timeout sound. If the intelligence is not processed after more secs, stop the intelligence processing.
+
+    Returns a tuple with the error status, if the chat should continue, and the updated call model.
+    """
     # By default, play the loading sound
     play_loading_sound = True
 
+    # Stream the answer to the synthesizer, the text stream does not support the prosody rate
+    tts_stream = (
+        TtsStream(
+            call=call,
+            scheduler=scheduler,
+            tts_client=tts_client,
+        )
+        if CONFIG.audio.tts_mode == TtsModeEnum.STREAM
+        and call.initiate.prosody_rate == 1
+        else None
+    )
+    tts_first_audio_watch(tts_client)
+
     async def _tts_callback(text: str, style: MessageStyleEnum) -> None:
         """
         Send back the TTS to the user.
@@ -282,6 +486,21 @@ async def _continue_chat(  # noqa: PLR0915, PLR0913
             tts_client=tts_client,
         )
 
+    def _speaking() -> bool:
+        # For first streamed TTS, disable loading sound
+        return not play_loading_sound or bool(tts_stream and tts_stream.started)
+
+    async def _soft_timeout_callback() -> None:
+        # Never store the error message in the call history, it has caused hallucinations in the LLM
+        await handle_realtime_tts(
+            cache=True,
+            call=call,
+            scheduler=scheduler,
+            store=False,
+            text=await CONFIG.prompts.tts.timeout_loading(call),
+            tts_client=tts_client,
+        )
+
     # Chat
     chat_task = asyncio.create_task(
         _generate_chat_completion(
@@ -289,140 +508,49 @@ async def _continue_chat(  # noqa: PLR0915, PLR0913
             client=client,
             post_callback=post_callback,
             scheduler=scheduler,
+            speculation=speculation,
             tool_blacklist=tool_blacklist,
             tts_callback=_tts_callback,
             tts_client=tts_client,
-            use_tools=_iterations_remaining > 0,
+            tts_stream=tts_stream,
+            use_tools=use_tools,
         )
     )
 
-    # Loading
-    def _loading_task() -> asyncio.Task:
-        return asyncio.create_task(asyncio.sleep(loading_timer))
-
-    loading_timer = 5  # Play loading sound every 5 secs
-    loading_task = _loading_task()
-
-    # Timeouts
-    soft_timeout_triggered = False
-    soft_timeout_task = asyncio.create_task(
-        asyncio.sleep(await answer_soft_timeout_sec())
+    # Play loading sound after 5 secs, then restart it every 5 secs if stopped
+    supervisor = AnswerSupervisor(
+        hard_timeout_sec=await answer_hard_timeout_sec(),
+        loading_callback=aec.loading_start,
+        loading_sec=5,
+        soft_timeout_callback=_soft_timeout_callback,
+        soft_timeout_sec=await answer_soft_timeout_sec(),
+        speaking=_speaking,
     )
-    hard_timeout_task = asyncio.create_task(
-        asyncio.sleep(await answer_hard_timeout_sec())
-    )
-
-    def _clear_tasks() -> None:
-        chat_task.cancel()
-        hard_timeout_task.cancel()
-        loading_task.cancel()
-        soft_timeout_task.cancel()
 
     is_error = True
     continue_chat = True
     try:
-        while True:
-            # logger.debug("Chat task status: %s", chat_task.done())
-
-            # Break when chat coroutine is done
-            if chat_task.done():
-                # Clean up
-                _clear_tasks()
-                # Get result
-                is_error, continue_chat, call = (
-                    chat_task.result()
-                )  # Store updated chat model
-                await training_callback(call)  # Trigger trainings generation
-                break
-
-            # Break when hard timeout is reached
-            if hard_timeout_task.done():
-                logger.warning(
-                    "Hard timeout of %ss reached",
-                    await answer_hard_timeout_sec(),
-                )
-                # Clean up
-                _clear_tasks()
-                break
-
-            # Catch timeout if async loading is not started
-            if play_loading_sound:
-                # Speak when soft timeout is reached
-                if soft_timeout_task.done() and not soft_timeout_triggered:
-                    logger.warning(
-                        "Soft timeout of %ss reached",
-                        await answer_soft_timeout_sec(),
-                    )
-                    soft_timeout_triggered = True
-                    # Never store the error message in the call history, it has caused hallucinations in the LLM
-                    await handle_realtime_tts(
-                        call=call,
-                        scheduler=scheduler,
-                        store=False,
-                        text=await CONFIG.prompts.tts.timeout_loading(call),
-                        tts_client=tts_client,
-                    )
-
-                # Do not play timeout prompt plus loading, it can be frustrating for the user
-                elif loading_task.done():
-                    loading_task = _loading_task()
-                    await scheduler.spawn(
-                        handle_media(
-                            call=call,
-                            client=client,
-                            sound_url=CONFIG.prompts.sounds.loading(),
-                        )
-                    )
-
-            # Wait to not block the event loop for other requests
-            await asyncio.sleep(1)
+        # Break when chat coroutine is done, or when hard timeout is reached
+        if await supervisor.wait(chat_task):
+            # Get result
+            is_error, continue_chat, call = (
+                chat_task.result()
+            )  # Store updated chat model
+            await training_callback(call)  # Trigger trainings generation
 
     except Exception:
         # TODO: Remove last message
         logger.exception("Error loading intelligence")
 
-    # Error during chat
-    if is_error:
-        # Maximum retries reached
-        if not continue_chat or _iterations_remaining < 1:
-            logger.warning("Maximum retries reached, stopping chat")
-            content = await CONFIG.prompts.tts.error(call)
-            # Speak the error
-            await _tts_callback(content, MessageStyleEnum.NONE)
-            # Never store the error message in the call history, it has caused hallucinations in the LLM
-
-        # Retry chat after an error
-        else:
-            logger.info("Retrying chat, %s remaining", _iterations_remaining - 1)
-            return await _continue_chat(
-                call=call,
-                client=client,
-                post_callback=post_callback,
-                scheduler=scheduler,
-                tool_blacklist=tool_blacklist,
-                training_callback=training_callback,
-                tts_client=tts_client,
-                _iterations_remaining=_iterations_remaining - 1,
-            )
-
-    # Contiue chat
-    elif continue_chat and _iterations_remaining > 0:
-        logger.info("Continuing chat, %s remaining", _iterations_remaining - 1)
-        return await _continue_chat(
-            call=call,
-            client=client,
-            post_callback=post_callback,
-            scheduler=scheduler,
-            tool_blacklist=tool_blacklist,
-            training_callback=training_callback,
-            tts_client=tts_client,
-            _iterations_remaining=_iterations_remaining - 1,
-        )  # Recursive chat (like for for retry or tools)
-
-        # End chat
-        # TODO: Re-implement
+    finally:
+        # Clean up
+        aec.loading_stop()
+        chat_task.cancel()
+        # Release the synthesizer, the chat may have been cancelled while streaming
+        if tts_stream:
+            tts_stream.close()
 
-    return call
+    return is_error, continue_chat, call
 
 
 # TODO: Refacto, this function is too long
@@ -432,9 +560,11 @@ async def _generate_chat_completion(  # noqa: PLR0913, PLR0911, PLR0912, PLR0915
     client: CallAutomationClient,
     post_callback: Callable[[CallStateModel], Awaitable[None]],
     scheduler: Scheduler,
+    speculation: Speculation | None,
     tool_blacklist: set[str],
     tts_callback: Callable[[str, MessageStyleEnum], Awaitable[None]],
     tts_client: SpeechSynthesizer,
+    tts_stream: TtsStream | None,
     use_tools: bool,
 ) -> tuple[bool, bool, CallStateModel]:
     """
@@ -444,6 +574,9 @@ async def _generate_chat_completion(  # noqa: PLR0913, PLR0911, PLR0912, PLR0915
 
     - The chat with the LLM model (incl system prompts, tools, and user callback)
     - Retry as possible if the LLM model fails to return a response
+    - Resume the answer where it stopped if cut off by the maximum tokens, the sentences already spoken are not generated nor synthesized again; then, or if tools were being called, the chat is retried
+
+    If `tts_stream` is set, the answer is streamed to it as generated, otherwise each sentence is sent to `tts_callback`. If `speculation` is set, its completion is used.
 
     Returns a tuple with:
 
@@ -453,28 +586,14 @@ async def _generate_chat_completion(  # noqa: PLR0913, PLR0911, PLR0912, PLR0915
     """
     logger.debug("Running LLM chat")
     content_full = ""
+    continuation_max = await llm_continuation_max()
+    history = call.messages.copy()  # Spoken sentences are stored as generated
 
     async def _plugin_tts_callback(text: str) -> None:
         nonlocal content_full
         content_full += f" {text}"
         await tts_callback(text, MessageStyleEnum.NONE)
 
-    async def _content_callback(buffer: str) -> None:
-        # Remove tool calls from buffer content and detect style
-        style, local_content = extract_message_style(buffer)
-        await tts_callback(local_content, style)
-
-    # Build RAG
-    trainings = await call.trainings()
-    logger.info("Enhancing LLM chat with %s trainings", len(trainings))
-    # logger.debug("Trainings: %s", trainings)
-
-    # System prompts
-    system = CONFIG.prompts.llm.chat_system(
-        call=call,
-        trainings=trainings,
-    )
-
     # Build plugins
     plugins = DefaultPlugin(
         call=call,
@@ -485,66 +604,87 @@ async def _generate_chat_completion(  # noqa: PLR0913, PLR0911, PLR0912, PLR0915
         tts_client=tts_client,
     )
 
-    tools = []
-    if not use_tools:
-        logger.warning("Tools disabled for this chat")
-    else:
-        tools = await plugins.to_openai(frozenset(tool_blacklist))
-        # logger.debug("Tools: %s", tools)
-
-    # Execute LLM inference
+    # Execute LLM inference, or follow the one started ahead
+    continuations = 0
     maximum_tokens_reached = False
-    content_buffer_pointer = 0
+    segmenter = SentenceSegmenter()
     tool_calls_buffer: dict[int, MessageToolModel] = {}
-    try:
-        async for delta in completion_stream(
-            max_tokens=160,  # Lowest possible value for 90% of the cases, if not sufficient, retry will be triggered, 100 tokens ~= 75 words, 20 words ~= 1 sentence, 6 sentences ~= 160 tokens
-            messages=call.messages,
-            system=system,
-            tools=tools,
-        ):
-            if not delta.content:
-                for piece in delta.tool_calls or []:
-                    tool_calls_buffer[piece.index] = tool_calls_buffer.get(
-                        piece.index, MessageToolModel()
-                    )
-                    tool_calls_buffer[piece.index] += piece
-            else:
-                # Store whole content
-                content_full += delta.content
-                for sentence, length in tts_sentence_split(
-                    content_full[content_buffer_pointer:], False
-                ):
-                    content_buffer_pointer += length
-                    await _content_callback(sentence)
-
-    # Retry on maximum tokens reached
-    except MaximumTokensReachedError:
-        logger.warning("Maximum tokens reached for this completion, retry asked")
-        maximum_tokens_reached = True
-    # Retry on API error
-    except APIError as e:
-        logger.warning("OpenAI API call error: %s", e)
-        return True, True, call  # Error, retry
-    # Last user message is trash, remove it
-    except SafetyCheckError as e:
-        logger.warning("Safety Check error: %s", e)
-        # Remove last user message
-        if last_message := next(
-            (
-                call
-                for call in reversed(call.messages)
-                if call.persona == MessagePersonaEnum.HUMAN
-                and call.action in [MessageAction.SMS, MessageAction.TALK]
-            ),
-            None,
-        ):
-            call.messages.remove(last_message)
-        return True, False, call  # Error, no retry
+    while True:
+        try:
+            async for delta in _answer_stream(
+                call=call,
+                content=content_full if continuations else None,
+                history=history,
+                plugins=plugins,
+                speculation=speculation,
+                tool_blacklist=tool_blacklist,
+                use_tools=use_tools,
+            ):
+                if not delta.content:
+                    for piece in delta.tool_calls or []:
+                        tool_calls_buffer[piece.index] = tool_calls_buffer.get(
+                            piece.index, MessageToolModel()
+                        )
+                        tool_calls_buffer[piece.index] += piece
+                else:
+                    # Store whole content
+                    content_full += delta.content
+                    # Stream the content as generated
+                    if tts_stream:
+                        await tts_stream.write(delta.content)
+                        continue
+                    for style, sentence in segmenter.write(delta.content):
+                        await tts_callback(sentence, style)
+
+        # Resume on maximum tokens reached, the unfinished sentence stays in the buffers
+        except MaximumTokensReachedError:
+            resume = (
+                bool(content_full)
+                and not tool_calls_buffer
+                and continuations < continuation_max
+            )
+            counter_add(
+                attributes={"llm.continuation": "resume" if resume else "restart"},
+                metric=call_llm_continuations,
+                value=1,
+            )
+            if resume:
+                continuations += 1
+                logger.info(
+                    "Maximum tokens reached for this completion, resuming (%s/%s)",
+                    continuations,
+                    continuation_max,
+                )
+                continue
+            logger.warning("Maximum tokens reached for this completion, retry asked")
+            maximum_tokens_reached = True
+        # Retry on API error
+        except APIError as e:
+            logger.warning("OpenAI API call error: %s", e)
+            return True, True, call  # Error, retry
+        # Last user message is trash, remove it
+        except SafetyCheckError as e:
+            logger.warning("Safety Check error: %s", e)
+            # Remove last user message
+            if last_message := next(
+                (
+                    call
+                    for call in reversed(call.messages)
+                    if call.persona == MessagePersonaEnum.HUMAN
+                    and call.action in [MessageAction.SMS, MessageAction.TALK]
+                ),
+                None,
+            ):
+                call.messages.remove(last_message)
+            return True, False, call  # Error, no retry
+        break
 
     # Flush the remaining buffer
-    if content_buffer_pointer < len(content_full):
-        await _content_callback(content_full[content_buffer_pointer:])
+    if tts_stream:
+        await tts_stream.flush()
+    else:
+        for style, sentence in segmenter.flush():
+            await tts_callback(sentence, style)
 
     # Convert tool calls buffer
     tool_calls = [tool_call for _, tool_call in tool_calls_buffer.items()]
@@ -611,7 +751,88 @@ async def _generate_chat_completion(  # noqa: PLR0913, PLR0911, PLR0912, PLR0915
     return False, False, call
 
 
-# TODO: Refacto and simplify
+def _answer_stream(  # noqa: PLR0913
+    call: CallStateModel,
+    content: str | None,
+    history: list[MessageModel],
+    plugins: DefaultPlugin,
+    speculation: Speculation | None,
+    tool_blacklist: set[str],
+    use_tools: bool,
+) -> AsyncGenerator[ChoiceDelta, None]:
+    """
+    Stream the answer, from the completion started ahead if any, or continue it.
+
+    If `content` is set, it is the answer cut off by the maximum tokens, the LLM continues it after `history`, the messages before the answer. Otherwise, the answer starts on the call messages.
+    """
+    if content is None:
+        if speculation:
+            return speculation.deltas()
+        return _completion_stream(
+            call=call,
+            plugins=plugins,
+            tool_blacklist=tool_blacklist,
+            use_tools=use_tools,
+        )
+    style, content = extract_message_style(content)
+    return _completion_stream(
+        call=call,
+        continuation=True,
+        messages=[
+            *history,
+            MessageModel(
+                content=content,
+                persona=MessagePersonaEnum.ASSISTANT,
+                style=style,
+            ),
+        ],
+        plugins=plugins,
+        tool_blacklist=tool_blacklist,
+        use_tools=use_tools,
+    )
+
+
+async def _completion_stream(  # noqa: PLR0913
+    call: CallStateModel,
+    plugins: DefaultPlugin,
+    tool_blacklist: set[str],
+    use_tools: bool,
+    continuation: bool = False,
+    messages: list[MessageModel] | None = None,
+) -> AsyncGenerator[ChoiceDelta, None]:
+    """
+    Stream the LLM answer to the call messages, enhanced with the trainings and the tools.
+
+    If `messages` is set, they are used instead of the call messages. If `continuation` is `True`, the last one is an answer cut off, continued by the LLM.
+    """
+    # Build RAG
+    trainings = await call.trainings()
+    logger.info("Enhancing LLM chat with %s trainings", len(trainings))
+    # logger.debug("Trainings: %s", trainings)
+
+    # System prompts
+    system = CONFIG.prompts.llm.chat_system(
+        call=call,
+        trainings=trainings,
+    )
+
+    tools = []
+    if not use_tools:
+        logger.warning("Tools disabled for this chat")
+    else:
+        tools = await plugins.to_openai(frozenset(tool_blacklist))
+        # logger.debug("Tools: %s", tools)
+
+    async for delta in completion_stream(
+        continuation=continuation,
+        max_tokens=160,  # Lowest possible value for 90% of the cases, if not sufficient, the answer is resumed, 100 tokens ~= 75 words, 20 words ~= 1 sentence, 6 sentences ~= 160 tokens
+        messages=call.messages if messages is None else messages,
+        system=system,
+        tools=tools,
+    ):
+        yield delta
+
+
 async def _process_audio_for_vad(  # noqa: PLR0913
     call: CallStateModel,
     in_callback: Callable[[], Awaitable[tuple[bytes, bool]]],
@@ -628,92 +849,37 @@ async def _process_audio_for_vad(  # noqa: PLR0913
     - Detect voice activity and clear the TTS to let the user speak
     - Wait for silence and trigger the chat
     - Wait for longer silence and trigger the timeout
-    """
-    stop_task: asyncio.Task | None = None
-    silence_task: asyncio.Task | None = None
 
-    async def _wait_for_silence() -> None:
-        """
-        Run the chat after a silence.
+    Turn-taking is a state machine, see `TurnTaking`, its timeouts are snapshotted at the start of the call.
+    """
+    wheel = CONFIG.audio.timer.instance()
+    turn = TurnTaking(
+        call=call,
+        cutoff_ms=await vad_cutoff_timeout_ms(),
+        phone_silence_sec=await phone_silence_timeout_sec(),
+        response_callback=response_callback,
+        silence_ms=await vad_silence_timeout_ms(),
+        stop_callback=stop_callback,
+        timeout_callback=timeout_callback,
+        wheel=wheel,
+    )
 
-        If the silence is too long, run the timeout.
-        """
-        # Wait before flushing
-        nonlocal stop_task
-        timeout_ms = await vad_silence_timeout_ms()
-        await asyncio.sleep(timeout_ms / 1000)
-
-        # Cancel the clear TTS task
-        if stop_task:
-            stop_task.cancel()
-            stop_task = None
-
-        # Flush the audio buffer
-        logger.debug("Flushing audio buffer after %i ms", timeout_ms)
-        await response_callback()
-
-        # Wait for silence and trigger timeout
-        timeout_sec = await phone_silence_timeout_sec()
+    try:
         while True:
-            # Stop this time if the call played a message
-            timeout_start = datetime.now(UTC)
-            await asyncio.sleep(timeout_sec)
-
-            # Stop if the call ended
-            if not call.in_progress:
-                break
-
-            # Cancel if an interaction happened in the meantime
-            if (
-                call.last_interaction_at
-                and call.last_interaction_at + timedelta(seconds=timeout_sec)
-                > timeout_start
-            ):
-                logger.debug(
-                    "Message sent in the meantime, canceling this silence timeout"
-                )
-                continue
-
-            # Trigger the timeout
-            logger.info("Silence triggered after %i sec", timeout_sec)
-            await timeout_callback()
-
-    async def _wait_for_stop() -> None:
-        """
-        Stop the TTS if user speaks for too long.
-        """
-        timeout_ms = await vad_cutoff_timeout_ms()
+            # Wait for the next audio packet
+            out_chunck, is_speech = await in_callback()
 
-        # Wait before clearing the TTS queue
-        await asyncio.sleep(timeout_ms / 1000)
+            # Add audio to the buffer
+            out_callback(out_chunck)
 
-        # Clear the queue
-        logger.info("Stoping TTS after %i ms", timeout_ms)
-        await stop_callback()
+            # Update the turn, with the packet arrival time
+            turn.on_frame(
+                is_speech=is_speech,
+                now=wheel.now(),
+            )
 
-    while True:
-        # Wait for the next audio packet
-        out_chunck, is_speech = await in_callback()
-
-        # Add audio to the buffer
-        out_callback(out_chunck)
-
-        # If no speech, init the silence task
-        if not is_speech:
-            # Start timeout if not already started
-            if not silence_task:
-                silence_task = asyncio.create_task(_wait_for_silence())
-            # Continue to the next audio packet
-            continue
-
-        # Voice detected, cancel the timeout task
-        if silence_task:
-            silence_task.cancel()
-            silence_task = None
-
-        # Start the TTS clear task
-        if not stop_task:
-            stop_task = asyncio.create_task(_wait_for_stop())
+    finally:
+        turn.close()
 
 
 def _tts_callback(
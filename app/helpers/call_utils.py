@@ -1,19 +1,25 @@
 import asyncio
+import contextvars
 import json
 import re
 import time
+from collections import deque
 from collections.abc import AsyncGenerator, Awaitable, Callable, Generator
 from contextlib import asynccontextmanager, contextmanager, suppress
 from enum import Enum
-from typing import Any
+from functools import partial
+from weakref import WeakKeyDictionary
 
 import numpy as np
 from aiojobs import Job, Scheduler
 from azure.cognitiveservices.speech import (
     AudioConfig,
+    ResultReason,
     SpeechConfig,
     SpeechRecognizer,
     SpeechSynthesisOutputFormat,
+    SpeechSynthesisRequest,
+    SpeechSynthesisRequestInputType,
     SpeechSynthesizer,
 )
 from azure.cognitiveservices.speech.audio import (
@@ -24,6 +30,7 @@ from azure.cognitiveservices.speech.audio import (
     PushAudioOutputStreamCallback,
 )
 from azure.communication.callautomation import (
+    AudioFormat,
     FileSource,
     PhoneNumberIdentifier,
     RecognitionChoice,
@@ -38,40 +45,78 @@ from azure.communication.callautomation.aio import (
     CallConnectionClient,
 )
 from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
-from noisereduce import reduce_noise
 
+from app.helpers.aec import IAecEngine, ReferenceAligner
 from app.helpers.cache import async_lru_cache
+from app.helpers.channel import AudioChannel
 from app.helpers.config import CONFIG
+from app.helpers.config_models.audio import TtsModeEnum
+from app.helpers.config_models.conversation import LanguageEntryModel
+from app.helpers.dsp import DspLane
 from app.helpers.features import (
     recognition_stt_complete_timeout_ms,
-    vad_threshold,
+    vad_snr_margin_db,
 )
-from app.helpers.identity import token
 from app.helpers.logging import logger
+from app.helpers.media import AudioLoop, PlayoutMark
 from app.helpers.monitoring import (
+    call_aec_delay,
     call_aec_droped,
     call_aec_missed,
     call_answer_latency,
     call_stt_complete_latency,
+    call_tts_first_audio_latency,
     counter_add,
     gauge_set,
 )
+from app.helpers.resample import Resampler
+from app.helpers.tts_cache import TtsCache
+from app.helpers.tts_scheduler import TtsLaneEnum, TtsScheduler
+from app.helpers.vad import VadEngine
 from app.models.call import CallStateModel
 from app.models.message import (
     MessageModel,
     PersonaEnum as MessagePersonaEnum,
     StyleEnum as MessageStyleEnum,
+    extract_message_style,
 )
 
 _MAX_CHARACTERS_PER_TTS = 400  # Azure Speech Service TTS limit is 400 characters
 _SENTENCE_PUNCTUATION_R = (
     r"([!?;]+|[\.\-:]+(?:$| ))"  # Split by sentence by punctuation
 )
+_SENTENCE_ABBREVIATIONS = frozenset(
+    ("dr", "e.g", "i.e", "m", "mme", "mr", "mrs", "ms", "st", "vs")
+)  # Lowercase, without the final dot, they never end a sentence
+_SENTENCE_END_R = re.compile(r"[!?;]+|[\.\-:]+")  # Sentence end candidates
+_STREAM_AUDIO_FORMATS = {
+    16000: AudioFormat.PCM16_K_MONO,
+    24000: AudioFormat.PCM24_K_MONO,
+}  # Media streaming formats, by sample rate
+_TTS_OUTPUT_FORMATS = {
+    8000: SpeechSynthesisOutputFormat.Raw8Khz16BitMonoPcm,
+    16000: SpeechSynthesisOutputFormat.Raw16Khz16BitMonoPcm,
+    24000: SpeechSynthesisOutputFormat.Raw24Khz16BitMonoPcm,
+    48000: SpeechSynthesisOutputFormat.Raw48Khz16BitMonoPcm,
+}  # Synthesizer formats, by sample rate
 _TTS_SANITIZER_R = re.compile(
     r"[^\w\sÀ-ÿ'«»“”\"\"‘’''(),.!?;:\-\+_@/&€$%=]"  # noqa: RUF001
 )  # Sanitize text for TTS
 
 _db = CONFIG.database.instance()
+_dsp = CONFIG.audio.dsp.instance()
+_speech_pool = CONFIG.cognitive_service.pool.instance(
+    resource_id=CONFIG.cognitive_service.resource_id
+)
+_stt_streams: WeakKeyDictionary[SpeechRecognizer, PushAudioInputStream] = (
+    WeakKeyDictionary()
+)
+_tts_cache = CONFIG.audio.tts_cache.instance()
+_tts_cache_filling: set[str] = set()  # Keys being synthesized, to fill them once
+_tts_outputs: WeakKeyDictionary[SpeechSynthesizer, "TtsOutput"] = WeakKeyDictionary()
+_tts_turn: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "tts_turn", default=None
+)  # Turn of the synthesis requests, set by the task answering it
 
 
 class CallHangupException(Exception):
@@ -85,19 +130,444 @@ class CallHangupException(Exception):
 class TtsCallback(PushAudioOutputStreamCallback):
     """
     Callback for Azure Speech Synthesizer to push audio data to a queue.
+
+    The synthesizer calls it from its own thread, audio is handed over to the event loop. Audio is dropped while no queue is bound, between two calls of a pooled synthesizer.
     """
 
-    def __init__(self, queue: asyncio.Queue[bytes]):
-        self.queue = queue
+    queue: AudioChannel[bytes | PlayoutMark] | None
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = None
 
     def write(self, audio_buffer: memoryview) -> int:
         """
         Write audio data to the queue.
         """
-        self.queue.put_nowait(audio_buffer.tobytes())
+        if queue := self.queue:
+            self.loop.call_soon_threadsafe(queue.put_nowait, audio_buffer.tobytes())
         return audio_buffer.nbytes
 
 
+class TtsOutput:
+    """
+    Audio output of a synthesizer, to play pre-synthesized audio in the same queue.
+
+    Synthesis requests are sent through the scheduler of the output, in order and by priority. Tracks the speech being synthesized, so cached audio is played after it, never in the middle. When a speech is synthesized, its playout mark is queued after its last audio. Also measures the time-to-first-audio of the assistant turns.
+
+    The output is bound to the queue of a call, a pooled synthesizer is bound again by the next call.
+    """
+
+    _callback: TtsCallback
+    _first_audio_context: contextvars.Context | None
+    _first_audio_start: float | None
+    _idle: asyncio.Event
+    _loop: asyncio.AbstractEventLoop
+    _marks: deque[PlayoutMark | None]  # Marks of the speech sent, in order
+    _scheduler: TtsScheduler
+
+    def __init__(self, callback: TtsCallback, client: SpeechSynthesizer):
+        self._callback = callback
+        self._first_audio_context = None
+        self._first_audio_start = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._loop = asyncio.get_running_loop()
+        self._marks = deque()
+        self._scheduler = TtsScheduler(max_in_flight=CONFIG.audio.tts_in_flight_max)
+        # Events are fired from the synthesizer thread
+        client.synthesis_canceled.connect(self._on_done)
+        client.synthesis_completed.connect(self._on_done)
+        client.synthesizing.connect(self._on_audio)
+
+    @property
+    def queue(self) -> AudioChannel[bytes | PlayoutMark] | None:
+        return self._callback.queue
+
+    def bind(self, queue: AudioChannel[bytes | PlayoutMark] | None) -> None:
+        """
+        Send the audio to a queue, or drop it if `None`.
+        """
+        self._callback.queue = queue
+        self._first_audio_start = None
+
+    def idle(self) -> bool:
+        """
+        True if no speech is queued nor being synthesized.
+        """
+        return self._idle.is_set()
+
+    def submit(
+        self,
+        speak: Callable[[], object],
+        lane: TtsLaneEnum,
+        mark: PlayoutMark | None,
+        turn: str | None,
+    ) -> None:
+        """
+        Queue a synthesis request, sent by the scheduler when the synthesizer has room.
+
+        If `mark` is set, it is queued after the audio of the request, once synthesized.
+        """
+
+        def _speak() -> None:
+            self._marks.append(mark)
+            speak()
+
+        self._idle.clear()
+        self._scheduler.submit(
+            lane=lane,
+            mark=mark,
+            speak=_speak,
+            turn=turn,
+        )
+
+    def cancel(self, turn: str) -> None:
+        """
+        Drop the synthesis requests of a turn, not sent yet.
+        """
+        self._scheduler.cancel(turn)
+        if self._scheduler.idle:
+            self._idle.set()
+
+    def watch_first_audio(self) -> None:
+        """
+        Measure the time from now to the next synthesized audio.
+        """
+        # Keep the call context, the metric is reported from a loop callback
+        self._first_audio_context = contextvars.copy_context()
+        self._first_audio_start = time.monotonic()
+
+    async def wait_idle(self, timeout_sec: float) -> None:
+        """
+        Wait for the synthesizer to finish the speech sent, at most `timeout_sec`.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout_sec)
+        except TimeoutError:
+            logger.warning("Synthesizer still busy after %i sec", timeout_sec)
+
+    def _on_audio(self, _) -> None:
+        # Fired for each audio chunk, only hand over the ones watched
+        if self._first_audio_start is not None:
+            self._loop.call_soon_threadsafe(self._first_audio)
+
+    def _first_audio(self) -> None:
+        start, context = self._first_audio_start, self._first_audio_context
+        if start is None or context is None:
+            return
+        self._first_audio_start = None
+        context.run(
+            gauge_set,
+            metric=call_tts_first_audio_latency,
+            value=time.monotonic() - start,
+        )
+
+    def _on_done(self, _) -> None:
+        self._loop.call_soon_threadsafe(self._done)
+
+    def _done(self) -> None:
+        # Requests complete in order, after their audio was handed over
+        mark = self._marks.popleft() if self._marks else None
+        if mark and (queue := self.queue):
+            queue.put_nowait(mark)
+        # Send the next requests
+        self._scheduler.done()
+        if self._scheduler.idle:
+            self._idle.set()
+
+
+class SentenceSegmenter:
+    """
+    Incremental sentence splitter, fed with the text as the LLM generates it.
+
+    The text is scanned once, from where the previous delta stopped, so the cost per delta does not grow with the sentence. Sentences end on the same punctuation as `tts_sentence_split`, with exceptions:
+
+    - A dot, dash or colon needs a whitespace after it, decided once the next delta arrived; numbers like "3.5" and words like "well-known" are not split
+    - A dot after a common abbreviation (e.g. "Mr.", "e.g.") does not end the sentence
+    - A sentence longer than `max_chars` is cut on its last whitespace, the TTS request would be rejected otherwise
+
+    The style prefix is parsed once per sentence, as it may span several deltas (e.g. "sty", "le=cheer", "ful Hello!").
+
+    Sentences are returned whole by `write` and `flush`, or word by word by `write_words` and `flush_words`, for the TTS streaming. A segmenter is used in one of the modes only.
+    """
+
+    _buffer: str  # Text received, of the sentences not complete yet
+    _max_chars: int
+    _scan: int  # Position in the buffer, scanned already
+    _sent: int  # Position in the buffer, returned already as words
+    _style: MessageStyleEnum | None  # Current sentence style, None until parsed
+
+    def __init__(self, max_chars: int = _MAX_CHARACTERS_PER_TTS):
+        self._buffer = ""
+        self._max_chars = max_chars
+        self._scan = 0
+        self._sent = 0
+        self._style = None
+
+    def write(self, text: str) -> list[tuple[MessageStyleEnum, str]]:
+        """
+        Add a text generated by the LLM.
+
+        Returns the sentences completed by it, with their style, in order.
+        """
+        self._buffer += text
+        return self._split(final=False)
+
+    def flush(self) -> list[tuple[MessageStyleEnum, str]]:
+        """
+        Return the remaining sentences, even if incomplete, the LLM completed its answer.
+        """
+        return self._split(final=True)
+
+    def write_words(self, text: str) -> list[tuple[MessageStyleEnum, str, bool]]:
+        """
+        Add a text generated by the LLM.
+
+        Returns the text of the current sentence, up to its last complete word, then the sentences completed by it. Each piece comes with the style of its sentence, and `True` if it ends the sentence.
+        """
+        self._buffer += re.sub(r"\s+", " ", text)  # Words are split on spaces
+        return self._split_words(final=False)
+
+    def flush_words(self) -> list[tuple[MessageStyleEnum, str, bool]]:
+        """
+        Return the remaining text, as for `write_words`, even if incomplete, the LLM completed its answer.
+        """
+        return self._split_words(final=True)
+
+    def _split(self, final: bool) -> list[tuple[MessageStyleEnum, str]]:
+        segments = []
+        while end := self._find_end(final):
+            segment, self._buffer = self._buffer[:end], self._buffer[end:]
+            self._scan = 0
+            if not segment.strip():
+                continue
+            style, content = self._parse_style(segment.strip())
+            if content:
+                segments.append((style, content))
+        return segments
+
+    def _split_words(self, final: bool) -> list[tuple[MessageStyleEnum, str, bool]]:
+        pieces = []
+        while True:
+            # Parse the style, once the first word of the sentence is complete
+            if self._style is None:
+                self._buffer = self._buffer.lstrip()
+                self._scan = 0
+                if not self._buffer or (" " not in self._buffer and not final):
+                    return pieces
+                self._style, self._buffer = self._parse_style(self._buffer)
+
+            # Sentence is complete, return what is left of it
+            if end := self._find_end(final):
+                pieces.append((self._style, self._buffer[self._sent : end], True))
+                self._buffer = self._buffer[max(end, self._sent) :]
+                self._scan = 0
+                self._sent = 0
+                self._style = None
+                continue
+
+            # Sentence goes on, return the complete words
+            words = self._buffer.rfind(" ") + 1
+            if words > self._sent:
+                pieces.append((self._style, self._buffer[self._sent : words], False))
+                self._sent = words
+            return pieces
+
+    def _find_end(self, final: bool) -> int:
+        """
+        Find the end of the first sentence of the buffer, resuming the scan where it stopped.
+
+        Returns the end position, or 0 if the sentence is not complete yet.
+        """
+        buffer = self._buffer
+        while match := _SENTENCE_END_R.search(buffer, self._scan):
+            end = match.end()
+            # Wait for the next character, the punctuation may go on
+            if end == len(buffer):
+                if final:
+                    return end
+                break
+            # Question and exclamation marks always end the sentence
+            if buffer[match.start()] in "!?;":
+                return end
+            # Dot, dash and colon only end it when followed by a whitespace
+            self._scan = end
+            if buffer[end].isspace() and not self._is_abbreviation(match.start()):
+                return end
+        else:
+            self._scan = len(buffer)
+
+        # Sentence is too long, cut it on a whitespace
+        if len(buffer) > self._max_chars:
+            cut = buffer.rfind(" ", 0, self._max_chars)
+            return cut if cut > 0 else self._max_chars
+
+        # Sentence without punctuation, the answer is over
+        if final:
+            return len(buffer)
+
+        return 0
+
+    def _is_abbreviation(self, dot: int) -> bool:
+        """
+        True if the punctuation at position `dot` is the dot of an abbreviation.
+        """
+        if self._buffer[dot] != ".":
+            return False
+        start = dot
+        while start > 0 and not self._buffer[start - 1].isspace():
+            start -= 1
+        return self._buffer[start:dot].lower() in _SENTENCE_ABBREVIATIONS
+
+    @staticmethod
+    def _parse_style(text: str) -> tuple[MessageStyleEnum, str]:
+        """
+        Extract the style of a sentence.
+
+        Most sentences have no prefix to filter, they skip the regexes.
+        """
+        if (
+            "=" not in text
+            and "\n" not in text
+            and not text.startswith(("action", "style"))
+        ):
+            return MessageStyleEnum.NONE, text
+        return extract_message_style(text)
+
+
+class TtsStream:
+    """
+    Streamed synthesis of an assistant turn, fed with the text as the LLM generates it.
+
+    Text is sent word by word to a single synthesis request, so the audio starts before the end of the first sentence, and the next sentences do not pay the synthesis start latency. Sentences and their style prefix are split by a `SentenceSegmenter`, with the same rules as the sentence mode:
+
+    - Sentences without style are streamed, the request stays open across them
+    - Sentences with a style are spoken with SSML once complete, as a text stream cannot carry a style; the request is closed before, and a new one is opened after
+
+    Each sentence is stored in the call messages once sent, as in the sentence mode.
+    """
+
+    _call: CallStateModel
+    _request: SpeechSynthesisRequest | None
+    _scheduler: Scheduler
+    _segmenter: SentenceSegmenter
+    _sentence: str  # Text sent, of the current sentence
+    _style: MessageStyleEnum  # Style of the current sentence
+    _tts_client: SpeechSynthesizer
+    started: bool  # True once a text was sent to the synthesizer
+
+    def __init__(
+        self,
+        call: CallStateModel,
+        scheduler: Scheduler,
+        tts_client: SpeechSynthesizer,
+    ):
+        self._call = call
+        self._request = None
+        self._scheduler = scheduler
+        self._segmenter = SentenceSegmenter()
+        self._sentence = ""
+        self._style = MessageStyleEnum.NONE
+        self._tts_client = tts_client
+        self.started = False
+
+    async def write(self, text: str) -> None:
+        """
+        Add a text generated by the LLM.
+        """
+        await self._send_pieces(self._segmenter.write_words(text))
+
+    async def flush(self) -> None:
+        """
+        Send the remaining text, the LLM completed its answer.
+        """
+        await self._send_pieces(self._segmenter.flush_words())
+        self.close()
+
+    def close(self) -> None:
+        """
+        End the synthesis request, the text sent is still spoken.
+
+        Must be called when the turn is over, even if cancelled, otherwise the synthesizer waits for the text forever.
+        """
+        if not self._request:
+            return
+        self._request.input_stream.close()
+        self._request = None
+
+    async def _send_pieces(
+        self, pieces: list[tuple[MessageStyleEnum, str, bool]]
+    ) -> None:
+        """
+        Send the pieces of sentences split by the segmenter, in order.
+        """
+        for style, text, end in pieces:
+            self._style = style
+            self._send(text)
+            if end:
+                await self._end_sentence()
+
+    def _send(self, text: str) -> None:
+        """
+        Add a text to the current sentence, streamed if the sentence has no style.
+        """
+        if not text:
+            return
+        text = re.sub(_TTS_SANITIZER_R, " ", text)  # Remove unwanted characters
+        self._sentence += text
+        if self._style != MessageStyleEnum.NONE:
+            return
+
+        # Separate the sentences streamed in the same request
+        if self._request and self._sentence == text:
+            text = f" {text}"
+
+        # Open the request at the first text, the synthesizer starts the audio with it
+        if not self._request:
+            request = self._request = SpeechSynthesisRequest(
+                input_type=SpeechSynthesisRequestInputType.TextStream
+            )
+            _tts_submit(
+                speak=lambda: self._tts_client.speak_async(request),
+                tts_client=self._tts_client,
+            )
+        self._request.input_stream.write(text)
+        self.started = True
+
+    async def _end_sentence(self) -> None:
+        """
+        Speak the sentence if it has a style, then store it.
+        """
+        style = self._style
+        text = re.sub(r"\s+", " ", self._sentence).strip()
+        self._sentence = ""
+        if not text:
+            return
+
+        # Streamed already
+        if style == MessageStyleEnum.NONE:
+            logger.info("Played TTS stream: %s", text)
+            await _store_assistant_message(
+                call=self._call,
+                scheduler=self._scheduler,
+                style=style,
+                text=text,
+            )
+            return
+
+        # Speak with the style, after the text streamed
+        self.close()
+        self.started = True
+        await handle_realtime_tts(
+            call=self._call,
+            scheduler=self._scheduler,
+            style=style,
+            text=text,
+            tts_client=self._tts_client,
+        )
+
+
 class ContextEnum(str, Enum):
     """
     Enum for call context.
@@ -264,26 +734,69 @@ async def handle_realtime_tts(  # noqa: PLR0913
     scheduler: Scheduler,
     text: str,
     tts_client: SpeechSynthesizer,
+    cache: bool = False,
     store: bool = True,
     style: MessageStyleEnum = MessageStyleEnum.NONE,
-) -> None:
+) -> PlayoutMark:
     """
     Play a text to the realtime TTS.
 
+    If `cache` is `True`, the text is a fixed prompt, its pre-synthesized audio is played if available, without calling the synthesizer. Otherwise, it is synthesized and added to the cache for the next calls.
+
     If `store` is `True`, the text will be stored in the call messages.
+
+    Fixed prompts (`cache` is `True`) are sent before the LLM content still queued, in their own lane. The requests belong to the current turn, they are dropped if it is cancelled.
+
+    Returns the playout mark of the text, resolved once its last audio is played.
     """
+    output = _tts_outputs.get(tts_client)
+    mark = PlayoutMark()
+    marked = False
+
     # Play each chunk
     chunks = _chunk_for_tts(text)
-    for chunk in chunks:
+    for i, chunk in enumerate(chunks):
+        # Mark the end of the last chunk, if its audio goes to a call
+        chunk_mark = mark if i == len(chunks) - 1 and output and output.queue else None
+        marked = marked or bool(chunk_mark)
         logger.info("Playing TTS: %s", text)
-        tts_client.speak_ssml_async(
-            _ssml_from_text(
-                call=call,
-                style=style,
-                text=chunk,
-            ).ssml_text
+        ssml = _ssml_from_text(
+            call=call,
+            style=style,
+            text=chunk,
+        )
+
+        # Play the cached audio, after the speech being synthesized
+        if cache and output and (queue := output.queue):
+            audio = await _tts_cache.get(_tts_cache.key(ssml))
+            if audio is not None:
+                await output.wait_idle(CONFIG.audio.tts_cache.wait_idle_sec)
+                await _play_pcm(
+                    audio=audio,
+                    queue=queue,
+                )
+                if chunk_mark:
+                    await queue.put(chunk_mark)
+                continue
+
+        # Synthesize the audio
+        _tts_submit(
+            lane=TtsLaneEnum.SYSTEM if cache else TtsLaneEnum.CONTENT,
+            mark=chunk_mark,
+            speak=partial(tts_client.speak_ssml_async, ssml.ssml_text),
+            tts_client=tts_client,
         )
 
+        # Fill the cache in the background
+        if cache:
+            await scheduler.spawn(
+                tts_cache_fill(
+                    call=call,
+                    style=style,
+                    text=chunk,
+                )
+            )
+
     if store:
         await _store_assistant_message(
             call=call,
@@ -292,6 +805,121 @@ async def handle_realtime_tts(  # noqa: PLR0913
             scheduler=scheduler,
         )
 
+    # Nothing is played to the call, nothing to wait for
+    if not marked:
+        mark.played(time.monotonic())
+
+    return mark
+
+
+def tts_turn_start(turn: str) -> None:
+    """
+    Set the turn of the synthesis requests sent from the current context, to cancel them with `tts_cancel`.
+    """
+    _tts_turn.set(turn)
+
+
+def tts_cancel(tts_client: SpeechSynthesizer, turn: str) -> None:
+    """
+    Drop the synthesis requests of a turn, not sent yet to the synthesizer.
+
+    The requests already sent are not stopped.
+    """
+    if output := _tts_outputs.get(tts_client):
+        output.cancel(turn)
+
+
+def _tts_submit(
+    speak: Callable[[], object],
+    tts_client: SpeechSynthesizer,
+    lane: TtsLaneEnum = TtsLaneEnum.CONTENT,
+    mark: PlayoutMark | None = None,
+) -> None:
+    """
+    Send a synthesis request through the scheduler of the synthesizer, in the current turn.
+
+    If the synthesizer has no output, the request is sent at once.
+    """
+    if output := _tts_outputs.get(tts_client):
+        output.submit(
+            lane=lane,
+            mark=mark,
+            speak=speak,
+            turn=_tts_turn.get(),
+        )
+        return
+    speak()
+
+
+def tts_first_audio_watch(tts_client: SpeechSynthesizer) -> None:
+    """
+    Measure the time-to-first-audio of a synthesizer, from now to its next synthesized audio.
+    """
+    if output := _tts_outputs.get(tts_client):
+        output.watch_first_audio()
+
+
+async def _play_pcm(
+    audio: memoryview, queue: AudioChannel[bytes | PlayoutMark]
+) -> None:
+    """
+    Play raw PCM audio, in chunks, as the synthesizer would.
+    """
+    chunk_size = (
+        CONFIG.audio.tts_sample_rate * 2 * CONFIG.audio.tts_cache.chunk_ms // 1000
+    )  # PCM 16-bit, 1 channel
+    for pointer in range(0, len(audio), chunk_size):
+        await queue.put(bytes(audio[pointer : pointer + chunk_size]))
+
+
+async def tts_cache_fill(
+    call: CallStateModel,
+    text: str,
+    style: MessageStyleEnum = MessageStyleEnum.NONE,
+) -> None:
+    """
+    Synthesize a text in the TTS cache, for the call language and voice.
+
+    Chunks already cached or being synthesized are skipped.
+    """
+    for chunk in _chunk_for_tts(text):
+        ssml = _ssml_from_text(
+            call=call,
+            style=style,
+            text=chunk,
+        )
+        key = _tts_cache.key(ssml)
+
+        # Skip if already available
+        if key in _tts_cache_filling or await _tts_cache.get(key) is not None:
+            continue
+
+        _tts_cache_filling.add(key)
+        try:
+            # Synthesize, out of any call
+            logger.debug("Synthesizing TTS for the cache: %s", chunk)
+            synthesizer = SpeechSynthesizer(
+                audio_config=None,  # Keep the audio in the result
+                speech_config=_speech_config(
+                    lang=call.lang,
+                    token=await _speech_pool.token(),
+                ),
+            )
+            result = await asyncio.to_thread(
+                synthesizer.speak_ssml_async(ssml.ssml_text).get
+            )
+            if not result or result.reason != ResultReason.SynthesizingAudioCompleted:
+                logger.warning("Failed to synthesize TTS for the cache: %s", chunk)
+                continue
+
+            # Store
+            await _tts_cache.set(
+                key=key,
+                pcm=result.audio_data,
+            )
+        finally:
+            _tts_cache_filling.discard(key)
+
 
 async def _store_assistant_message(
     call: CallStateModel,
@@ -459,6 +1087,15 @@ async def handle_transfer(
         )
 
 
+def stream_audio_format() -> AudioFormat:
+    """
+    Get the media streaming format to request to Communication Services.
+
+    The stream confirms the format it actually uses in its first message, the pipeline adapts to it.
+    """
+    return _STREAM_AUDIO_FORMATS[CONFIG.audio.stream_sample_rate]
+
+
 async def start_audio_streaming(
     client: CallAutomationClient,
     call: CallStateModel,
@@ -540,56 +1177,159 @@ async def _use_call_client(
 @asynccontextmanager
 async def use_tts_client(
     call: CallStateModel,
-    out: asyncio.Queue[bytes],
+    out: AudioChannel[bytes | PlayoutMark],
 ) -> AsyncGenerator[SpeechSynthesizer, None]:
     """
     Use a text-to-speech client for a call.
 
     Output format is in PCM 16-bit, 16 kHz, 1 channel.
 
-    Yields a client to push audio data to the queue. Once the context is exited, the client will stop.
+    Yields a client to push audio data to the queue. The client is taken from the pool, warm, and given back once the context is exited, if it is not speaking anymore.
     """
-    # Get AAD token
-    aad_token = await (await token("https://cognitiveservices.azure.com/.default"))()
+    key = _tts_pool_key(call.lang)
+    client = await _speech_pool.acquire(
+        factory=_tts_factory(call.lang),
+        key=key,
+    )
+    output = _tts_outputs[client]
+    output.bind(out)
 
-    # Create real-time client
-    # TODO: Use v2 endpoint (https://learn.microsoft.com/en-us/azure/ai-services/speech-service/how-to-lower-speech-synthesis-latency?pivots=programming-language-python#how-to-use-text-streaming) but seems compatible with AAD auth? Found nothing in the docs (https://github.com/Azure-Samples/cognitive-services-speech-sdk/blob/e392c9ca09d44ebd65081e7cb44593a2b16cd5a7/samples/python/web/avatar/app.py#L137).
-    config = SpeechConfig(
-        endpoint=f"wss://{CONFIG.cognitive_service.region}.tts.speech.microsoft.com/cognitiveservices/websocket/v1",
-        speech_recognition_language=call.lang.short_code,
+    # Return
+    try:
+        yield client
+
+    # Give back the client, the speech left is for the previous call
+    finally:
+        output.bind(None)
+        _speech_pool.release(
+            client=client,
+            key=key,
+            reusable=output.idle(),
+        )
+
+
+async def speech_prewarm(call: CallStateModel, sample_rate: int) -> None:
+    """
+    Create the Speech clients of the call language ahead, in the pool.
+    """
+    await _speech_pool.fill(
+        factory=_stt_factory(
+            lang=call.lang,
+            sample_rate=sample_rate,
+        ),
+        key=_stt_pool_key(call.lang, sample_rate),
     )
-    config.authorization_token = (
-        f"aad#{CONFIG.cognitive_service.resource_id}#{aad_token}"
+    await _speech_pool.fill(
+        factory=_tts_factory(call.lang),
+        key=_tts_pool_key(call.lang),
     )
-    config.speech_synthesis_voice_name = call.lang.voice
-    config.set_speech_synthesis_output_format(
-        SpeechSynthesisOutputFormat.Raw16Khz16BitMonoPcm
+
+
+def _tts_pool_key(lang: LanguageEntryModel) -> tuple[str, ...]:
+    return ("tts", lang.short_code, lang.voice, lang.custom_voice_endpoint_id or "")
+
+
+def _tts_factory(lang: LanguageEntryModel) -> Callable[[str], SpeechSynthesizer]:
+    """
+    Build a text-to-speech client, not bound to any call.
+    """
+
+    def _create(token: str) -> SpeechSynthesizer:
+        callback = TtsCallback()
+        client = SpeechSynthesizer(
+            audio_config=AudioOutputConfig(stream=PushAudioOutputStream(callback)),
+            speech_config=_speech_config(
+                lang=lang,
+                token=token,
+            ),
+        )
+        _tts_outputs[client] = TtsOutput(
+            callback=callback,
+            client=client,
+        )
+        return client
+
+    return _create
+
+
+def _stt_pool_key(lang: LanguageEntryModel, sample_rate: int) -> tuple[str, ...]:
+    return ("stt", lang.short_code, str(sample_rate))
+
+
+def _stt_factory(
+    lang: LanguageEntryModel, sample_rate: int
+) -> Callable[[str], SpeechRecognizer]:
+    """
+    Build a speech-to-text client, with its own audio stream.
+    """
+
+    def _create(token: str) -> SpeechRecognizer:
+        stream = PushAudioInputStream(
+            stream_format=AudioStreamFormat(
+                bits_per_sample=16,
+                channels=1,
+                samples_per_second=sample_rate,
+            ),
+        )
+        client = SpeechRecognizer(
+            audio_config=AudioConfig(stream=stream),
+            language=lang.short_code,
+            speech_config=SpeechConfig(
+                auth_token=token,
+                region=CONFIG.cognitive_service.region,
+            ),
+        )
+        _stt_streams[client] = stream
+        return client
+
+    return _create
+
+
+def _speech_config(lang: LanguageEntryModel, token: str) -> SpeechConfig:
+    """
+    Build the text-to-speech configuration for a language and its voice.
+
+    Output format is in PCM 16-bit, 1 channel, at the TTS sample rate.
+    """
+    # Configure the synthesizer
+    # Text streaming requires the v2 endpoint, it also accepts SSML (https://learn.microsoft.com/en-us/azure/ai-services/speech-service/how-to-lower-speech-synthesis-latency?pivots=programming-language-python#how-to-use-text-streaming)
+    # TODO: AAD auth on the v2 endpoint is not documented (https://github.com/Azure-Samples/cognitive-services-speech-sdk/blob/e392c9ca09d44ebd65081e7cb44593a2b16cd5a7/samples/python/web/avatar/app.py#L137), keep the v1 endpoint for the sentence mode
+    version = "v2" if CONFIG.audio.tts_mode == TtsModeEnum.STREAM else "v1"
+    config = SpeechConfig(
+        endpoint=f"wss://{CONFIG.cognitive_service.region}.tts.speech.microsoft.com/cognitiveservices/websocket/{version}",
+        speech_recognition_language=lang.short_code,
     )
-    if call.lang.custom_voice_endpoint_id:
-        config.endpoint_id = call.lang.custom_voice_endpoint_id
-    # TODO: How to close the client?
-    client = SpeechSynthesizer(
-        speech_config=config,
-        audio_config=AudioOutputConfig(stream=PushAudioOutputStream(TtsCallback(out))),
+    config.authorization_token = token
+    config.speech_synthesis_voice_name = lang.voice
+    config.set_speech_synthesis_output_format(
+        _TTS_OUTPUT_FORMATS[CONFIG.audio.tts_sample_rate]
     )
-
-    # Return
-    yield client
+    if lang.custom_voice_endpoint_id:
+        config.endpoint_id = lang.custom_voice_endpoint_id
+    return config
 
 
 class SttClient:
     """
     Speech-to-text client.
 
-    Input format is in PCM 16-bit, 16 kHz, 1 channel.
+    Input format is in PCM 16-bit, 1 channel, at the sample rate.
+
+    The recognizer is taken from the pool, already connected. It is bound to the audio stream of the call, so it is never reused.
     """
 
     _call: CallStateModel
     _client: SpeechRecognizer | None = None
+    _loop: asyncio.AbstractEventLoop
+    _pool_key: tuple[str, ...]
+    _sample_rate: int
     _scheduler: Scheduler
     _stream: PushAudioInputStream
-    _stt_buffer: list[str] = []
-    _stt_complete_gate: asyncio.Event = asyncio.Event()
+    _stt_buffer: list[str]
+    _stt_complete_gate: asyncio.Event
+    transcript_callback: Callable[[str, bool], None] | None = (
+        None  # Called with the transcript so far, and if it is final, in the event loop
+    )
 
     def __init__(
         self,
@@ -598,31 +1338,25 @@ class SttClient:
         scheduler: Scheduler,
     ):
         self._call = call
+        self._sample_rate = sample_rate
         self._scheduler = scheduler
 
-        self._stream = PushAudioInputStream(
-            stream_format=AudioStreamFormat(
-                bits_per_sample=16,
-                channels=1,
-                samples_per_second=sample_rate,
-            ),
-        )
+        # Recognition state is dedicated to the call
+        self._loop = asyncio.get_running_loop()
+        self._stt_buffer = []
+        self._stt_complete_gate = asyncio.Event()
 
     async def __aenter__(self):
-        # Get AAD token
-        aad_token = await (
-            await token("https://cognitiveservices.azure.com/.default")
-        )()
-
-        # Create client
-        self.client = SpeechRecognizer(
-            audio_config=AudioConfig(stream=self._stream),
-            language=self._call.lang.short_code,
-            speech_config=SpeechConfig(
-                auth_token=f"aad#{CONFIG.cognitive_service.resource_id}#{aad_token}",
-                region=CONFIG.cognitive_service.region,
+        # Take a warm client
+        self._pool_key = _stt_pool_key(self._call.lang, self._sample_rate)
+        self.client = await _speech_pool.acquire(
+            factory=_stt_factory(
+                lang=self._call.lang,
+                sample_rate=self._sample_rate,
             ),
+            key=self._pool_key,
         )
+        self._stream = _stt_streams[self.client]
 
         # TSS events
         self.client.recognized.connect(self._complete_callback)
@@ -644,6 +1378,13 @@ class SttClient:
         # Stop STT
         self.client.stop_continuous_recognition_async()
 
+        # Discard the client, its stream holds the call audio
+        _speech_pool.release(
+            client=self.client,
+            key=self._pool_key,
+            reusable=False,
+        )
+
     def _partial_callback(self, event):
         """
         Handle partial recognition.
@@ -660,6 +1401,7 @@ class SttClient:
         # Store the result
         self._stt_buffer[-1] = text
         logger.debug("Partial recognition: %s", self._stt_buffer)
+        self._notify_transcript(final=False)
 
     def _complete_callback(self, event):
         """
@@ -680,9 +1422,18 @@ class SttClient:
 
         # Prepare for the next recognition
         self._stt_buffer.append("")
+        self._notify_transcript(final=True)
 
-        # Signal the completion
-        self._stt_complete_gate.set()
+        # Signal the completion, callback runs in the Speech SDK thread
+        self._loop.call_soon_threadsafe(self._stt_complete_gate.set)
+
+    def _notify_transcript(self, final: bool) -> None:
+        """
+        Hand over the transcript so far to the event loop, callbacks run in the Speech SDK thread.
+        """
+        if callback := self.transcript_callback:
+            text = " ".join(self._stt_buffer).strip()
+            self._loop.call_soon_threadsafe(callback, text, final)
 
     async def _clear_buffer_when_completed(self) -> None:
         """
@@ -747,45 +1498,71 @@ class AECStream:
     """
     Real-time audio stream with echo cancellation (AEC).
 
-    Input and output formats are in PCM 16-bit, 16 kHz, 1 channel.
+    Audio is in PCM 16-bit, 1 channel, each stage at its own sample rate:
+
+    - The microphone and the speech sent to the call are at the stream rate, negotiated with Communication Services
+    - The speech to play, and the loading sound, are at the TTS rate
+    - Echo cancellation, VAD and the processed audio are at the sample rate of the pipeline
+
+    Audio is resampled at the boundaries, each direction with its own resampler, as they keep the last samples of the stream.
     """
 
-    _aec_in_queue: asyncio.Queue[bytes] = asyncio.Queue()
-    _aec_out_queue: asyncio.Queue[tuple[bytes, bool]] = asyncio.Queue()
-    _aec_reference_queue: asyncio.Queue[bytes] = asyncio.Queue()
-    _answer_start: float | None = None
+    _aec: IAecEngine
+    _aec_in_queue: asyncio.Queue[bytes]
+    _aec_out_queue: asyncio.Queue[tuple[bytes, bool]]
+    _aec_pending_queue: asyncio.Queue[tuple[bytes, float, asyncio.Future[bytes]]]
+    _aec_reference_frames: deque[tuple[float, bytes]]
+    _aligner: ReferenceAligner
+    _answer_start: float | None
     _chunk_size: int
+    _dsp_lane: DspLane
     _empty_packet: bytes
-    _in_raw_queue: asyncio.Queue[bytes]
-    _in_reference_queue: asyncio.Queue[bytes] = asyncio.Queue()
-    _out_queue: asyncio.Queue[bytes]
+    _float_scratch: np.ndarray
+    _in_raw_queue: AudioChannel[bytes]
+    _in_reference_queue: AudioChannel[bytes | PlayoutMark]
+    _in_resampler: Resampler
+    _input_signal: np.ndarray
+    _loading: AudioLoop
+    _out_queue: AudioChannel[bytes | bool | PlayoutMark]
+    _out_resampler: Resampler
     _packet_duration_ms: int
     _packet_size: int
+    _pcm_scratch: np.ndarray
+    _reference_clock: float
+    _reference_resampler: Resampler
+    _reference_signal: np.ndarray
     _run_task: asyncio.Future
     _sample_rate: int
     _scheduler: Scheduler
+    _stream_packet_size: int
+    _vad: VadEngine
+    _vad_batch_max: int
+    _vad_snr_db: float
+    _vad_snr_expiry: float
 
     def __init__(  # noqa: PLR0913
         self,
-        in_raw_queue: asyncio.Queue[bytes],
-        in_reference_queue: asyncio.Queue[bytes],
-        out_queue: asyncio.Queue[bytes | Any],
+        in_raw_queue: AudioChannel[bytes],
+        in_reference_queue: AudioChannel[bytes | PlayoutMark],
+        out_queue: AudioChannel[bytes | bool | PlayoutMark],
         sample_rate: int,
         scheduler: Scheduler,
-        max_delay_ms: int = 200,
+        stream_sample_rate: int,
+        tts_sample_rate: int,
         packet_duration_ms: int = 20,
     ):
         """
         Initialize the audio stream.
 
         Parameters:
-        - `in_raw_queue`: Queue for the raw audio input (user speaking).
-        - `in_reference_queue`: Queue for the reference audio input (bot speaking).
-        - `max_delay_ms`: Maximum delay to consider between the raw and reference audio.
-        - `out_queue`: Queue for the processed audio output (echo-cancelled user speaking).
+        - `in_raw_queue`: Queue for the raw audio input (user speaking), at the stream rate.
+        - `in_reference_queue`: Queue for the reference audio input (bot speaking), at the TTS rate.
+        - `out_queue`: Queue for the audio to send to the call (bot speaking), at the stream rate.
         - `packet_duration_ms`: Duration of each audio packet in milliseconds.
-        - `sample_rate`: Audio sample rate in Hz.
+        - `sample_rate`: Sample rate of the pipeline in Hz, for the echo cancellation and the VAD.
         - `scheduler`: Scheduler for the async tasks.
+        - `stream_sample_rate`: Sample rate of the call media stream in Hz.
+        - `tts_sample_rate`: Sample rate of the synthesized speech in Hz.
         """
         self._in_raw_queue = in_raw_queue
         self._in_reference_queue = in_reference_queue
@@ -794,161 +1571,279 @@ class AECStream:
         self._sample_rate = sample_rate
         self._scheduler = scheduler
 
-        max_delay_samples = int(max_delay_ms / 1000 * self._sample_rate)
-        self._bot_voice_buffer = np.zeros(max_delay_samples, dtype=np.float32)
+        # Pipeline state is dedicated to the stream, concurrent calls never share it
+        self._aec_in_queue = asyncio.Queue()
+        self._aec_out_queue = asyncio.Queue()
+        self._answer_start = None
+
+        # Frames are processed in a dedicated lane of the DSP pool, to keep the event loop free and the frames ordered
+        self._aec_pending_queue = asyncio.Queue()
+        self._dsp_lane = _dsp.lane()
 
         self._chunk_size = int(self._sample_rate * self._packet_duration_ms / 1000)
         self._packet_size = self._chunk_size * 2  # Each sample is 2 bytes (PCM 16-bit)
         self._empty_packet: bytes = b"\x00" * self._packet_size
+        self._stream_packet_size = (
+            int(stream_sample_rate * self._packet_duration_ms / 1000) * 2
+        )
+
+        # Each direction is resampled with its own state, filters are shared by the process
+        self._in_resampler = Resampler(
+            from_rate=stream_sample_rate,
+            to_rate=self._sample_rate,
+        )
+        self._out_resampler = Resampler(
+            from_rate=tts_sample_rate,
+            to_rate=stream_sample_rate,
+        )
+        self._reference_resampler = Resampler(
+            from_rate=tts_sample_rate,
+            to_rate=self._sample_rate,
+        )
+
+        # Conversion buffers, reused for each frame to avoid allocations in the hot path
+        self._float_scratch = np.zeros(self._chunk_size, dtype=np.float32)
+        self._input_signal = np.zeros(self._chunk_size, dtype=np.float32)
+        self._pcm_scratch = np.zeros(self._chunk_size, dtype=np.int16)
+        self._reference_signal = np.zeros(self._chunk_size, dtype=np.float32)
+
+        # Reference frames are timestamped with their playout time, to be consumed along with the matching microphone frames
+        self._aec_reference_frames = deque()
+        self._reference_clock = 0
+
+        # Echo cancellation is stateful, an engine and an aligner are dedicated to the stream
+        self._aec = CONFIG.audio.aec.instance(
+            frame_size=self._chunk_size,
+            sample_rate=self._sample_rate,
+        )
+        self._aligner = CONFIG.audio.aec.aligner(
+            frame_size=self._chunk_size,
+            sample_rate=self._sample_rate,
+        )
+
+        # Loading sound is decoded once per process, only the position in the loop is dedicated to the stream
+        self._loading = CONFIG.prompts.sounds.loading_loop(sample_rate=tts_sample_rate)
+
+        # Voice activity detection adapts to the line noise, an engine is dedicated to the stream
+        self._vad = CONFIG.audio.vad.instance(
+            frame_size=self._chunk_size,
+            sample_rate=self._sample_rate,
+        )
+        self._vad_batch_max = CONFIG.audio.vad.batch_max
+        self._vad_snr_db = 0
+        self._vad_snr_expiry = 0
 
     async def __aenter__(self):
         self._run_task = asyncio.gather(
             self._forward_in(),
             self._forward_out(),
+            self._forward_processed(),
+            self._dsp_lane.run(),
             self._run(),
         )
         return self
 
     async def __aexit__(self, *args, **kwargs):
+        # Tear down the pipeline with the call
         self._run_task.cancel()
+        with suppress(asyncio.CancelledError):
+            try:
+                await self._run_task
+            except Exception:
+                logger.exception("Audio stream failed")
 
-    def _pcm_to_float(self, pcm: bytes) -> np.ndarray:
+    def _pcm_to_float(self, pcm: bytes, out: np.ndarray) -> np.ndarray:
         """
-        Convert PCM 16-bit to float (-1.0 to 1.0).
+        Convert PCM 16-bit to float (-1.0 to 1.0), in a preallocated buffer.
         """
-        return (
-            np.frombuffer(
+        np.copyto(
+            dst=out,
+            src=np.frombuffer(
                 buffer=pcm,
                 dtype=np.int16,
-            ).astype(np.float32)
-            / 32768.0
+            ),
         )
+        out *= 1 / 32768.0
+        return out
 
     def _float_to_pcm(self, floats: np.ndarray) -> bytes:
         """
         Convert float (-1.0 to 1.0) to PCM 16-bit.
-        """
-        pcm = (floats * 32767).clip(-32768, 32767).astype(np.int16)
-        return pcm.tobytes()
 
-    def _update_input_buffer(self, voice: np.ndarray) -> None:
+        Only the returned bytes are allocated, intermediate results are kept in the scratch buffers.
         """
-        Update the rolling buffer for the input voice.
-        """
-        buffer_length = len(self._bot_voice_buffer)
-        reference_length = len(voice)
-
-        if reference_length >= buffer_length:
-            # If the reference is longer than the buffer, keep the most recent samples
-            self._bot_voice_buffer = voice[-buffer_length:]
-        else:
-            # Append new samples and keep the buffer size fixed
-            self._bot_voice_buffer = np.roll(self._bot_voice_buffer, -reference_length)
-            self._bot_voice_buffer[-reference_length:] = voice
+        np.multiply(floats, 32767, out=self._float_scratch)
+        np.clip(self._float_scratch, -32768, 32767, out=self._float_scratch)
+        np.copyto(
+            casting="unsafe",
+            dst=self._pcm_scratch,
+            src=self._float_scratch,
+        )
+        return self._pcm_scratch.tobytes()
 
-    async def _rms_speech_detection(self, voice: np.ndarray) -> bool:
+    async def _speech_detection(self, pcms: list[bytes]) -> np.ndarray:
         """
-        Simple speech detection based on RMS (acoustic pressure).
+        Detect the speech in processed frames, in a single batch.
 
-        Returns True if speech is detected, False otherwise.
+        Returns a boolean array, True for each frame where the user is speaking.
         """
-        # Calculate Root Mean Square (RMS)
-        rms = np.sqrt(np.mean(voice**2))
-        # Get VAD threshold, divide by 10 to more usability from user side, as RMS is in range 0-1 and a detection of 0.1 is a good maximum threshold
-        threshold = await vad_threshold() / 10
-        return rms >= threshold
-
-    async def _process_one(self, input_pcm: bytes) -> None:
+        # Refresh the VAD margin above the line noise floor, at most every second
+        now = time.monotonic()
+        if now >= self._vad_snr_expiry:
+            self._vad_snr_db = await vad_snr_margin_db()
+            self._vad_snr_expiry = now + 1
+
+        # Convert the whole batch at once
+        frames = np.frombuffer(
+            buffer=b"".join(pcms),
+            dtype=np.int16,
+        ).reshape(len(pcms), self._chunk_size) * np.float32(1 / 32768.0)
+        return self._vad.process(frames, snr_db=self._vad_snr_db)
+
+    def _process_one(self, input_pcm: bytes, reference_pcm: bytes) -> bytes:
         """
         Process one audio chunk.
-        """
-        # Push raw input if reference is empty
-        if self._aec_reference_queue.empty():
-            reference_pcm = self._empty_packet
 
-        # Reference signal is available
-        else:
-            reference_pcm = await self._aec_reference_queue.get()
-            self._aec_reference_queue.task_done()
+        Runs in the DSP pool, never in the event loop. Calls are ordered by the DSP lane, so the echo cancellation engine is never accessed concurrently.
 
+        Returns the processed PCM audio.
+        """
         # Convert PCM to float for processing
-        input_signal = self._pcm_to_float(input_pcm)
-        reference_signal = self._pcm_to_float(reference_pcm)
+        input_signal = self._pcm_to_float(input_pcm, out=self._input_signal)
+        reference_signal = self._pcm_to_float(reference_pcm, out=self._reference_signal)
 
-        # Update the input buffer with the reference signal
-        self._update_input_buffer(reference_signal)
+        # Compensate the echo path delay
+        reference_signal = self._aligner.align(input_signal, reference_signal)
 
-        # Reference signal is empty, skip noise reduction
-        if np.all(reference_signal == 0):
-            # Perform VAD test
-            input_speaking = await self._rms_speech_detection(input_signal)
-
-            # Add processed PCM and metadata to the output queue
-            await self._aec_out_queue.put((input_pcm, input_speaking))
-            return
+        # Cancel the echo
+        processed_signal = self._aec.process(input_signal, reference_signal)
 
-        # Apply noise reduction
-        reduced_signal = reduce_noise(
-            # Input signal
-            sr=self._sample_rate,
-            y=input_signal,
-            # Quality
-            n_fft=128,
-            # Since the reference signal is already noise-reduced, we can assume it's stationary
-            clip_noise_stationary=False,  # Noise is longer than the signal
-            stationary=True,
-            y_noise=self._bot_voice_buffer,
-            # Output quality
-            prop_decrease=0.75,  # Reduce noise by 75%
-        )
-
-        # Perform VAD test
-        input_speaking = await self._rms_speech_detection(reduced_signal)
+        # Signal is untouched, skip the conversion
+        if processed_signal is None:
+            return input_pcm
 
         # Convert processed float signal back to PCM
-        processed_pcm = self._float_to_pcm(reduced_signal)
-
-        # Add processed PCM and metadata to the output queue
-        await self._aec_out_queue.put((processed_pcm, input_speaking))
+        return self._float_to_pcm(processed_signal)
 
-    async def _ensure_run_slo(self, input_pcm: bytes) -> None:
+    async def _ensure_run_slo(
+        self,
+        deadline: float,
+        job: asyncio.Future[bytes],
+    ) -> bytes | None:
         """
         Ensure the audio stream is processed within the SLO.
 
-        If the processing is delayed, the original input will be returned.
+        Returns the processed PCM audio, or `None` if the processing is delayed or failed.
         """
-        # Process the audio
+        # Wait for the processing
         try:
-            await asyncio.wait_for(
-                self._process_one(input_pcm),
-                timeout=self._packet_duration_ms
-                / 1000
-                * 4,  # Allow temporary medium latency
+            processed_pcm = await asyncio.wait_for(
+                job,
+                timeout=max(0, deadline - time.monotonic()),
             )
 
-        # If the processing is delayed, return the original input
+        # If the processing is delayed, give up on it
         except TimeoutError:
             # Enrich span
             counter_add(
                 metric=call_aec_missed,
                 value=1,
             )
-            await self._aec_out_queue.put((input_pcm, False))
+            return None
+
+        # If the processing failed, give up on the frame only, the stream goes on
+        except Exception:
+            logger.exception("Audio processing failed, forwarding the raw input")
+            # Enrich span
+            counter_add(
+                metric=call_aec_missed,
+                value=1,
+            )
+            return None
+
+        # Enrich span
+        gauge_set(
+            metric=call_aec_delay,
+            value=self._aligner.delay_ms / 1000,
+        )
+
+        return processed_pcm
 
     async def _run(self) -> None:
         """
         Process the audio stream in real-time.
+
+        Frames are submitted to the DSP lane as soon as they arrive, results are collected in order by `_forward_processed`.
+        """
+        while True:
+            # Fetch input audio
+            input_pcm = await self._aec_in_queue.get()
+            self._aec_in_queue.task_done()
+
+            # Consume the reference frame being played
+            reference_pcm = self._pop_reference(time.monotonic())
+
+            # Queue the processing
+            deadline = (
+                time.monotonic() + self._packet_duration_ms / 1000 * 4
+            )  # Allow temporary medium latency
+            job = self._dsp_lane.submit(self._process_one, input_pcm, reference_pcm)
+            await self._aec_pending_queue.put((input_pcm, deadline, job))
+
+    def _pop_reference(self, now: float) -> bytes:
         """
-        async with Scheduler(
-            limit=5,  # Allow 5 concurrent tasks
-        ) as scheduler:
-            while True:
-                # Fetch input audio
-                input_pcm = await self._aec_in_queue.get()
-                self._aec_in_queue.task_done()
+        Take the reference frame being played, silence if the bot is not speaking.
 
-                # Queue the processing
-                await scheduler.spawn(self._ensure_run_slo(input_pcm))
+        The frames due before it were played while no microphone frame arrived, like when the pipeline was late, they are dropped so the reference stays aligned with the microphone.
+        """
+        frames = self._aec_reference_frames
+        while len(frames) > 1 and frames[1][0] <= now:
+            frames.popleft()
+        if frames and frames[0][0] <= now:
+            return frames.popleft()[1]
+        return self._empty_packet
+
+    async def _forward_processed(self) -> None:
+        """
+        Forward processed audio to the output queue, in the order of arrival.
+
+        When the pipeline fell behind, the frames already processed are evaluated by the VAD in a single batch.
+        """
+        pending: tuple[bytes, float, asyncio.Future[bytes]] | None = None
+        while True:
+            # Wait for the oldest frame
+            if not pending:
+                pending = await self._aec_pending_queue.get()
+                self._aec_pending_queue.task_done()
+            input_pcm, deadline, job = pending
+            pending = None
+            batch = [(input_pcm, await self._ensure_run_slo(deadline, job))]
+
+            # Catch up with the next frames, only the ones already processed
+            while (
+                len(batch) < self._vad_batch_max and not self._aec_pending_queue.empty()
+            ):
+                pending = self._aec_pending_queue.get_nowait()
+                self._aec_pending_queue.task_done()
+                input_pcm, deadline, job = pending
+                if not job.done():
+                    break
+                pending = None
+                batch.append((input_pcm, await self._ensure_run_slo(deadline, job)))
+
+            # Perform VAD test
+            processed = [pcm for _, pcm in batch if pcm is not None]
+            speaking = map(
+                bool, await self._speech_detection(processed) if processed else ()
+            )
+
+            # Add PCM and metadata to the output queue
+            for input_pcm, processed_pcm in batch:
+                # If the processing is delayed, return the original input, echo cannot be told apart from the user
+                if processed_pcm is None:
+                    await self._aec_out_queue.put((input_pcm, False))
+                else:
+                    await self._aec_out_queue.put((processed_pcm, next(speaking)))
 
     async def pull_audio(self) -> tuple[bytes, bool]:
         """
@@ -982,25 +1877,42 @@ class AECStream:
         while True:
             # Consume input
             audio_data = await self._in_raw_queue.get()
-            self._in_raw_queue.task_done()
 
             # Validate packet size
-            if len(audio_data) != self._packet_size:
+            if len(audio_data) != self._stream_packet_size:
                 raise ValueError(
-                    f"Expected packet size {self._packet_size} bytes, got {len(audio_data)} bytes."
+                    f"Expected packet size {self._stream_packet_size} bytes, got {len(audio_data)} bytes."
                 )
 
-            # Push audio to the AEC queue
-            await self._aec_in_queue.put(audio_data)
+            # Push audio to the AEC queue, at the pipeline rate, whole packets are resampled to whole packets
+            await self._aec_in_queue.put(self._in_resampler.process(audio_data))
 
     async def _forward_out(self) -> None:
         """
         Forward processed audio to the clean output queue.
+
+        While the loading sound plays, its frames are sent at real-time rate, until the first speech frame arrives.
         """
         while True:
-            # Consume input
-            audio_data = await self._in_reference_queue.get()
-            self._in_reference_queue.task_done()
+            # Consume input, or wake up when the next loading frame is due
+            try:
+                audio_data = await asyncio.wait_for(
+                    fut=self._in_reference_queue.get(),
+                    timeout=self._loading.wait_time(time.monotonic()),
+                )
+            except TimeoutError:
+                audio_data = None
+
+            # Forward the playout mark, after the audio it ends
+            if isinstance(audio_data, PlayoutMark):
+                await self._out_queue.put(audio_data)
+                continue
+
+            # Play the loading sound, empty audio only wakes up the forwarder
+            if not audio_data:
+                while frame := self._loading.pop(time.monotonic()):
+                    await self._play(frame)
+                continue
 
             # Report the answer latency and reset the timer
             if self._answer_start:
@@ -1011,17 +1923,58 @@ class AECStream:
                 )
             self._answer_start = None
 
-            # Send to clean output
-            await self._out_queue.put(audio_data)
+            # Speech arrived, fade out the loading sound
+            if fade_out := self._loading.stop():
+                await self._play(fade_out)
 
-            # Send a copy as reference, extract packets and pad them if necessary
-            buffer_pointer = 0
-            while buffer_pointer < len(audio_data):
-                chunk = audio_data[: self._packet_size].ljust(
-                    self._packet_size, b"\x00"
-                )
-                await self._aec_reference_queue.put(chunk)
-                buffer_pointer += self._packet_size
+            await self._play(audio_data)
+
+    async def _play(self, audio_data: bytes) -> None:
+        """
+        Send audio to the clean output queue, and a copy as reference.
+
+        Audio is at the TTS rate, it is resampled to the stream rate for the output, and to the pipeline rate for the reference.
+        """
+        # Send to clean output
+        if out_pcm := self._out_resampler.process(audio_data):
+            await self._out_queue.put(out_pcm)
+
+        # Send a copy as reference, extract packets and pad them if necessary
+        # Packets are played back-to-back, from now or after the ones already queued
+        reference_pcm = self._reference_resampler.process(audio_data)
+        frame_duration = self._packet_duration_ms / 1000
+        self._reference_clock = max(time.monotonic(), self._reference_clock)
+        for buffer_pointer in range(0, len(reference_pcm), self._packet_size):
+            chunk = reference_pcm[
+                buffer_pointer : buffer_pointer + self._packet_size
+            ].ljust(self._packet_size, b"\x00")
+            self._aec_reference_frames.append((self._reference_clock, chunk))
+            self._reference_clock += frame_duration
+
+    def flush(self) -> None:
+        """
+        Drop the speech not played yet, on barge-in.
+
+        The speech queued and its reference frames are dropped together, otherwise the stale speech would be cancelled from the user voice.
+        """
+        self._in_reference_queue.flush()
+        self._out_queue.flush()
+        self._aec_reference_frames.clear()
+        self._reference_clock = 0
+
+    def loading_start(self) -> None:
+        """
+        Start looping the loading sound, until the next speech or `loading_stop`.
+        """
+        self._loading.start(time.monotonic())
+        # Wake up the forwarder, it may be waiting for speech only, after the speech already queued
+        self._in_reference_queue.put_nowait(b"")
+
+    def loading_stop(self) -> None:
+        """
+        Stop the loading sound, if playing.
+        """
+        self._loading.stop()
 
     def answer_start(self):
         """
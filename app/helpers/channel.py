@@ -0,0 +1,195 @@
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Generic, TypeVar
+
+from app.helpers.monitoring import (
+    call_audio_channel_depth,
+    call_audio_channel_dropped,
+    counter_add,
+    gauge_set,
+)
+
+T = TypeVar("T")
+
+
+class ChannelPolicyEnum(str, Enum):
+    BLOCK = "block"
+    """Producers wait for free space, for audio that must not be lost."""
+    DROP_OLDEST = "drop_oldest"
+    """Oldest item is dropped, for real-time audio where freshness matters most."""
+
+
+class AudioChannel(Generic[T]):
+    """
+    Bounded queue of audio, for a single call.
+
+    Memory is bounded whatever the consumer speed, by the `capacity` and the overflow `policy`.
+
+    A flush, on barge-in, is O(1) whatever the queue depth. It starts a new generation, the items of the previous ones are stale. Stale items are always the oldest, they are skipped by the consumer without being returned.
+
+    Not thread-safe, must be used from the event loop.
+    """
+
+    _capacity: int
+    _generation: int
+    _getters: deque[asyncio.Future[None]]
+    _items: deque[T]
+    _name: str
+    _policy: ChannelPolicyEnum
+    _putters: deque[asyncio.Future[None]]
+    _stale: int
+
+    def __init__(
+        self,
+        capacity: int,
+        name: str,
+        policy: ChannelPolicyEnum,
+    ):
+        """
+        Initialize the channel.
+
+        Parameters:
+        - `capacity`: Maximum number of live items.
+        - `name`: Channel name, used in the metrics.
+        - `policy`: Behavior when the channel is full.
+        """
+        self._capacity = capacity
+        self._generation = 0
+        self._getters = deque()
+        self._items = deque()
+        self._name = name
+        self._policy = policy
+        self._putters = deque()
+        self._stale = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        Current generation, incremented on each flush.
+        """
+        return self._generation
+
+    def qsize(self) -> int:
+        """
+        Number of live items.
+        """
+        return len(self._items) - self._stale
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        return self.qsize() >= self._capacity
+
+    async def put(self, item: T) -> None:
+        """
+        Put an item in the channel.
+
+        With the block policy, waits for free space.
+        """
+        while self._policy == ChannelPolicyEnum.BLOCK and self.full():
+            await self._wait(self._putters)
+        self.put_nowait(item)
+
+    def put_nowait(self, item: T) -> None:
+        """
+        Put an item in the channel, without waiting.
+
+        With the drop oldest policy, the oldest live item is dropped if the channel is full. With the block policy, raises `asyncio.QueueFull`.
+        """
+        if self.full():
+            if self._policy == ChannelPolicyEnum.BLOCK:
+                raise asyncio.QueueFull
+            self._drop_oldest()
+
+        self._items.append(item)
+        self._wake_up(self._getters)
+
+        # Report the depth
+        gauge_set(
+            attributes={"audio.channel": self._name},
+            metric=call_audio_channel_depth,
+            value=self.qsize(),
+        )
+
+    async def get(self) -> T:
+        """
+        Get the oldest live item, waiting for one if needed.
+        """
+        while self.empty():
+            await self._wait(self._getters)
+        return self.get_nowait()
+
+    def get_nowait(self) -> T:
+        """
+        Get the oldest live item, without waiting.
+
+        Raises `asyncio.QueueEmpty` if there is no live item.
+        """
+        self._skip_stale()
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        self._wake_up(self._putters)
+        return item
+
+    def flush(self) -> int:
+        """
+        Make all the queued items stale, in O(1).
+
+        Returns the number of items flushed.
+        """
+        flushed = self.qsize()
+        self._generation += 1
+        self._stale = len(self._items)
+        # All the space is free, let all the producers retry
+        while self._putters:
+            self._wake_up(self._putters)
+        return flushed
+
+    def _drop_oldest(self) -> None:
+        """
+        Drop the oldest live item.
+        """
+        self._skip_stale()
+        self._items.popleft()
+
+        # Report the drop
+        counter_add(
+            attributes={"audio.channel": self._name},
+            metric=call_audio_channel_dropped,
+            value=1,
+        )
+
+    def _skip_stale(self) -> None:
+        """
+        Remove the stale items, each one is only removed once.
+        """
+        while self._stale:
+            self._items.popleft()
+            self._stale -= 1
+
+    async def _wait(self, waiters: deque[asyncio.Future[None]]) -> None:
+        """
+        Wait to be woken up by the other side of the channel.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Pass the turn to the next waiter, if it was woken up in the meantime
+            if waiter.done() and not waiter.cancelled():
+                self._wake_up(waiters)
+            raise
+
+    def _wake_up(self, waiters: deque[asyncio.Future[None]]) -> None:
+        """
+        Wake up the first waiter still waiting.
+        """
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
@@ -0,0 +1,226 @@
+import tempfile
+from enum import Enum
+from functools import cache
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.helpers.aec import (
+    IAecEngine,
+    NlmsAecEngine,
+    NoiseReduceAecEngine,
+    ReferenceAligner,
+)
+from app.helpers.channel import AudioChannel, ChannelPolicyEnum
+from app.helpers.media import AudioPacer
+from app.helpers.vad import VadEngine
+
+
+class AecEngineEnum(str, Enum):
+    NLMS = "nlms"
+    """Frequency-domain adaptive filter, stateful across frames."""
+    NOISEREDUCE = "noisereduce"
+    """Stationary noise reduction, using the bot voice as noise profile."""
+
+
+class TtsModeEnum(str, Enum):
+    SENTENCE = "sentence"
+    """Each sentence is synthesized once complete, with its style."""
+    STREAM = "stream"
+    """Text is streamed to a single synthesis request per turn, as the LLM generates it."""
+
+
+class AecModel(BaseModel, frozen=True):
+    """
+    Acoustic echo cancellation, an engine is created for each call.
+    """
+
+    delay_estimation_interval_ms: int = Field(default=1000, ge=20)
+    delay_estimation_window_ms: int = Field(default=500, ge=20)
+    engine: AecEngineEnum = AecEngineEnum.NLMS
+    max_delay_ms: int = Field(default=500, ge=0)  # Longest bulk delay to compensate
+    tail_ms: int = Field(default=200, ge=20)  # Longest echo path to cancel
+
+    def instance(self, frame_size: int, sample_rate: int) -> IAecEngine:
+        if self.engine == AecEngineEnum.NLMS:
+            return NlmsAecEngine(
+                frame_size=frame_size,
+                sample_rate=sample_rate,
+                tail_ms=self.tail_ms,
+            )
+
+        return NoiseReduceAecEngine(
+            max_delay_ms=self.tail_ms,
+            sample_rate=sample_rate,
+        )
+
+    def aligner(self, frame_size: int, sample_rate: int) -> ReferenceAligner:
+        return ReferenceAligner(
+            frame_size=frame_size,
+            interval_ms=self.delay_estimation_interval_ms,
+            max_delay_ms=self.max_delay_ms,
+            sample_rate=sample_rate,
+            window_ms=self.delay_estimation_window_ms,
+        )
+
+
+class ChannelModel(BaseModel, frozen=True):
+    """
+    Bounded audio queue, a channel is created for each call.
+    """
+
+    capacity: int = Field(ge=1)
+    policy: ChannelPolicyEnum
+
+    def instance(self, name: str) -> AudioChannel:
+        return AudioChannel(
+            capacity=self.capacity,
+            name=name,
+            policy=self.policy,
+        )
+
+
+class DspModel(BaseModel, frozen=True):
+    """
+    Digital signal processing worker pool, shared by all the calls of a process.
+    """
+
+    workers: int = Field(default=4, ge=1)
+
+    @cache
+    def instance(self):
+        from app.helpers.dsp import DspExecutor
+
+        return DspExecutor(workers=self.workers)
+
+
+class PacerModel(BaseModel, frozen=True):
+    """
+    Outbound audio pacing, a pacer is created for each call.
+    """
+
+    batch_ms: int = Field(default=60, ge=20)  # Audio sent per WebSocket message
+    lead_ms: int = Field(
+        default=120, ge=20
+    )  # Audio buffered by the client, ahead of real-time
+    playout_timeout_sec: int = Field(
+        default=10, ge=0
+    )  # Longest wait for an utterance to be played, e.g. the goodbye before hanging up
+
+    def instance(self, sample_rate: int) -> AudioPacer:
+        return AudioPacer(
+            batch_ms=self.batch_ms,
+            lead_ms=self.lead_ms,
+            sample_rate=sample_rate,
+        )
+
+
+class TimerModel(BaseModel, frozen=True):
+    """
+    Timer wheel of the turn-taking timeouts, shared by all the calls of a process.
+    """
+
+    slots: int = Field(default=512, ge=1)
+    tick_ms: int = Field(default=10, ge=1)  # Precision of the timeouts
+
+    @cache
+    def instance(self):
+        from app.helpers.timer import TimerWheel
+
+        return TimerWheel(
+            slots=self.slots,
+            tick_ms=self.tick_ms,
+        )
+
+
+class TtsCacheModel(BaseModel, frozen=True):
+    """
+    Pre-synthesized audio of the fixed prompts, shared by all the calls of a process.
+    """
+
+    chunk_ms: int = Field(default=100, ge=20)  # Audio per queue item, when played
+    path: str = str(
+        Path(tempfile.gettempdir()) / "tts-cache"
+    )  # Local store, memory-mapped
+    ttl_sec: int = Field(default=60 * 60 * 24 * 30, ge=60)  # 30 days
+    wait_idle_sec: int = Field(
+        default=10, ge=0
+    )  # Longest wait for the speech being synthesized, before playing a cached audio
+
+    @cache
+    def instance(self):
+        from app.helpers.config import CONFIG
+        from app.helpers.tts_cache import TtsCache
+
+        return TtsCache(
+            cache=CONFIG.cache.instance(),
+            path=self.path,
+            sample_rate=CONFIG.audio.tts_sample_rate,
+            ttl_sec=self.ttl_sec,
+        )
+
+
+class VadModel(BaseModel, frozen=True):
+    """
+    Voice activity detection, an engine is created for each call.
+    """
+
+    batch_max: int = Field(
+        default=10, ge=1
+    )  # Frames evaluated at once, when the pipeline fell behind
+    flatness_max: float = Field(default=0.4, gt=0, le=1)
+    hangover_ms: int = Field(default=200, ge=0)
+    hysteresis_db: float = Field(default=3, ge=0)
+    min_level_db: float = Field(default=-55, le=0)  # Quieter frames are line silence
+    noise_fall_ms: int = Field(default=100, ge=1)
+    noise_rise_ms: int = Field(default=3000, ge=1)
+    onset_ms: int = Field(default=40, ge=0)
+    zcr_max: float = Field(default=0.25, gt=0, le=1)
+
+    def instance(self, frame_size: int, sample_rate: int) -> VadEngine:
+        return VadEngine(
+            flatness_max=self.flatness_max,
+            frame_size=frame_size,
+            hangover_ms=self.hangover_ms,
+            hysteresis_db=self.hysteresis_db,
+            min_level_db=self.min_level_db,
+            noise_fall_ms=self.noise_fall_ms,
+            noise_rise_ms=self.noise_rise_ms,
+            onset_ms=self.onset_ms,
+            sample_rate=sample_rate,
+            zcr_max=self.zcr_max,
+        )
+
+
+class AudioModel(BaseModel):
+    aec: AecModel = AecModel()  # Object is fully defined by default
+    # Microphone frames from the WebSocket, 1 sec of 20 ms frames, stale audio is useless
+    channel_in: ChannelModel = ChannelModel(
+        capacity=50,
+        policy=ChannelPolicyEnum.DROP_OLDEST,
+    )
+    # Speech to the WebSocket, the pacer pulls it at real-time rate
+    channel_out: ChannelModel = ChannelModel(
+        capacity=1000,
+        policy=ChannelPolicyEnum.BLOCK,
+    )
+    # Speech from the synthesizer, written from its thread so it cannot wait
+    channel_tts: ChannelModel = ChannelModel(
+        capacity=1000,
+        policy=ChannelPolicyEnum.DROP_OLDEST,
+    )
+    dsp: DspModel = DspModel()  # Object is fully defined by default
+    pacer: PacerModel = PacerModel()  # Object is fully defined by default
+    sample_rate: Literal[8000, 16000] = 16000  # Echo cancellation, VAD and recognition
+    # Requested to Communication Services, the stream announces the actual rate
+    stream_sample_rate: Literal[16000, 24000] = 16000
+    timer: TimerModel = TimerModel()  # Object is fully defined by default
+    tts_cache: TtsCacheModel = TtsCacheModel()  # Object is fully defined by default
+    tts_in_flight_max: int = Field(
+        default=2, ge=1
+    )  # Synthesis requests sent ahead, the next sentence is ready when the previous ends
+    tts_mode: TtsModeEnum = TtsModeEnum.SENTENCE
+    # Synthesized speech, 24 kHz for the HD voices
+    tts_sample_rate: Literal[8000, 16000, 24000, 48000] = 16000
+    vad: VadModel = VadModel()  # Object is fully defined by default
@@ -1,7 +1,33 @@
-from pydantic import BaseModel
+from functools import cache
+
+from pydantic import BaseModel, Field
+
+
+class SpeechPoolModel(BaseModel, frozen=True):
+    """
+    Warm Speech SDK clients, shared by all the calls of a process.
+    """
+
+    idle_ttl_sec: int = Field(default=300, ge=0)  # Longest wait of a client in the pool
+    size: int = Field(default=2, ge=0)  # Clients kept ready, per language and voice
+    token_refresh_margin_sec: int = Field(
+        default=300, ge=0
+    )  # Refresh the AAD token this long before it expires
+
+    @cache
+    def instance(self, resource_id: str):
+        from app.helpers.speech_pool import SpeechPool
+
+        return SpeechPool(
+            idle_ttl_sec=self.idle_ttl_sec,
+            refresh_margin_sec=self.token_refresh_margin_sec,
+            resource_id=resource_id,
+            size=self.size,
+        )
 
 
 class CognitiveServiceModel(BaseModel):
     endpoint: str
+    pool: SpeechPoolModel = SpeechPoolModel()  # Object is fully defined by default
     region: str
     resource_id: str
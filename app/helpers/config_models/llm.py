@@ -37,7 +37,7 @@ class AbstractPlatformModel(BaseModel, frozen=True):
 
 
 class AzureOpenaiPlatformModel(AbstractPlatformModel, frozen=True):
-    api_version: str = "2024-06-01"
+    api_version: str = "2024-10-21"  # Usage in streaming requires 2024-09-01 or later
     deployment: str
 
     @async_lru_cache()
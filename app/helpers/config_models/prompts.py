@@ -5,11 +5,13 @@ from functools import cached_property
 from html import escape
 from logging import Logger
 from textwrap import dedent
+from typing import Any
 
 from azure.core.exceptions import HttpResponseError
 from openai.types.chat import ChatCompletionSystemMessageParam
-from pydantic import BaseModel, TypeAdapter
+from pydantic import BaseModel, Field, TypeAdapter
 
+from app.helpers.media import AudioLoop, wav_frames
 from app.models.call import CallStateModel
 from app.models.message import MessageModel
 from app.models.next import NextModel
@@ -19,8 +21,21 @@ from app.models.training import TrainingModel
 
 
 class SoundModel(BaseModel):
+    loading_lead_ms: int = Field(
+        default=60, ge=20
+    )  # Loading sound buffered ahead of real-time, delays the answer when it arrives
+    loading_path: str = "public/loading.wav"  # Local copy, looped in the media stream
     loading_tpl: str = "{public_url}/loading.wav"
 
+    def loading_loop(self, sample_rate: int) -> AudioLoop:
+        return AudioLoop(
+            frames=wav_frames(
+                path=self.loading_path,
+                sample_rate=sample_rate,
+            ),
+            lead_ms=self.loading_lead_ms,
+        )
+
     def loading(self) -> str:
         from app.helpers.config import CONFIG
 
@@ -34,26 +49,26 @@ class LlmModel(BaseModel):
     Introduce to Assistant who they are, what they do.
 
     Introduce an emotional stimuli to the LLM, to make it lazier (https://arxiv.org/pdf/2307.11760.pdf).
+
+    System templates are static, they are the same for all the calls and turns, to be served from the prompt cache of the LLM provider. Values of the call, like the date, the customer or the inquiry, are in the context templates, sent after them.
     """
 
     default_system_tpl: str = """
         Assistant is called {bot_name} and is working in a call center for company {bot_company} as an expert with 20 years of experience. {bot_company} is a well-known and trusted company in telecom services, providing nbn®, mobile, and business solutions. Assistant is proud to work for {bot_company}.
 
         Always assist with care, respect, and truth. This is critical for the customer.
-
+    """
+    default_context_tpl: str = """
         # Context
         - The call center number is {bot_phone_number}
         - The customer is calling from {phone_number}
         - Today is {date}
     """
     chat_system_tpl: str = """
-        # Objective
-        {task}
-
         # Rules
         - After an action, explain clearly the next step
         - Always continue the conversation to solve the conversation objective
-        - Answers in {default_lang}, but can be updated with the help of a tool
+        - Answers in the conversation language, but it can be updated with the help of a tool
         - Ask 2 questions maximum at a time
         - Be concise
         - Enumerations are allowed to be used for 3 items maximum (e.g., "First, I will ask you for your name. Second, I will ask you for your email address.")
@@ -80,14 +95,6 @@ class LlmModel(BaseModel):
         ## Styles
         In output, you can use the following styles to add emotions to the conversation: {styles}
 
-        # Context
-
-        ## Service Inquiry
-        A file that contains all the information about the customer and the service inquiry: {inquiry}
-
-        ## Reminders
-        A list of reminders to help remember to do something: {reminders}
-
         # How to handle the conversation
 
         ## New conversation
@@ -141,6 +148,23 @@ class LlmModel(BaseModel):
         Tools: update address, check nbn readiness, schedule relocation
         Assistant: style=none Thank you for providing your new address, 456 Elm Street. style=none I have checked, and it is nbn® ready. style=cheerful I’ll schedule your service transfer to start on your move-in date. You’ll get confirmation by email. Anything else I can help with?
     """
+    chat_context_tpl: str = """
+        # Objective
+        {task}
+
+        # Conversation language
+        {default_lang}
+
+        # Service Inquiry
+        A file that contains all the information about the customer and the service inquiry: {inquiry}
+
+        # Reminders
+        A list of reminders to help remember to do something: {reminders}
+    """
+    chat_continuation_tpl: str = """
+        # Continuation
+        Your last message was cut off by the length limit, the customer already heard it. Continue it from the exact word where it stopped, without repeating any part of it and without starting over. New sentences follow the usual response format.
+    """
     sms_summary_system_tpl: str = """
         # Objective
         Summarize the call with the customer in a single SMS. The customer cannot reply to this SMS.
@@ -280,18 +304,15 @@ class LlmModel(BaseModel):
     """
 
     def default_system(self, call: CallStateModel) -> str:
-        from app.helpers.config import CONFIG
+        return self._format(
+            self.default_system_tpl,
+            **self._default_kwargs(call),
+        )
 
+    def default_context(self, call: CallStateModel) -> str:
         return self._format(
-            self.default_system_tpl.format(
-                bot_company=call.initiate.bot_company,
-                bot_name=call.initiate.bot_name,
-                bot_phone_number=CONFIG.communication_services.phone_number,
-                date=datetime.now(call.tz()).strftime(
-                    "%a %d %b %Y, %H:%M (%Z)"
-                ),  # Don`t include secs to enhance cache during unit tests. Example: "Mon 15 Jul 2024, 12:43 (CEST)"
-                phone_number=call.initiate.phone_number,
-            )
+            self.default_context_tpl,
+            **self._default_kwargs(call),
         )
 
     def chat_system(
@@ -302,21 +323,37 @@ class LlmModel(BaseModel):
             StyleEnum as MessageStyleEnum,
         )
 
+        # Same values for both templates, so customized templates can use any of them
+        kwargs: dict[str, Any] = {
+            "actions": ", ".join([action.value for action in MessageActionEnum]),
+            "bot_company": call.initiate.bot_company,
+            "default_lang": call.lang.human_name,
+            "inquiry": json.dumps(call.inquiry),
+            "reminders": TypeAdapter(list[ReminderModel])
+            .dump_json(call.reminders, exclude_none=True)
+            .decode(),
+            "styles": ", ".join([style.value for style in MessageStyleEnum]),
+            "task": call.initiate.task,
+        }
         return self._messages(
-            self._format(
-                self.chat_system_tpl,
-                actions=", ".join([action.value for action in MessageActionEnum]),
-                bot_company=call.initiate.bot_company,
-                inquiry=json.dumps(call.inquiry),
-                default_lang=call.lang.human_name,
-                reminders=TypeAdapter(list[ReminderModel])
-                .dump_json(call.reminders, exclude_none=True)
-                .decode(),
-                styles=", ".join([style.value for style in MessageStyleEnum]),
-                task=call.initiate.task,
+            self._format(self.chat_system_tpl, **kwargs),
+            call=call,
+            context=self._format(
+                self.chat_context_tpl,
                 trainings=trainings,
+                **kwargs,
             ),
-            call=call,
+        )
+
+    def chat_continuation(self) -> ChatCompletionSystemMessageParam:
+        """
+        Instruction to continue the last assistant message, cut off by the maximum tokens.
+
+        It goes after the messages. It is the same for all the calls, to keep the prompt cache.
+        """
+        return ChatCompletionSystemMessageParam(
+            content=self._format(self.chat_continuation_tpl),
+            role="system",
         )
 
     def sms_summary_system(
@@ -428,9 +465,30 @@ class LlmModel(BaseModel):
         # self.logger.debug("Formatted prompt: %s", formatted_prompt)
         return formatted_prompt
 
+    def _default_kwargs(self, call: CallStateModel) -> dict[str, Any]:
+        from app.helpers.config import CONFIG
+
+        return {
+            "bot_company": call.initiate.bot_company,
+            "bot_name": call.initiate.bot_name,
+            "bot_phone_number": CONFIG.communication_services.phone_number,
+            "date": datetime.now(call.tz()).strftime(
+                "%a %d %b %Y, %H:%M (%Z)"
+            ),  # Don`t include secs to enhance cache during unit tests. Example: "Mon 15 Jul 2024, 12:43 (CEST)"
+            "phone_number": call.initiate.phone_number,
+        }
+
     def _messages(
-        self, system: str, call: CallStateModel
+        self,
+        system: str,
+        call: CallStateModel,
+        context: str | None = None,
     ) -> list[ChatCompletionSystemMessageParam]:
+        """
+        Assemble the system messages, from the most stable to the most dynamic.
+
+        LLM providers cache the longest prompt prefix already seen, tools first, then the messages in order. The persona and the system prompt come first, they are the same across the turns. The context of the call comes last, it changes every minute with the date, and at each turn with the inquiry, the reminders and the trainings.
+        """
         messages = [
             ChatCompletionSystemMessageParam(
                 content=self.default_system(call),
@@ -440,6 +498,12 @@ class LlmModel(BaseModel):
                 content=system,
                 role="system",
             ),
+            ChatCompletionSystemMessageParam(
+                content=" ".join(
+                    [self.default_context(call), *([context] if context else [])]
+                ),
+                role="system",
+            ),
         ]
         # self.logger.debug("Messages: %s", messages)
         return messages
@@ -533,17 +597,51 @@ class TtsModel(BaseModel):
         return await self._translate(self.timeout_loading_tpl, call)
 
     async def ivr_language(self, call: CallStateModel) -> str:
+        return await self._translate(
+            [self._ivr_language(self.ivr_language_tpl, call)],
+            call,
+        )
+
+    async def variants(self, call: CallStateModel) -> list[str]:
+        """
+        List all the texts of the fixed prompts, in the call language, to pre-synthesize them.
+
+        The IVR language menu is listed with the same template for each language.
+        """
+        kwargs = {
+            "bot_company": call.initiate.bot_company,
+            "bot_name": call.initiate.bot_name,
+        }
+        prompt_tpls = [
+            *self.error_tpl,
+            *self.goodbye_tpl,
+            *self.hello_tpl,
+            *self.timeout_loading_tpl,
+            *self.timeout_silence_tpl,
+        ]
+        return [
+            *[await self._translate([tpl], call, **kwargs) for tpl in prompt_tpls],
+            *[
+                await self._translate([self._ivr_language([tpl], call)], call)
+                for tpl in self.ivr_language_tpl
+            ],
+        ]
+
+    def _ivr_language(self, prompt_tpls: list[str], call: CallStateModel) -> str:
+        """
+        Build the IVR language menu, one entry per available language.
+        """
         res = ""
         for i, lang in enumerate(call.initiate.lang.availables):
             res += (
                 self._return(
-                    self.ivr_language_tpl,
+                    prompt_tpls,
                     index=i + 1,
                     label=lang.human_name,
                 )
                 + " "
             )
-        return await self._translate([res], call)
+        return res
 
     def _return(self, prompt_tpls: list[str], **kwargs) -> str:
         """
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import numpy as np
+
+from app.helpers.monitoring import (
+    call_dsp_processing_latency,
+    call_dsp_queue_depth,
+    gauge_set,
+)
+
+T = TypeVar("T")
+
+
+class DspExecutor:
+    """
+    Run digital signal processing (DSP) off the event loop.
+
+    Jobs are executed in a thread pool shared by all the calls of the process. NumPy releases the GIL in its vectorized operations, so frames of different calls are processed in parallel while the event loop keeps serving the WebSockets.
+    """
+
+    _pool: ThreadPoolExecutor
+
+    def __init__(self, workers: int):
+        # Imported here, the logging loads the config which builds the AEC engines
+        from app.helpers.logging import logger
+
+        logger.info("Using %i DSP workers", workers)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="dsp",
+        )
+
+    def lane(self) -> "DspLane":
+        """
+        Create an ordered lane of jobs, one per call.
+        """
+        return DspLane(self._pool)
+
+
+class DspLane:
+    """
+    Ordered queue of DSP jobs, for a single call.
+
+    Jobs are executed one at a time, in submission order, so stateful processing (e.g. adaptive filters) always sees the frames in the right order. Lanes of different calls run in parallel on the shared pool.
+
+    The lane is only active while `run` is awaited.
+    """
+
+    _pool: ThreadPoolExecutor
+    _queue: asyncio.Queue[tuple[Callable[..., Any], tuple, asyncio.Future]]
+
+    def __init__(self, pool: ThreadPoolExecutor):
+        self._pool = pool
+        self._queue = asyncio.Queue()
+
+    def submit(self, func: Callable[..., T], *args: Any) -> asyncio.Future[T]:
+        """
+        Queue a job in the lane.
+
+        Returns a future with the job result. Cancelling the future before the job starts skips it.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((func, args, future))
+        # Report the queue depth
+        gauge_set(
+            metric=call_dsp_queue_depth,
+            value=self._queue.qsize(),
+        )
+        return future
+
+    async def run(self) -> None:
+        """
+        Execute the jobs of the lane, one at a time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            func, args, future = await self._queue.get()
+            self._queue.task_done()
+
+            # Skip jobs abandoned by the caller
+            if future.done():
+                continue
+
+            # Run the job in the pool
+            try:
+                res, duration = await loop.run_in_executor(
+                    self._pool, _timed, func, *args
+                )
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            # Report the processing time, without the time spent waiting for a worker
+            gauge_set(
+                metric=call_dsp_processing_latency,
+                value=duration,
+            )
+
+            # Caller may have given up in the meantime
+            if not future.done():
+                future.set_result(res)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 ring buffer, to keep the recent history of a signal.
+
+    Samples are mirrored in a double-sized array, so the latest samples are always readable as a contiguous view, without copy. Writes are vectorized and never allocate.
+    """
+
+    _buffer: np.ndarray
+    _capacity: int
+    _write_pointer: int
+
+    def __init__(self, capacity: int):
+        self._buffer = np.zeros(capacity * 2, dtype=np.float32)
+        self._capacity = capacity
+        self._write_pointer = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def write(self, samples: np.ndarray) -> None:
+        """
+        Append samples to the buffer, overwriting the oldest ones.
+        """
+        # Only the most recent samples fit in the buffer
+        if len(samples) > self._capacity:
+            samples = samples[-self._capacity :]
+        size = len(samples)
+
+        # Write in two parts if the write wraps around the end
+        first = min(size, self._capacity - self._write_pointer)
+        self._copy(
+            samples=samples[:first],
+            start=self._write_pointer,
+        )
+        self._copy(
+            samples=samples[first:],
+            start=0,
+        )
+        self._write_pointer = (self._write_pointer + size) % self._capacity
+
+    def view(self, size: int | None = None) -> np.ndarray:
+        """
+        Get the latest samples, from the oldest to the newest.
+
+        The array is a view on the buffer, it is only valid until the next write. Defaults to the whole capacity.
+        """
+        size = self._capacity if size is None else size
+        end = self._write_pointer + self._capacity
+        return self._buffer[end - size : end]
+
+    def clear(self) -> None:
+        """
+        Reset the buffer to silence.
+        """
+        self._buffer[:] = 0
+        self._write_pointer = 0
+
+    def _copy(self, samples: np.ndarray, start: int) -> None:
+        """
+        Copy samples at a position, and in its mirror.
+        """
+        end = start + len(samples)
+        self._buffer[start:end] = samples
+        self._buffer[start + self._capacity : end + self._capacity] = samples
+
+
+def _timed(func: Callable[..., T], *args: Any) -> tuple[T, float]:
+    """
+    Execute a function and measure its duration.
+
+    Returns a tuple with the result and the duration in seconds.
+    """
+    start = time.monotonic()
+    res = func(*args)
+    return res, time.monotonic() - start
@@ -59,15 +59,15 @@ async def phone_silence_timeout_sec() -> int:
     )
 
 
-async def vad_threshold() -> float:
+async def vad_snr_margin_db() -> float:
     """
-    The threshold for voice activity detection. Between 0.1 and 1.
+    Margin of the speech above the line noise floor for voice activity detection, in dB. Between 2 and 20.
     """
     return await _default(
-        default=0.5,
-        key="vad_threshold",
-        max_incl=1,
-        min_incl=0.1,
+        default=10.0,
+        key="vad_snr_margin_db",
+        max_incl=20.0,
+        min_incl=2.0,
         type_res=float,
     )
 
@@ -116,6 +116,32 @@ async def slow_llm_for_chat() -> bool:
     )
 
 
+async def llm_hedge_max_ms() -> int:
+    """
+    Maximum time to first token of the chat LLM before the same request is sent to the other LLM, in milliseconds. Set 0 to disable.
+
+    The delay is the p95 of the recent time to first tokens of the LLM, up to this maximum.
+    """
+    return await _default(
+        default=0,
+        key="llm_hedge_max_ms",
+        min_incl=0,
+        type_res=int,
+    )
+
+
+async def llm_continuation_max() -> int:
+    """
+    Maximum continuations of a chat answer cut off by the maximum tokens, the LLM resumes it where it stopped. Then, the answer is restarted. Set 0 to disable.
+    """
+    return await _default(
+        default=2,
+        key="llm_continuation_max",
+        min_incl=0,
+        type_res=int,
+    )
+
+
 async def recognition_retry_max() -> int:
     """
     The maximum number of retries for voice recognition. Minimum of 1.
@@ -128,6 +154,18 @@ async def recognition_retry_max() -> int:
     )
 
 
+async def recognition_speculation_stable_ms() -> int:
+    """
+    Duration a partial recognition must stay unchanged to speculatively start the answer, in milliseconds. Set 0 to disable.
+    """
+    return await _default(
+        default=0,
+        key="recognition_speculation_stable_ms",
+        min_incl=0,
+        type_res=int,
+    )
+
+
 async def recognition_stt_complete_timeout_ms() -> int:
     """
     The timeout for STT completion in milliseconds.
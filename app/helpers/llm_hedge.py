@@ -0,0 +1,247 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncGenerator, Callable
+from contextlib import suppress
+from typing import Generic, TypeVar
+
+from app.helpers.logging import logger
+from app.helpers.monitoring import (
+    call_llm_streams,
+    call_llm_ttft,
+    counter_add,
+    gauge_set,
+)
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """
+    Recent latencies of a backend, to estimate its percentiles.
+
+    Memory is bounded, only the last `size` latencies are kept.
+    """
+
+    _min_samples: int
+    _samples: deque[float]
+
+    def __init__(self, min_samples: int = 20, size: int = 200):
+        """
+        Initialize the window.
+
+        Parameters:
+        - `min_samples`: Latencies required to estimate a percentile.
+        - `size`: Latencies kept, at most.
+        """
+        self._min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, sec: float) -> None:
+        """
+        Add a latency, in seconds.
+        """
+        self._samples.append(sec)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Estimate a percentile, with the nearest-rank method.
+
+        Returns None if there are not enough latencies yet.
+
+        Parameters:
+        - `q`: Percentile, between 0 and 1.
+        """
+        if len(self._samples) < self._min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_ttft_windows: defaultdict[str, LatencyWindow] = defaultdict(
+    LatencyWindow
+)  # Time to first item per backend, process-wide
+
+
+def hedge_delay_sec(backend: str, max_sec: float) -> float:
+    """
+    Delay after which a backend is hedged if it produced nothing.
+
+    The delay is the p95 of its recent time to first item, so about 5% of the requests are hedged, up to `max_sec`. Until there are enough latencies, `max_sec` is used.
+    """
+    p95 = _ttft_windows[backend].percentile(0.95)
+    if p95 is None:
+        return max_sec
+    return min(p95, max_sec)
+
+
+async def hedged_stream(
+    backup: Callable[[], AsyncGenerator[T, None]],
+    backup_name: str,
+    delay_sec: float | None,
+    primary: Callable[[], AsyncGenerator[T, None]],
+    primary_name: str,
+) -> AsyncGenerator[T, None]:
+    """
+    Stream from the primary backend, hedged by the backup one if the primary is late.
+
+    If the primary produced nothing after `delay_sec`, the same request is started on the backup. Items are streamed from the first backend to produce one, the other one is cancelled. If a backend fails before its first item, the other one is waited for, the error is raised if both failed.
+
+    The time to first item, the backend streamed and whether the request was hedged are reported, per backend. Hedging is disabled if `delay_sec` is None, only the metrics are reported.
+
+    Parameters:
+    - `backup`: Start the request on the backup backend.
+    - `backup_name`: Name of the backup backend, used in the metrics.
+    - `delay_sec`: Time to first item of the primary after which the backup is started.
+    - `primary`: Start the request on the primary backend.
+    - `primary_name`: Name of the primary backend, used in the metrics.
+    """
+    race = _Race()
+    try:
+        # Wait for the first item, hedge once the primary is late
+        race.start(primary_name, primary)
+        winner, first, exhausted = await race.first(
+            backup=backup,
+            backup_name=backup_name,
+            delay_sec=delay_sec,
+            primary_name=primary_name,
+        )
+        race.report(
+            backup_name=backup_name,
+            winner=winner,
+        )
+
+        # Cancel the losers
+        await _close(race.tasks, race.streams, keep=winner)
+
+        # Stream the winner
+        if exhausted:
+            return
+        yield first  # pyright: ignore
+        async for item in race.streams[winner]:
+            yield item
+
+    finally:
+        await _close(race.tasks, race.streams)
+
+
+class _Race(Generic[T]):
+    """
+    Backends of a hedged request, racing for the first item.
+    """
+
+    started_at: dict[str, float]
+    streams: dict[str, AsyncGenerator[T, None]]
+    tasks: dict[asyncio.Future[T], str]  # Pending first item, per backend
+
+    def __init__(self):
+        self.started_at = {}
+        self.streams = {}
+        self.tasks = {}
+
+    def start(self, name: str, factory: Callable[[], AsyncGenerator[T, None]]) -> None:
+        """
+        Start the request on a backend, and wait for its first item.
+        """
+        self.started_at[name] = time.monotonic()
+        self.streams[name] = factory()
+        self.tasks[asyncio.ensure_future(anext(self.streams[name]))] = name
+
+    async def first(
+        self,
+        backup: Callable[[], AsyncGenerator[T, None]],
+        backup_name: str,
+        delay_sec: float | None,
+        primary_name: str,
+    ) -> tuple[str, T | None, bool]:
+        """
+        Wait for the first item of a backend, start the backup once the primary is late.
+
+        Returns a tuple with the backend name, its first item, and whether its stream was empty. Raises the error of the primary if all the backends failed.
+        """
+        errors: list[Exception] = []
+        while self.tasks:
+            timeout = None
+            if delay_sec is not None and backup_name not in self.streams:
+                timeout = max(
+                    0, self.started_at[primary_name] + delay_sec - time.monotonic()
+                )
+            done, _ = await asyncio.wait(
+                self.tasks,
+                return_when=asyncio.FIRST_COMPLETED,
+                timeout=timeout,
+            )
+
+            # Primary is late, start the backup
+            if not done:
+                logger.info(
+                    "No answer from %s LLM after %.2f sec, hedging with %s LLM",
+                    primary_name,
+                    delay_sec,
+                    backup_name,
+                )
+                self.start(backup_name, backup)
+                continue
+
+            for task in done:
+                name = self.tasks.pop(task)
+                error = task.exception()
+                # Empty stream, it is still an answer
+                if isinstance(error, StopAsyncIteration):
+                    return name, None, True
+                if error:
+                    logger.warning(
+                        "%s error from %s LLM", error.__class__.__name__, name
+                    )
+                    if isinstance(error, Exception):
+                        errors.append(error)
+                    continue
+                return name, task.result(), False
+
+        raise errors[0]
+
+    def report(self, backup_name: str, winner: str) -> None:
+        """
+        Report the winner, and the losers with the time they waited, a lower bound of their time to first item to keep the slow ones in the window.
+        """
+        now = time.monotonic()
+        ttft = now - self.started_at[winner]
+        gauge_set(
+            attributes={"llm.backend": winner},
+            metric=call_llm_ttft,
+            value=ttft,
+        )
+        _ttft_windows[winner].add(ttft)
+        for name in self.tasks.values():
+            _ttft_windows[name].add(now - self.started_at[name])
+        hedge = "none"
+        if backup_name in self.streams:
+            hedge = "backup" if winner == backup_name else "primary"
+        counter_add(
+            attributes={
+                "llm.backend": winner,
+                "llm.hedge": hedge,
+            },
+            metric=call_llm_streams,
+            value=1,
+        )
+
+
+async def _close(
+    tasks: dict[asyncio.Future[T], str],
+    streams: dict[str, AsyncGenerator[T, None]],
+    keep: str | None = None,
+) -> None:
+    """
+    Cancel the pending items and close the streams, except the one kept.
+
+    A stream can only be closed once its pending item is cancelled.
+    """
+    cancelled = [task for task, name in tasks.items() if name != keep]
+    for task in cancelled:
+        task.cancel()
+        tasks.pop(task)
+    await asyncio.gather(*cancelled, return_exceptions=True)
+    for name in [name for name in streams if name != keep]:
+        with suppress(Exception):
+            await streams.pop(name).aclose()
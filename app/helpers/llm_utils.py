@@ -4,8 +4,10 @@ See: https://github.com/microsoft/autogen/blob/2750391f847b7168d842dfcb815ac37bd
 """
 
 import asyncio
+import hashlib
 import inspect
 import json
+from collections import OrderedDict
 from collections.abc import Awaitable, Callable
 from functools import cache, wraps
 from inspect import getmembers, isfunction
@@ -18,7 +20,7 @@ from azure.cognitiveservices.speech import (
     SpeechSynthesizer,
 )
 from azure.communication.callautomation.aio import CallAutomationClient
-from jinja2 import Environment
+from jinja2 import Environment, Template, nodes
 from json_repair import repair_json
 from openai.types.chat import ChatCompletionToolParam
 from openai.types.shared_params.function_definition import FunctionDefinition
@@ -26,7 +28,6 @@ from pydantic import BaseModel, TypeAdapter
 from pydantic._internal._typing_extra import eval_type_lenient
 from pydantic.json_schema import JsonSchemaValue
 
-from app.helpers.cache import async_lru_cache
 from app.helpers.logging import logger
 from app.helpers.monitoring import SpanAttributeEnum, tracer
 from app.models.call import CallStateModel
@@ -37,6 +38,10 @@ _jinja = Environment(
     autoescape=True,
     enable_async=True,
 )
+_RENDERED_TOOLS_MAXSIZE = 128
+_rendered_tools: OrderedDict[
+    tuple[type, frozenset[str], str], list[ChatCompletionToolParam]
+] = OrderedDict()  # Process-wide, shared by the plugins of all the calls
 
 
 class Parameters(BaseModel):
@@ -49,6 +54,91 @@ class Parameters(BaseModel):
     type: str = "object"
 
 
+class _ToolSchema:
+    """
+    OpenAI API schema of a plugin function, compiled once per plugin class.
+
+    Signature, parameters JSON schemas and required parameters are static. Only the descriptions are Jinja templates, rendered with the call.
+    """
+
+    description: Template | str
+    fields: frozenset[str] | None  # Call fields read by the templates, None if all
+    name: str
+    parameters: dict[str, tuple[JsonSchemaValue, Template | str]]
+    required: list[str]
+
+    def __init__(self, func: Callable[..., Any]):
+        """
+        Introspect a function.
+
+        Raise TypeError if the function is not annotated.
+        """
+        typed_signature = _typed_signature(func)
+        default_values = _default_values(typed_signature)
+        param_annotations = _param_annotations(typed_signature)
+        required_params = _required_params(typed_signature)
+        missing, unannotated_with_default = _missing_annotations(
+            typed_signature, required_params
+        )
+
+        if unannotated_with_default != set():
+            unannotated_with_default_s = [
+                f"'{k}'" for k in sorted(unannotated_with_default)
+            ]
+            logger.warning(
+                "The following parameters of the function '%s' with default values are not annotated: %s.",
+                func.__name__,
+                ", ".join(unannotated_with_default_s),
+            )
+
+        if missing != set():
+            missing_s = [f"'{k}'" for k in sorted(missing)]
+            raise TypeError(
+                f"All parameters of the function '{func.__name__}' without default values must be annotated. "
+                + f"The annotations are missing for the following parameters: {', '.join(missing_s)}"
+            )
+
+        self.description, self.fields = _compile_template(func.__doc__ or "")
+        self.name = func.__name__
+        self.parameters = {}
+        for name, value in param_annotations.items():
+            schema = _parameter_json_schema(
+                default_values=default_values,
+                name=name,
+                value=value,
+            )
+            description, fields = _compile_template(_parameter_description(name, value))
+            self.parameters[name] = (schema, description)
+            self.fields = (
+                None if self.fields is None or fields is None else self.fields | fields
+            )
+        self.required = sorted(
+            required_params
+        )  # Sorted to keep the same schema across processes, for the LLM prompt cache
+
+    async def render(self, call: CallStateModel) -> ChatCompletionToolParam:
+        """
+        Render the descriptions with the call.
+        """
+        return ChatCompletionToolParam(
+            type="function",
+            function=FunctionDefinition(
+                description=await _render_template(self.description, call),
+                name=self.name,
+                parameters=Parameters(
+                    properties={
+                        name: {
+                            **schema,
+                            "description": await _render_template(description, call),
+                        }
+                        for name, (schema, description) in self.parameters.items()
+                    },
+                    required=self.required,
+                ).model_dump(),
+            ),
+        )
+
+
 class AbstractPlugin:
     call: CallStateModel
     client: CallAutomationClient
@@ -56,6 +146,24 @@ class AbstractPlugin:
     scheduler: Scheduler
     tts_callback: Callable[[str], Awaitable[None]]
     tts_client: SpeechSynthesizer
+    _tool_fields: frozenset[str] | None  # Call fields read by the tool schemas
+    _tools: dict[str, _ToolSchema]
+
+    def __init_subclass__(cls, **kwargs: Any):
+        """
+        Compile the tool schemas of the plugin, once at import.
+        """
+        super().__init_subclass__(**kwargs)
+        cls._tools = {
+            func.__name__: _ToolSchema(func)
+            for func in cls._available_functions(frozenset())
+        }
+        cls._tool_fields = frozenset()
+        for tool in cls._tools.values():
+            if cls._tool_fields is None or tool.fields is None:
+                cls._tool_fields = None
+                break
+            cls._tool_fields |= tool.fields
 
     def __init__(  # noqa: PLR0913
         self,
@@ -73,19 +181,39 @@ class AbstractPlugin:
         self.tts_callback = tts_callback
         self.tts_client = tts_client
 
-    @async_lru_cache()
     async def to_openai(
         self,
         blacklist: frozenset[str],
     ) -> list[ChatCompletionToolParam]:
         """
         Get the OpenAI SDK schema for all functions of the plugin, excluding the ones in the blacklist.
+
+        Schemas are rendered once per plugin class, blacklist and values of the call fields read by the templates, like the inquiry fields or the available languages. They are shared by the plugins of all the calls of the process.
         """
-        functions = self._available_functions(frozenset(blacklist))
-        return await asyncio.gather(
-            *[_function_schema(func, call=self.call) for func in functions]
+        inputs = (
+            self.call.model_dump_json()
+            if self._tool_fields is None
+            else self.call.model_dump_json(include=set(self._tool_fields))
+        )
+        key = (
+            self.__class__,
+            blacklist,
+            hashlib.sha256(inputs.encode()).hexdigest(),
         )
 
+        if key in _rendered_tools:
+            _rendered_tools.move_to_end(key)
+            return _rendered_tools[key]
+
+        functions = self._available_functions(blacklist)
+        schemas = await asyncio.gather(
+            *[self._tools[func.__name__].render(self.call) for func in functions]
+        )
+        _rendered_tools[key] = schemas
+        if len(_rendered_tools) > _RENDERED_TOOLS_MAXSIZE:
+            _rendered_tools.popitem(last=False)
+        return schemas
+
     @tracer.start_as_current_span("plugin_execute")
     async def execute(
         self,
@@ -162,9 +290,10 @@ class AbstractPlugin:
         # Enrich span
         SpanAttributeEnum.TOOL_RESULT.attribute(tool.content)
 
+    @classmethod
     @cache
     def _available_functions(
-        self,
+        cls,
         blacklist: frozenset[str],
     ) -> list[FunctionType]:
         """
@@ -172,9 +301,9 @@ class AbstractPlugin:
         """
         return [
             func
-            for name, func in getmembers(self.__class__, isfunction)
+            for name, func in getmembers(cls, isfunction)
             if not name.startswith("_")
-            and name not in [func.__name__ for func in [self.to_openai, self.execute]]
+            and name not in [func.__name__ for func in [cls.to_openai, cls.execute]]
             and name not in blacklist
         ]
 
@@ -254,65 +383,6 @@ def add_customer_response(
     return decorator
 
 
-async def _function_schema(
-    f: Callable[..., Any],
-    **kwargs: Any,
-) -> ChatCompletionToolParam:
-    """
-    Take a function and return a JSON schema for it as defined by the OpenAI API.
-
-    Kwargs are passed to the Jinja template for rendering the function description and parameter descriptions.
-
-    Raise TypeError if the function is not annotated.
-    """
-    typed_signature = _typed_signature(f)
-    default_values = _default_values(typed_signature)
-    param_annotations = _param_annotations(typed_signature)
-    required_params = _required_params(typed_signature)
-    missing, unannotated_with_default = _missing_annotations(
-        typed_signature, required_params
-    )
-
-    if unannotated_with_default != set():
-        unannotated_with_default_s = [
-            f"'{k}'" for k in sorted(unannotated_with_default)
-        ]
-        logger.warning(
-            "The following parameters of the function '%s' with default values are not annotated: %s.",
-            f.__name__,
-            ", ".join(unannotated_with_default_s),
-        )
-
-    if missing != set():
-        missing_s = [f"'{k}'" for k in sorted(missing)]
-        raise TypeError(
-            f"All parameters of the function '{f.__name__}' without default values must be annotated. "
-            + f"The annotations are missing for the following parameters: {', '.join(missing_s)}"
-        )
-
-    description = _remove_newlines(
-        await _jinja.from_string(dedent(f.__doc__ or "")).render_async(**kwargs)
-    )  # Remove possible indentation, render the description, then remove newlines to avoid hallucinations
-    name = f.__name__
-    parameters: dict[str, object] = (
-        await _parameters(
-            default_values=default_values,
-            param_annotations=param_annotations,
-            required_params=required_params,
-            **kwargs,
-        )
-    ).model_dump()
-
-    return ChatCompletionToolParam(
-        type="function",
-        function=FunctionDefinition(
-            description=description,
-            name=name,
-            parameters=parameters,
-        ),
-    )
-
-
 def _typed_annotation(annotation: Any, global_namespace: dict[str, Any]) -> Any:
     """
     Get the type annotation of a parameter and return the anotated type.
@@ -355,41 +425,36 @@ def _param_annotations(
     }
 
 
-async def _parameter_json_schema(
+def _parameter_json_schema(
     name: str,
     value: Annotated[type[Any], str] | type[Any],
     default_values: dict[str, Any],
-    **kwargs: Any,
 ) -> JsonSchemaValue:
     """
-    Get a JSON schema for a parameter as defined by the OpenAI API and return the Pydantic model for the parameter.
-
-    Kwargs are passed to the Jinja template for rendering the parameter description.
+    Get a JSON schema for a parameter as defined by the OpenAI API, without its description.
     """
-
-    def _description(name: str, value: Annotated[type[Any], str] | type[Any]) -> str:
-        # Handles Annotated
-        if hasattr(value, "__metadata__"):
-            retval = value.__metadata__[0]
-            if isinstance(retval, str):
-                return retval
-            raise ValueError(
-                f"Invalid description {retval} for parameter {name}, should be a string."
-            )
-        return name
-
     schema = TypeAdapter(value).json_schema()
     if name in default_values:
         dv = default_values[name]
         schema["default"] = dv
+    return schema
 
-    schema["description"] = _remove_newlines(
-        await _jinja.from_string(dedent(_description(name, value))).render_async(
-            **kwargs
-        )
-    )  # Remove possible indentation, render the description, then remove newlines to avoid hallucinations
 
-    return schema
+def _parameter_description(
+    name: str, value: Annotated[type[Any], str] | type[Any]
+) -> str:
+    """
+    Get the description template of a parameter, from its annotation, or its name.
+    """
+    # Handles Annotated
+    if hasattr(value, "__metadata__"):
+        retval = value.__metadata__[0]
+        if isinstance(retval, str):
+            return retval
+        raise ValueError(
+            f"Invalid description {retval} for parameter {name}, should be a string."
+        )
+    return name
 
 
 def _required_params(typed_signature: inspect.Signature) -> set[str]:
@@ -414,32 +479,6 @@ def _default_values(typed_signature: inspect.Signature) -> dict[str, Any]:
     }
 
 
-async def _parameters(
-    required_params: set[str],
-    param_annotations: dict[str, Annotated[type[Any], str] | type[Any]],
-    default_values: dict[str, Any],
-    **kwargs: Any,
-) -> Parameters:
-    """
-    Get the parameters of a function as defined by the OpenAI API and return the Pydantic model for the parameters.
-
-    Kwargs are passed to the Jinja template for rendering the parameter description.
-    """
-    return Parameters(
-        properties={
-            name: await _parameter_json_schema(
-                default_values=default_values,
-                name=name,
-                value=value,
-                **kwargs,
-            )
-            for name, value in param_annotations.items()
-            if value != inspect.Signature.empty and name != "self"
-        },
-        required=list(required_params),
-    )
-
-
 def _missing_annotations(
     typed_signature: inspect.Signature, required_params: set[str]
 ) -> tuple[set[str], set[str]]:
@@ -460,6 +499,58 @@ def _missing_annotations(
     return missing, unannotated_with_default
 
 
+def _compile_template(source: str) -> tuple[Template | str, frozenset[str] | None]:
+    """
+    Compile a description Jinja template, rendered with the call.
+
+    Returns a tuple:
+    1. Description, as text if it has no Jinja syntax
+    2. Call fields read by the template, None if it reads the whole call
+    """
+    source = dedent(source)  # Remove possible indentation
+    ast = _jinja.parse(source)
+
+    # Plain text, no need to render it
+    if all(
+        isinstance(node, nodes.Output)
+        and all(isinstance(child, nodes.TemplateData) for child in node.nodes)
+        for node in ast.body
+    ):
+        text = "".join(
+            child.data
+            for node in ast.body
+            if isinstance(node, nodes.Output)
+            for child in node.nodes
+            if isinstance(child, nodes.TemplateData)
+        )
+        return _remove_newlines(text), frozenset()
+
+    # Fields read as "call.[field]", anything else reads the whole call
+    calls = [node for node in ast.find_all(nodes.Name) if node.name == "call"]
+    attributes = [
+        node
+        for node in ast.find_all(nodes.Getattr)
+        if isinstance(node.node, nodes.Name) and node.node.name == "call"
+    ]
+    fields = (
+        frozenset(node.attr for node in attributes)
+        if len(attributes) == len(calls)
+        else None
+    )
+    return _jinja.from_string(source), fields
+
+
+async def _render_template(template: Template | str, call: CallStateModel) -> str:
+    """
+    Render a description template with the call.
+    """
+    if isinstance(template, str):
+        return template
+    return _remove_newlines(
+        await template.render_async(call=call)
+    )  # Remove newlines to avoid hallucinations
+
+
 def _remove_newlines(text: str) -> str:
     """
     Remove newlines from a string and return it as a single line.
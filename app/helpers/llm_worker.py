@@ -1,6 +1,8 @@
 import json
+from bisect import bisect_left
 from collections.abc import AsyncGenerator, Callable
-from functools import lru_cache
+from functools import lru_cache, partial
+from itertools import accumulate
 from os import environ
 from typing import TypeVar
 
@@ -30,6 +32,7 @@ from openai.types.chat.chat_completion_chunk import (
     ChoiceDeltaToolCall,
     ChoiceDeltaToolCallFunction,
 )
+from openai.types.completion_usage import CompletionUsage
 from opentelemetry.instrumentation.openai import OpenAIInstrumentor
 from pydantic import ValidationError
 from tenacity import (
@@ -45,9 +48,17 @@ from app.helpers.config import CONFIG
 from app.helpers.config_models.llm import (
     AbstractPlatformModel as LlmAbstractPlatformModel,
 )
-from app.helpers.features import slow_llm_for_chat
+from app.helpers.features import llm_hedge_max_ms, slow_llm_for_chat
+from app.helpers.llm_hedge import hedge_delay_sec, hedged_stream
 from app.helpers.logging import logger
-from app.helpers.monitoring import tracer
+from app.helpers.monitoring import (
+    call_llm_cached_ratio,
+    call_llm_cached_tokens,
+    call_llm_continuation_tokens,
+    counter_add,
+    gauge_set,
+    tracer,
+)
 from app.helpers.resources import resources_dir
 from app.models.message import MessageModel
 
@@ -90,11 +101,16 @@ async def completion_stream(
     messages: list[MessageModel],
     system: list[ChatCompletionSystemMessageParam],
     tools: list[ChatCompletionToolParam] | None = None,
+    continuation: bool = False,
 ) -> AsyncGenerator[ChoiceDelta, None]:
     """
     Returns a stream of completions.
 
+    If `continuation` is `True`, the last message is an assistant answer cut off by the maximum tokens, the LLM continues it instead of starting a new one. The completion tokens not generated again, compared to a new answer, are reported.
+
     Completion is first made with the fast LLM, then the slow LLM if the previous fails. Catch errors for a maximum of 3 times (internal + `RateLimitError`). If it fails again, raise the error.
+
+    If hedging is enabled, the request is also sent to the other LLM when the first one is late to answer, the first to answer is streamed.
     """
     retryed = AsyncRetrying(
         reraise=True,
@@ -105,16 +121,42 @@ async def completion_stream(
         wait=wait_random_exponential(multiplier=0.8, max=8),
     )
 
-    # Try first with primary LLM
+    # Try first with primary LLM, hedged with the backup LLM if it is late
+    is_fast = not await slow_llm_for_chat()  # Let configuration decide
+    if continuation:
+        _report_continuation(
+            message=messages[-1],
+            model=CONFIG.llm.selected(is_fast).model,
+        )
+    hedge_max_ms = await llm_hedge_max_ms()
     try:
         async for attempt in retryed:
             with attempt:
-                async for chunck in _completion_stream_worker(
-                    is_fast=not await slow_llm_for_chat(),  # Let configuration decide
-                    max_tokens=max_tokens,
-                    messages=messages,
-                    system=system,
-                    tools=tools,
+                async for chunck in hedged_stream(
+                    backup=lambda: _completion_stream_worker(
+                        continuation=continuation,
+                        is_fast=not is_fast,
+                        max_tokens=max_tokens,
+                        messages=messages,
+                        system=system,
+                        tools=tools,
+                    ),
+                    backup_name=_backend_name(not is_fast),
+                    delay_sec=hedge_delay_sec(
+                        backend=_backend_name(is_fast),
+                        max_sec=hedge_max_ms / 1000,
+                    )
+                    if hedge_max_ms
+                    else None,
+                    primary=lambda: _completion_stream_worker(
+                        continuation=continuation,
+                        is_fast=is_fast,
+                        max_tokens=max_tokens,
+                        messages=messages,
+                        system=system,
+                        tools=tools,
+                    ),
+                    primary_name=_backend_name(is_fast),
                 ):
                     yield chunck
                 return
@@ -130,7 +172,8 @@ async def completion_stream(
     async for attempt in retryed:
         with attempt:
             async for chunck in _completion_stream_worker(
-                is_fast=await slow_llm_for_chat(),  # Let configuration decide
+                continuation=continuation,
+                is_fast=not is_fast,
                 max_tokens=max_tokens,
                 messages=messages,
                 system=system,
@@ -140,15 +183,18 @@ async def completion_stream(
 
 
 # TODO: Refacto, too long (and remove PLR0912 ignore)
-async def _completion_stream_worker(  # noqa: PLR0912
+async def _completion_stream_worker(  # noqa: PLR0912, PLR0913
     is_fast: bool,
     max_tokens: int,
     messages: list[MessageModel],
     system: list[ChatCompletionSystemMessageParam],
     tools: list[ChatCompletionToolParam] | None = None,
+    continuation: bool = False,
 ) -> AsyncGenerator[ChoiceDelta, None]:
     """
     Returns a stream of completions.
+
+    If `continuation` is `True`, the instruction to continue the last message is added after the messages.
     """
     client, platform = await _use_llm(is_fast)
     extra = {}
@@ -161,6 +207,7 @@ async def _completion_stream_worker(  # noqa: PLR0912
         max_tokens=max_tokens,
         messages=messages,
         model=platform.model,
+        suffix=[CONFIG.prompts.llm.chat_continuation()] if continuation else None,
         system=system,
         tools=tools,
     )  # Limit to 20 messages for quick response and avoid hallucinations
@@ -182,8 +229,13 @@ async def _completion_stream_worker(  # noqa: PLR0912
             ] = await client.chat.completions.create(
                 **chat_kwargs,
                 stream=True,
+                stream_options={
+                    "include_usage": True
+                },  # Last chunk carries the usage, without choices
             )
             async for chunck in stream:
+                if chunck.usage:
+                    _report_usage(platform=platform, usage=chunck.usage)
                 choices = chunck.choices
                 # Skip empty choices, happens sometimes with GPT-4 Turbo
                 if not choices:
@@ -206,6 +258,7 @@ async def _completion_stream_worker(  # noqa: PLR0912
             completion: ChatCompletion = await client.chat.completions.create(
                 **chat_kwargs
             )
+            _report_usage(platform=platform, usage=completion.usage)
             choice = completion.choices[0]
             # Azure OpenAI content filter
             if choice.finish_reason == "content_filter":
@@ -357,6 +410,7 @@ async def _completion_sync_worker(
                 if e.code == "content_filter":
                     raise SafetyCheckError("Issue detected in prompt") from e
                 raise e
+            _report_usage(platform=platform, usage=res.usage)
             choice = res.choices[0]
             # Azure OpenAI content filter
             if choice.finish_reason == "content_filter":
@@ -376,6 +430,7 @@ def _limit_messages(  # noqa: PLR0913
     model: str,
     system: list[ChatCompletionSystemMessageParam],
     max_messages: int = 1000,
+    suffix: list[ChatCompletionSystemMessageParam] | None = None,
     tools: list[ChatCompletionToolParam] | None = None,
 ) -> list[
     ChatCompletionAssistantMessageParam
@@ -387,59 +442,135 @@ def _limit_messages(  # noqa: PLR0913
     Returns a list of messages limited by the context size.
 
     The context size is the maximum number of tokens allowed by the model. The messages are selected from the newest to the oldest, until the context or the maximum number of messages is reached.
+
+    The `suffix` messages are added after the selected messages, like an instruction about the last one.
+
+    Token costs are cached: per message, in the message itself, and per distinct system prompt and tool schema. The selection is a binary search over the cumulated costs of the candidates.
     """
     max_tokens = max_tokens or 0  # Default
-
-    counter = 0
+    encoding = _encoding_name(model)
     max_context = context_window - max_tokens
-    selected_messages = []
-    tokens = 0
+    suffix = suffix or []
     total = min(len(system) + len(messages), max_messages)
 
-    # Add system messages
-    for message in system:
-        tokens += _count_tokens(json.dumps(message), model)
-        counter += 1
-
-    # Add tools
-    for tool in tools or []:
-        tokens += _count_tokens(json.dumps(tool), model)
+    # Add system messages and tools
+    tokens = sum(
+        _count_static_tokens(json.dumps(message), encoding)
+        for message in [*system, *suffix]
+    )
+    tokens += sum(
+        _count_static_tokens(json.dumps(tool), encoding) for tool in tools or []
+    )
 
     # Add user messages until the available context is reached, from the newest to the oldest
-    for message in messages[::-1]:
-        openai_message = message.to_openai()
-        new_tokens = _count_tokens(
-            "".join([json.dumps(x) for x in openai_message]),
-            model,
+    candidates = messages[::-1][: max(0, max_messages - len(system))]
+    costs = list(
+        accumulate(
+            message.tokens(encoding, partial(_count_tokens, encoding=encoding))
+            for message in candidates
         )
-        if tokens + new_tokens >= max_context:
-            break
-        if counter >= max_messages:
-            break
-        counter += 1
-        selected_messages += openai_message[::-1]
-        tokens += new_tokens
+    )
+    selected = bisect_left(costs, max_context - tokens)
+    if selected:
+        tokens += costs[selected - 1]
+    counter = len(system) + selected
 
     logger.info("Using %s/%s messages (%s tokens) as context", counter, total, tokens)
     return [
         *system,
-        *selected_messages[::-1],
+        *[
+            openai_message
+            for message in candidates[:selected][::-1]
+            for openai_message in message.to_openai()
+        ],
+        *suffix,
     ]
 
 
-@lru_cache  # Cache results in memory as token count is done many times on the same content
-def _count_tokens(content: str, model: str) -> int:
+@lru_cache
+def _encoding_name(model: str) -> str:
     """
-    Returns the number of tokens in the content, using the model's encoding.
+    Returns the name of the model's encoding.
 
     If the model is unknown to tiktoken, it uses the GPT-3.5 encoding.
     """
     try:
-        encoding_name = tiktoken.encoding_name_for_model(model)
+        return tiktoken.encoding_name_for_model(model)
     except KeyError:
         encoding_name = tiktoken.encoding_name_for_model("gpt-3.5")
         logger.debug("Unknown model %s, using %s encoding", model, encoding_name)
-    return len(tiktoken.get_encoding(encoding_name).encode(content))
+        return encoding_name
+
+
+@lru_cache(
+    maxsize=256
+)  # Cache results in memory as system prompts and tools are counted at each completion, a few distinct values per process
+def _count_static_tokens(content: str, encoding: str) -> int:
+    """
+    Returns the number of tokens in a system prompt or a tool schema, using the encoding.
+    """
+    return _count_tokens(content, encoding)
+
+
+def _count_tokens(content: str, encoding: str) -> int:
+    """
+    Returns the number of tokens in the content, using the encoding.
+    """
+    return len(tiktoken.get_encoding(encoding).encode(content))
+
+
+def _report_usage(
+    platform: LlmAbstractPlatformModel,
+    usage: CompletionUsage | None,
+) -> None:
+    """
+    Report the prompt tokens served from the prompt cache of the LLM provider.
+
+    Cache is only used by the providers for long prompts, usually from 1024 tokens. The ratio is reported for all the completions, a low ratio means the prompt prefix changed.
+    """
+    if not usage or not usage.prompt_tokens:
+        return
+    details = usage.prompt_tokens_details
+    cached_tokens = (details.cached_tokens if details else None) or 0
+    gauge_set(
+        attributes={"llm.model": platform.model},
+        metric=call_llm_cached_ratio,
+        value=cached_tokens / usage.prompt_tokens,
+    )
+    counter_add(
+        attributes={"llm.model": platform.model},
+        metric=call_llm_cached_tokens,
+        value=cached_tokens,
+    )
+
+
+def _report_continuation(message: MessageModel, model: str) -> None:
+    """
+    Report the tokens of an answer resumed after it was cut off, compared to a new answer.
+
+    A new answer generates again the content already spoken, the resumed one only reads it as a prompt, with the instruction to continue it.
+    """
+    encoding = _encoding_name(model)
+    attributes = {"llm.model": model}
+    counter_add(
+        attributes={**attributes, "llm.tokens": "completion_saved"},
+        metric=call_llm_continuation_tokens,
+        value=_count_tokens(message.content, encoding),
+    )
+    counter_add(
+        attributes={**attributes, "llm.tokens": "prompt_added"},
+        metric=call_llm_continuation_tokens,
+        value=_count_static_tokens(
+            json.dumps(CONFIG.prompts.llm.chat_continuation()), encoding
+        ),
+    )
+
+
+def _backend_name(is_fast: bool) -> str:
+    """
+    Returns the name of an LLM backend, used in the metrics.
+    """
+    return "fast" if is_fast else "slow"
 
 
 async def _use_llm(
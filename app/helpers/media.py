@@ -0,0 +1,345 @@
+import asyncio
+import time
+import wave
+from binascii import a2b_base64, b2a_base64
+from collections import deque
+from functools import lru_cache
+from uuid import uuid4
+
+import numpy as np
+import orjson
+
+# Outbound envelopes are serialized once, only the audio payload is spliced in
+_AUDIO_DATA_PREFIX = '{"kind":"AudioData","audioData":{"data":"'
+_AUDIO_DATA_SUFFIX = '"}}'
+STOP_AUDIO_MESSAGE = '{"kind":"StopAudio","stopAudio":{}}'
+# Communication Services streams PCM 16-bit, 16 kHz, 1 channel, unless asked otherwise
+DEFAULT_SAMPLE_RATE = 16000
+# Bytes per sample, PCM 16-bit
+_SAMPLE_WIDTH = 2
+
+
+class AudioMetadata:
+    """
+    Audio format of a media stream, announced by Communication Services before the first audio.
+    """
+
+    channels: int
+    encoding: str
+    sample_rate: int
+
+    def __init__(self, channels: int, encoding: str, sample_rate: int):
+        self.channels = channels
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+
+
+def decode_audio_data(message: str | bytes) -> bytes | AudioMetadata | None:
+    """
+    Decode a media streaming message from Communication Services, in text or binary frame.
+
+    The envelope is parsed with orjson, then the base64 payload is decoded to PCM in a single pass. Payload bytes are owned by the caller, they can be queued safely.
+
+    Returns the PCM audio, the audio format if the message is the stream metadata, or `None` if the message is not audio, or is silent.
+    """
+    event = orjson.loads(message)
+    kind = event.get("kind")
+
+    # Audio format, sent once at the start of the stream
+    if kind == "AudioMetadata":
+        metadata: dict = event.get("audioMetadata") or {}
+        return AudioMetadata(
+            channels=metadata.get("channels", 1),
+            encoding=metadata.get("encoding", "PCM"),
+            sample_rate=metadata.get("sampleRate", DEFAULT_SAMPLE_RATE),
+        )
+
+    # Skip non-audio events
+    if kind != "AudioData":
+        return None
+
+    # Filter out silent audio
+    audio_data: dict = event.get("audioData") or {}
+    audio_base64: str | None = audio_data.get("data")
+    if audio_data.get("silent", True) or not audio_base64:
+        return None
+
+    return a2b_base64(audio_base64)
+
+
+def encode_audio_data(pcm: bytes) -> str:
+    """
+    Encode PCM audio to a media streaming message for Communication Services.
+    """
+    return (
+        _AUDIO_DATA_PREFIX
+        + b2a_base64(pcm, newline=False).decode("ascii")
+        + _AUDIO_DATA_SUFFIX
+    )
+
+
+class PlayoutMark:
+    """
+    End of an utterance in the outbound audio.
+
+    The mark is queued right after the last frame of its utterance, and follows it through the pipeline. The pacer resolves it once the frame is sent, with the time the client will have played it. If the audio is dropped (e.g. on barge-in), the mark is resolved at once, there is nothing left to play.
+    """
+
+    _played: asyncio.Event
+    id: str
+    played_at: float | None  # Time the client plays the last frame, once sent
+
+    def __init__(self):
+        self._played = asyncio.Event()
+        self.id = uuid4().hex
+        self.played_at = None
+
+    def played(self, at: float) -> None:
+        """
+        Resolve the mark, the client plays the utterance until `at`, in monotonic seconds.
+        """
+        if self.played_at is not None:
+            return
+        self.played_at = at
+        self._played.set()
+
+    async def wait(self, timeout_sec: float) -> bool:
+        """
+        Wait for the client to play the utterance, at most `timeout_sec`.
+
+        Returns `True` if the utterance was played, `False` if the timeout is reached.
+        """
+        deadline = time.monotonic() + timeout_sec
+        try:
+            await asyncio.wait_for(self._played.wait(), timeout=timeout_sec)
+        except TimeoutError:
+            return False
+        # Last frame is sent, wait for the client to play it
+        assert self.played_at is not None
+        await asyncio.sleep(max(0, min(self.played_at, deadline) - time.monotonic()))
+        return True
+
+
+class AudioPacer:
+    """
+    Pace outbound audio at real-time rate.
+
+    Synthesized audio arrives in bursts of arbitrary sizes, faster than real-time. It is cut in fixed frames, and sent by batches of several frames, only when the client playout buffer runs low. The client never holds more than `lead_ms` of audio, so a barge-in stops the bot voice quickly.
+
+    Time is passed by the caller, as monotonic seconds.
+    """
+
+    _batch_frames: int
+    _buffer: bytearray
+    _frame_bytes: int
+    _frame_sec: float
+    _last_push: float
+    _lead_sec: float
+    _marks: deque[tuple[int, PlayoutMark]]  # Marks, with the audio position they end
+    _playout_end: float
+    _popped: int  # Bytes sent, since the start
+    _pushed: int  # Bytes queued, since the start
+
+    def __init__(
+        self,
+        batch_ms: int,
+        lead_ms: int,
+        sample_rate: int,
+        frame_ms: int = 20,
+    ):
+        self._batch_frames = max(1, batch_ms // frame_ms)
+        self._buffer = bytearray()
+        self._frame_bytes = int(sample_rate * frame_ms / 1000) * 2  # PCM 16-bit
+        self._frame_sec = frame_ms / 1000
+        self._last_push = 0
+        self._lead_sec = max(lead_ms, batch_ms) / 1000
+        self._marks = deque()
+        self._playout_end = 0
+        self._popped = 0
+        self._pushed = 0
+
+    def push(self, pcm: bytes, now: float) -> None:
+        """
+        Queue audio to be sent.
+        """
+        self._buffer += pcm
+        self._last_push = now
+        self._pushed += len(pcm)
+
+    def mark(self, mark: PlayoutMark, now: float) -> None:
+        """
+        Track the end of an utterance, at the end of the audio queued.
+
+        The mark is resolved once the audio queued before it is sent.
+        """
+        if self._popped >= self._pushed:
+            mark.played(max(now, self._playout_end))
+            return
+        self._marks.append((self._pushed, mark))
+
+    def clear(self, now: float) -> None:
+        """
+        Drop the queued audio, and consider the client playout as stopped.
+
+        Marks waiting for the audio are resolved, it will never be played.
+        """
+        self._buffer.clear()
+        self._playout_end = now
+        self._popped = self._pushed
+        while self._marks:
+            _, mark = self._marks.popleft()
+            mark.played(now)
+
+    def wait_time(self, now: float) -> float | None:
+        """
+        Get the time to wait before the next batch is due, in seconds.
+
+        Returns `None` if no audio is queued.
+        """
+        if not self._buffer:
+            return None
+        due = self._playout_end - self._lead_sec + self._batch_frames * self._frame_sec
+        # Last partial frame is only sent once the synthesis paused, more audio may complete it
+        if len(self._buffer) < self._frame_bytes:
+            due = max(due, self._last_push + self._frame_sec)
+        return max(0, due - now)
+
+    def pop(self, now: float) -> bytes | None:
+        """
+        Get the next batch of frames, if due.
+
+        Returns `None` if the client has enough audio to play for now.
+        """
+        if self.wait_time(now) != 0:
+            return None
+
+        # Send whole frames, or the remainder at the end of the synthesis
+        frames = min(self._batch_frames, len(self._buffer) // self._frame_bytes)
+        size = frames * self._frame_bytes or len(self._buffer)
+        batch = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        # Advance the client playout clock
+        self._playout_end = (
+            max(now, self._playout_end) + size / self._frame_bytes * self._frame_sec
+        )
+
+        # Resolve the marks of the audio sent
+        self._popped += size
+        while self._marks and self._marks[0][0] <= self._popped:
+            _, mark = self._marks.popleft()
+            mark.played(self._playout_end)
+
+        return batch
+
+
+@lru_cache  # Decoded once per process, sounds are not expected to change
+def wav_frames(path: str, sample_rate: int, frame_ms: int = 20) -> tuple[bytes, ...]:
+    """
+    Decode a WAV file in PCM frames, at the sample rate.
+
+    File must be in PCM 16-bit, 1 channel, it is resampled if needed. The last frame is padded with silence.
+    """
+    with wave.open(path, "rb") as f:
+        if f.getnchannels() != 1 or f.getsampwidth() != _SAMPLE_WIDTH:
+            raise ValueError(
+                f"Expected PCM 16-bit, 1 channel in {path}, got {f.getsampwidth() * 8}-bit, {f.getnchannels()} channels."
+            )
+        file_rate = f.getframerate()
+        pcm = f.readframes(f.getnframes())
+
+    # Resample, linear interpolation is enough for a background sound
+    if file_rate != sample_rate:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        duration_sec = len(samples) / file_rate
+        pcm = (
+            np.interp(
+                np.arange(int(duration_sec * sample_rate)) / sample_rate,
+                np.arange(len(samples)) / file_rate,
+                samples,
+            )
+            .astype(np.int16)
+            .tobytes()
+        )
+
+    frame_bytes = int(sample_rate * frame_ms / 1000) * _SAMPLE_WIDTH
+    return tuple(
+        pcm[pointer : pointer + frame_bytes].ljust(frame_bytes, b"\x00")
+        for pointer in range(0, len(pcm), frame_bytes)
+    )
+
+
+class AudioLoop:
+    """
+    Loop a sound at real-time rate, to fill a wait.
+
+    Frames are emitted only `lead_ms` ahead of real-time, so a speech queued after them starts quickly. Stopping emits a last frame faded out, to avoid a click.
+
+    Time is passed by the caller, as monotonic seconds.
+    """
+
+    _frame_sec: float
+    _frames: tuple[bytes, ...]
+    _index: int
+    _lead_sec: float
+    _next: float | None
+
+    def __init__(self, frames: tuple[bytes, ...], lead_ms: int, frame_ms: int = 20):
+        self._frame_sec = frame_ms / 1000
+        self._frames = frames
+        self._index = 0
+        self._lead_sec = lead_ms / 1000
+        self._next = None
+
+    @property
+    def active(self) -> bool:
+        return self._next is not None
+
+    def start(self, now: float) -> None:
+        """
+        Start the loop from the beginning of the sound, if not already playing.
+        """
+        if self.active or not self._frames:
+            return
+        self._index = 0
+        self._next = now
+
+    def stop(self) -> bytes | None:
+        """
+        Stop the loop.
+
+        Returns the last frame, faded out, or `None` if the loop was not playing.
+        """
+        if not self.active:
+            return None
+        self._next = None
+        frame = np.frombuffer(self._frames[self._index], dtype=np.int16)
+        return (
+            (frame * np.linspace(1, 0, len(frame), dtype=np.float32))
+            .astype(np.int16)
+            .tobytes()
+        )
+
+    def wait_time(self, now: float) -> float | None:
+        """
+        Get the time to wait before the next frame is due, in seconds.
+
+        Returns `None` if the loop is not playing.
+        """
+        if self._next is None:
+            return None
+        return max(0, self._next - self._lead_sec - now)
+
+    def pop(self, now: float) -> bytes | None:
+        """
+        Get the next frame, if due.
+        """
+        if self.wait_time(now) != 0:
+            return None
+        assert self._next is not None
+
+        frame = self._frames[self._index]
+        self._index = (self._index + 1) % len(self._frames)
+        # Frames are played back-to-back, restart from now if the caller fell behind
+        self._next = max(self._next, now) + self._frame_sec
+        return frame
@@ -57,18 +57,56 @@ class SpanAttributeEnum(str, Enum):
 class SpanMeterEnum(str, Enum):
     CALL_ANSWER_LATENCY = "call.answer.latency"
     """Answer latency in seconds."""
+    CALL_AEC_DELAY = "call.aec.delay"
+    """Echo path delay compensated by the echo cancellation, in seconds."""
     CALL_AEC_MISSED = "call.aec.missed"
     """Echo cancellation missed frames."""
     CALL_AEC_DROPED = "call.aec.droped"
     """Echo cancellation dropped frames."""
+    CALL_AUDIO_CHANNEL_DEPTH = "call.audio.channel.depth"
+    """Audio items waiting in a channel."""
+    CALL_AUDIO_CHANNEL_DROPPED = "call.audio.channel.dropped"
+    """Audio items dropped by a full channel."""
     CALL_CUTOFF_LATENCY = "call.cutoff.latency"
     """Cutoff latency in seconds."""
+    CALL_DSP_PROCESSING_LATENCY = "call.dsp.processing.latency"
+    """DSP processing latency per frame in seconds."""
+    CALL_DSP_QUEUE_DEPTH = "call.dsp.queue.depth"
+    """DSP frames waiting to be processed."""
     CALL_FRAMES_IN_LATENCY = "call.frames.in.latency"
     """Audio frames in latency in seconds."""
     CALL_FRAMES_OUT_LATENCY = "call.frames.out.latency"
     """Audio frames out latency in seconds."""
+    CALL_LLM_CACHED_RATIO = "call.llm.cached.ratio"
+    """Prompt tokens served from the prompt cache of the LLM provider, as a ratio of the prompt tokens."""
+    CALL_LLM_CACHED_TOKENS = "call.llm.cached.tokens"
+    """Prompt tokens served from the prompt cache of the LLM provider."""
+    CALL_LLM_CONTINUATION_TOKENS = "call.llm.continuation.tokens"
+    """Tokens of the answers cut off by the maximum tokens, completion tokens not generated again as the answer is resumed, and prompt tokens added to resume it."""
+    CALL_LLM_CONTINUATIONS = "call.llm.continuations"
+    """Answers cut off by the maximum tokens, resumed where they stopped or restarted."""
+    CALL_LLM_STREAMS = "call.llm.streams"
+    """Streamed completions, per LLM backend answering, and the hedged one that won if any, to derive the hedge and win rates."""
+    CALL_LLM_TTFT = "call.llm.ttft"
+    """Time to first token of a streamed completion, per LLM backend, in seconds."""
+    CALL_SETUP_LATENCY = "call.setup.latency"
+    """Setup latency, from the media WebSocket accept to the first audio frame sent, in seconds."""
+    CALL_SPECULATION_HIT = "call.speculation.hit"
+    """Speculative answers used, the final transcript matched."""
+    CALL_SPECULATION_MISS = "call.speculation.miss"
+    """Speculative answers cancelled, the transcript or the history changed."""
+    CALL_SPECULATION_SAVED_LATENCY = "call.speculation.saved.latency"
+    """Answer latency saved by a speculative answer, in seconds."""
+    CALL_SPECULATION_WASTED_TOKENS = "call.speculation.wasted_tokens"
+    """Completion tokens of the cancelled speculative answers."""
     CALL_STT_COMPLETE_LATENCY = "call.stt.complete.latency"
     """Speech-to-text missed complete latency."""
+    CALL_TTS_CANCELLED = "call.tts.cancelled"
+    """Synthesis requests cancelled before being sent, like on barge-in."""
+    CALL_TTS_FIRST_AUDIO_LATENCY = "call.tts.first_audio.latency"
+    """Time-to-first-audio of the assistant turn, from the LLM request to the first synthesized audio, in seconds."""
+    CALL_TTS_QUEUE_LATENCY = "call.tts.queue.latency"
+    """Time a synthesis request waited before being sent, per lane, in seconds."""
 
     def counter(
         self,
@@ -123,21 +161,45 @@ meter = metrics.get_meter(
 )
 
 # Init metrics
+call_aec_delay = SpanMeterEnum.CALL_AEC_DELAY.gauge("s")
 call_aec_droped = SpanMeterEnum.CALL_AEC_DROPED.counter("frames")
 call_aec_missed = SpanMeterEnum.CALL_AEC_MISSED.counter("frames")
 call_answer_latency = SpanMeterEnum.CALL_ANSWER_LATENCY.gauge("s")
+call_audio_channel_depth = SpanMeterEnum.CALL_AUDIO_CHANNEL_DEPTH.gauge("items")
+call_audio_channel_dropped = SpanMeterEnum.CALL_AUDIO_CHANNEL_DROPPED.counter("items")
 call_cutoff_latency = SpanMeterEnum.CALL_CUTOFF_LATENCY.gauge("s")
+call_dsp_processing_latency = SpanMeterEnum.CALL_DSP_PROCESSING_LATENCY.gauge("s")
+call_dsp_queue_depth = SpanMeterEnum.CALL_DSP_QUEUE_DEPTH.gauge("frames")
 call_frames_in_latency = SpanMeterEnum.CALL_FRAMES_IN_LATENCY.gauge("s")
 call_frames_out_latency = SpanMeterEnum.CALL_FRAMES_OUT_LATENCY.gauge("s")
+call_llm_cached_ratio = SpanMeterEnum.CALL_LLM_CACHED_RATIO.gauge("ratio")
+call_llm_cached_tokens = SpanMeterEnum.CALL_LLM_CACHED_TOKENS.counter("tokens")
+call_llm_continuation_tokens = SpanMeterEnum.CALL_LLM_CONTINUATION_TOKENS.counter(
+    "tokens"
+)
+call_llm_continuations = SpanMeterEnum.CALL_LLM_CONTINUATIONS.counter("answers")
+call_llm_streams = SpanMeterEnum.CALL_LLM_STREAMS.counter("completions")
+call_llm_ttft = SpanMeterEnum.CALL_LLM_TTFT.gauge("s")
+call_setup_latency = SpanMeterEnum.CALL_SETUP_LATENCY.gauge("s")
+call_speculation_hit = SpanMeterEnum.CALL_SPECULATION_HIT.counter("answers")
+call_speculation_miss = SpanMeterEnum.CALL_SPECULATION_MISS.counter("answers")
+call_speculation_saved_latency = SpanMeterEnum.CALL_SPECULATION_SAVED_LATENCY.gauge("s")
+call_speculation_wasted_tokens = SpanMeterEnum.CALL_SPECULATION_WASTED_TOKENS.counter(
+    "tokens"
+)
 call_stt_complete_latency = SpanMeterEnum.CALL_STT_COMPLETE_LATENCY.gauge("s")
+call_tts_cancelled = SpanMeterEnum.CALL_TTS_CANCELLED.counter("requests")
+call_tts_first_audio_latency = SpanMeterEnum.CALL_TTS_FIRST_AUDIO_LATENCY.gauge("s")
+call_tts_queue_latency = SpanMeterEnum.CALL_TTS_QUEUE_LATENCY.gauge("s")
 
 
 def gauge_set(
     metric: Gauge,
     value: float | int,
+    attributes: dict[str, AttributeValue] | None = None,
 ):
     """
-    Set a gauge metric value with context attributes.
+    Set a gauge metric value with context attributes, plus optional specific attributes.
     """
     metric.set(
         amount=value,
@@ -146,6 +208,8 @@ def gauge_set(
             **_default_attributes,
             # Then, set context attributes, they can override default attributes
             **get_contextvars(),
+            # Finally, set metric specific attributes
+            **(attributes or {}),
         },
     )
 
@@ -153,9 +217,10 @@ def gauge_set(
 def counter_add(
     metric: Counter,
     value: float | int,
+    attributes: dict[str, AttributeValue] | None = None,
 ):
     """
-    Add a counter metric value with context attributes.
+    Add a counter metric value with context attributes, plus optional specific attributes.
     """
     metric.add(
         amount=value,
@@ -164,5 +229,7 @@ def counter_add(
             **_default_attributes,
             # Then, set context attributes, they can override default attributes
             **get_contextvars(),
+            # Finally, set metric specific attributes
+            **(attributes or {}),
         },
     )
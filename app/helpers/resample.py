@@ -0,0 +1,109 @@
+from functools import lru_cache
+from math import ceil, gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Resampler:
+    """
+    Resample a PCM 16-bit, 1 channel stream, with a polyphase filter.
+
+    The rate ratio is reduced to `up / down`. The stream is virtually upsampled by `up`, low-pass filtered under the lowest Nyquist frequency, then downsampled by `down`. Only the filtered samples kept are computed: each output sample is a dot product of the last input samples with one phase of the filter.
+
+    Filter taps are computed once per rate pair, and shared by all the calls of the process. A chunk is resampled with one vectorized product per filter phase, without a Python loop over the samples.
+
+    A resampler is stateful and dedicated to a single stream, the last input samples are kept to filter the next chunk. Audio is delayed by half the filter length, under 1 ms.
+    """
+
+    _down: int
+    _history: np.ndarray
+    _offset: int  # Upsampled position of the next output, from the next chunk start
+    _taps: np.ndarray
+    _up: int
+
+    def __init__(self, from_rate: int, to_rate: int, zero_crossings: int = 16):
+        """
+        Initialize the resampler.
+
+        Parameters:
+        - `from_rate`: Input sample rate in Hz.
+        - `to_rate`: Output sample rate in Hz.
+        - `zero_crossings`: Filter half-length, in samples of the lowest rate. Longer filters have a sharper cutoff, at a higher CPU cost.
+        """
+        ratio = gcd(from_rate, to_rate)
+        self._down = from_rate // ratio
+        self._up = to_rate // ratio
+        self._taps = _polyphase_taps(
+            down=self._down,
+            up=self._up,
+            zero_crossings=zero_crossings,
+        )
+        self._history = np.zeros(self._taps.shape[1] - 1, dtype=np.float32)
+        self._offset = 0
+
+    @property
+    def passthrough(self) -> bool:
+        """
+        True if the rates are the same, the audio is returned untouched.
+        """
+        return self._up == self._down
+
+    def process(self, pcm: bytes) -> bytes:
+        """
+        Resample a chunk of the stream.
+
+        Chunks can be of any size. The output of a chunk of `n` samples is `n * up / down` samples, rounded up or down depending on the previous chunks, the stream length is kept overall. Whole frames of the common rate multiple, like 20 ms frames at 8, 16 or 24 kHz, are always resampled to whole frames.
+        """
+        if self.passthrough or not pcm:
+            return pcm
+
+        # Inputs of the chunk, after the last ones of the previous chunk
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        signal = np.concatenate((self._history, samples))
+        windows = sliding_window_view(signal, self._taps.shape[1])
+
+        # Outputs are at every `down` upsampled position, until the end of the chunk
+        end = len(samples) * self._up
+        count = max(0, ceil((end - self._offset) / self._down))
+        outputs = np.empty(count, dtype=np.float32)
+
+        # Outputs `up` apart share the filter phase, and their windows are `down` inputs apart, each group is a single product
+        for first in range(min(self._up, count)):
+            position = self._offset + first * self._down
+            np.matmul(
+                windows[position // self._up :: self._down][
+                    : len(outputs[first :: self._up])
+                ],
+                self._taps[position % self._up],
+                out=outputs[first :: self._up],
+            )
+
+        # Keep the last inputs for the next chunk
+        self._history = signal[len(signal) - len(self._history) :]
+        self._offset += count * self._down - end
+
+        np.clip(outputs, -32768, 32767, out=outputs)
+        return np.rint(outputs).astype(np.int16).tobytes()
+
+
+@lru_cache  # Filters only depend on the rates, a few pairs per process
+def _polyphase_taps(down: int, up: int, zero_crossings: int) -> np.ndarray:
+    """
+    Design the low-pass filter of a rate ratio, split in `up` phases.
+
+    Filter is a windowed sinc, with a Kaiser window, cut at 90% of the lowest Nyquist frequency. The transition band ends around the Nyquist frequency, the aliasing it folds back is above the speech band.
+
+    Returns the phases, one per row, each one reversed to be applied to the inputs in chronological order.
+    """
+    factor = max(up, down)
+    per_phase = ceil(2 * zero_crossings * factor / up)
+    length = per_phase * up
+    cutoff = 0.9 / factor  # Relative to the Nyquist frequency of the upsampled stream
+    center = np.arange(length) - (length - 1) / 2
+    taps = cutoff * np.sinc(cutoff * center) * np.kaiser(length, 8)
+    # Each phase sees one input every `up` upsampled samples, restore the gain
+    taps *= up
+    return np.ascontiguousarray(
+        taps.reshape(per_phase, up).T[:, ::-1], dtype=np.float32
+    )
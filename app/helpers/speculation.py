@@ -0,0 +1,296 @@
+import asyncio
+import re
+import time
+from collections.abc import AsyncGenerator, Callable
+
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+
+from app.helpers.logging import logger
+from app.helpers.monitoring import (
+    call_speculation_hit,
+    call_speculation_miss,
+    call_speculation_saved_latency,
+    call_speculation_wasted_tokens,
+    counter_add,
+    gauge_set,
+)
+from app.helpers.timer import TimerHandle, TimerWheel
+from app.models.call import CallStateModel
+from app.models.message import (
+    MessageModel,
+    PersonaEnum as MessagePersonaEnum,
+)
+
+_NORMALIZE_R = re.compile(r"[^\w]+")
+
+
+def normalize_transcript(text: str) -> str:
+    """
+    Normalize a transcript to compare recognitions, case, punctuation and spacing are ignored.
+
+    Example:
+    - Input: "Hello, I moved to 123 Main Street."
+    - Output: "hello i moved to 123 main street"
+    """
+    return _NORMALIZE_R.sub(" ", text.lower()).strip()
+
+
+class Speculation:
+    """
+    LLM answer started ahead of the end of the user turn, on a partial transcript.
+
+    The completion runs in the background, its deltas are held back until the turn ends. Then, they are replayed at once, and followed as they arrive.
+
+    Only the completion is speculated, never the tools nor the speech, as they have side effects.
+    """
+
+    _deltas: list[ChoiceDelta]
+    _done: bool
+    _error: Exception | None
+    _first_delta_at: float | None
+    _messages: list[MessageModel]
+    _new_delta: asyncio.Event
+    _started_at: float
+    _task: asyncio.Task
+    text: str  # Normalized transcript
+
+    def __init__(
+        self,
+        messages: list[MessageModel],
+        stream: AsyncGenerator[ChoiceDelta, None],
+        text: str,
+    ):
+        """
+        Start the speculation.
+
+        Parameters:
+        - `messages`: Call history the completion is based on, ending with the speculated user message.
+        - `stream`: Completion stream.
+        - `text`: Speculated transcript.
+        """
+        self._deltas = []
+        self._done = False
+        self._error = None
+        self._first_delta_at = None
+        self._messages = messages
+        self._new_delta = asyncio.Event()
+        self._started_at = time.monotonic()
+        self._task = asyncio.create_task(self._consume(stream))
+        self.text = normalize_transcript(text)
+
+    def matches(self, call: CallStateModel) -> bool:
+        """
+        True if the call history is the one speculated, the last user message compared normalized.
+        """
+        return (
+            len(call.messages) == len(self._messages)
+            and call.messages[:-1] == self._messages[:-1]
+            and normalize_transcript(call.messages[-1].content) == self.text
+        )
+
+    def commit(self) -> None:
+        """
+        Report the speculation as used, with the latency saved.
+
+        The first delta is available earlier by the time the completion ran ahead, at most its own latency.
+        """
+        now = time.monotonic()
+        ahead = now - self._started_at
+        if self._first_delta_at:
+            ahead = min(ahead, self._first_delta_at - self._started_at)
+        counter_add(
+            metric=call_speculation_hit,
+            value=1,
+        )
+        gauge_set(
+            metric=call_speculation_saved_latency,
+            value=ahead,
+        )
+        logger.info("Speculation used, %.3f sec ahead", ahead)
+
+    def cancel(self) -> None:
+        """
+        Stop the completion, and report the tokens wasted.
+
+        Tokens are approximated by the deltas received, one per delta.
+        """
+        self._task.cancel()
+        counter_add(
+            metric=call_speculation_miss,
+            value=1,
+        )
+        counter_add(
+            metric=call_speculation_wasted_tokens,
+            value=len(self._deltas),
+        )
+        logger.debug("Speculation cancelled, %i deltas wasted", len(self._deltas))
+
+    async def deltas(self) -> AsyncGenerator[ChoiceDelta, None]:
+        """
+        Replay the deltas held back, then follow the completion.
+
+        The completion errors are raised as if the stream was consumed directly.
+        """
+        pointer = 0
+        while True:
+            # Release the deltas available
+            while pointer < len(self._deltas):
+                yield self._deltas[pointer]
+                pointer += 1
+
+            # Completion is over
+            if self._done:
+                if self._error:
+                    raise self._error
+                return
+
+            # Wait for the next delta
+            self._new_delta.clear()
+            await self._new_delta.wait()
+
+    async def _consume(self, stream: AsyncGenerator[ChoiceDelta, None]) -> None:
+        """
+        Hold back the deltas of the completion.
+        """
+        try:
+            async for delta in stream:
+                if self._first_delta_at is None:
+                    self._first_delta_at = time.monotonic()
+                self._deltas.append(delta)
+                self._new_delta.set()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._new_delta.set()
+
+
+class Speculator:
+    """
+    Speculative answers of a call, started once the partial transcript is stable.
+
+    Each change of the partial transcript arms a timer of `stable_ms` on the shared wheel. When it fires, the answer is speculated on a copy of the call, with the transcript as the user message. A final recognition is stable by definition, it is speculated at once.
+
+    At the end of the user turn, the speculation is taken if it matches the final call history, otherwise it is cancelled and the answer starts over.
+    """
+
+    _call: CallStateModel
+    _pending: str  # Normalized partial transcript, waiting to be stable
+    _speculation: Speculation | None
+    _stable_sec: float
+    _stream: Callable[[CallStateModel], AsyncGenerator[ChoiceDelta, None]]
+    _timer: TimerHandle | None
+    _wheel: TimerWheel
+
+    def __init__(
+        self,
+        call: CallStateModel,
+        stable_ms: int,
+        stream: Callable[[CallStateModel], AsyncGenerator[ChoiceDelta, None]],
+        wheel: TimerWheel,
+    ):
+        """
+        Initialize the speculator.
+
+        Parameters:
+        - `call`: Call, copied for each speculation.
+        - `stable_ms`: Duration a partial transcript must stay unchanged to be speculated.
+        - `stream`: Build the completion stream of a call.
+        - `wheel`: Timer wheel, shared by the calls.
+        """
+        self._call = call
+        self._pending = ""
+        self._speculation = None
+        self._stable_sec = stable_ms / 1000
+        self._stream = stream
+        self._timer = None
+        self._wheel = wheel
+
+    def on_transcript(self, text: str, final: bool) -> None:
+        """
+        Update the transcript of the user turn.
+
+        Parameters:
+        - `text`: Transcript of the turn, so far.
+        - `final`: True if the recognition is complete.
+        """
+        normalized = normalize_transcript(text)
+        if not normalized:
+            return
+
+        # Transcript changed, wait for it to be stable again
+        if normalized != self._pending:
+            self._pending = normalized
+            self._cancel_timer()
+            if not final:
+                self._timer = self._wheel.schedule(
+                    callback=lambda: self._speculate(text),
+                    deadline=self._wheel.now() + self._stable_sec,
+                )
+
+        # Final recognition, speculate now
+        if final:
+            self._cancel_timer()
+            self._speculate(text)
+
+    def take(self, call: CallStateModel) -> Speculation | None:
+        """
+        Take the speculation of the turn, if it matches the call history, ending with the final user message.
+
+        The speculator is reset for the next turn.
+        """
+        self._cancel_timer()
+        self._pending = ""
+        speculation, self._speculation = self._speculation, None
+        if not speculation:
+            return None
+
+        # Transcript or history changed, start over
+        if not speculation.matches(call):
+            speculation.cancel()
+            return None
+
+        speculation.commit()
+        return speculation
+
+    def close(self) -> None:
+        """
+        Cancel the timer and the running speculation.
+        """
+        self._cancel_timer()
+        if self._speculation:
+            self._speculation.cancel()
+            self._speculation = None
+
+    def _speculate(self, text: str) -> None:
+        """
+        Start the answer to a transcript, on a copy of the call.
+        """
+        self._timer = None
+
+        # Already speculated
+        normalized = normalize_transcript(text)
+        if self._speculation and self._speculation.text == normalized:
+            return
+
+        # Replace the previous speculation
+        if self._speculation:
+            self._speculation.cancel()
+        call = self._call.model_copy(deep=True)
+        call.messages.append(
+            MessageModel(
+                content=text,
+                persona=MessagePersonaEnum.HUMAN,
+            )
+        )
+        logger.debug("Speculating answer to: %s", text)
+        self._speculation = Speculation(
+            messages=call.messages,
+            stream=self._stream(call),
+            text=text,
+        )
+
+    def _cancel_timer(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
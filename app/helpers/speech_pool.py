@@ -0,0 +1,233 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+from weakref import WeakKeyDictionary, WeakSet
+
+from azure.cognitiveservices.speech import (
+    Connection,
+    SpeechRecognizer,
+    SpeechSynthesizer,
+)
+from azure.core.credentials import AccessToken
+
+from app.helpers.identity import credential
+from app.helpers.logging import logger
+
+T = TypeVar("T", SpeechRecognizer, SpeechSynthesizer)
+
+_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+class SpeechPool:
+    """
+    Warm Speech SDK clients, shared by all the calls of a process.
+
+    Creating and connecting a client is on the critical path of the call setup, before the user hears the bot. The pool creates the clients ahead, already connected, per key (e.g. the language and the voice):
+
+    - A call takes a client at start, then the pool creates a new one in the background, to keep `size` clients ready
+    - Synthesizers are given back at hangup, and reused by the next calls; recognizers are bound to the audio stream of their call, they are discarded
+    - Clients idle for longer than `idle_ttl_sec` are discarded, the service closes idle connections anyway
+
+    The AAD token is cached, and refreshed in the background before it expires, on the new and the live clients.
+
+    Not thread-safe, must be used from the event loop.
+    """
+
+    _connections: WeakKeyDictionary[SpeechRecognizer | SpeechSynthesizer, Connection]
+    _filling: set[Hashable]
+    _idle: dict[Hashable, deque[tuple[float, SpeechRecognizer | SpeechSynthesizer]]]
+    _idle_ttl_sec: int
+    _live: WeakSet[SpeechRecognizer | SpeechSynthesizer]
+    _refresh_lock: asyncio.Lock | None
+    _refresh_margin_sec: int
+    _refresh_task: asyncio.Task | None
+    _resource_id: str
+    _size: int
+    _tasks: set[asyncio.Task]
+    _token: AccessToken | None
+
+    def __init__(
+        self,
+        idle_ttl_sec: int,
+        refresh_margin_sec: int,
+        resource_id: str,
+        size: int,
+    ):
+        """
+        Initialize the pool.
+
+        Parameters:
+        - `idle_ttl_sec`: Longest time a client waits in the pool.
+        - `refresh_margin_sec`: Time before the token expiration to refresh it.
+        - `resource_id`: Azure resource ID of the Speech service, for the AAD auth.
+        - `size`: Clients kept ready, per key.
+        """
+        self._connections = WeakKeyDictionary()
+        self._filling = set()
+        self._idle = {}
+        self._idle_ttl_sec = idle_ttl_sec
+        self._live = WeakSet()
+        self._refresh_lock = None
+        self._refresh_margin_sec = refresh_margin_sec
+        self._refresh_task = None
+        self._resource_id = resource_id
+        self._size = size
+        self._tasks = set()
+        self._token = None
+
+    async def token(self) -> str:
+        """
+        Get the AAD token, formatted for the Speech SDK.
+
+        The token is only fetched on the first call, or if the background refresh failed until its expiration.
+        """
+        if not self._token or self._token.expires_on <= time.time():
+            await self._refresh()
+
+        # Refresh in the background from now
+        if not self._refresh_task:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+        assert self._token
+        return self._format(self._token)
+
+    async def acquire(self, key: Hashable, factory: Callable[[str], T]) -> T:
+        """
+        Take a client from the pool, or create it if none is ready.
+
+        The pool is refilled in the background.
+
+        Parameters:
+        - `key`: Key of the clients built by the factory.
+        - `factory`: Build a client from a token, must be the same for a key.
+        """
+        client = self._pop(key)
+        if client is None:
+            logger.debug("No warm Speech client for %s, creating one", key)
+            client = self._create(factory, await self.token())
+        self._spawn(self.fill(key, factory))
+        return client  # pyright: ignore
+
+    def release(
+        self,
+        key: Hashable,
+        client: SpeechRecognizer | SpeechSynthesizer,
+        reusable: bool,
+    ) -> None:
+        """
+        Give a client back to the pool, at the end of the call.
+
+        If `reusable` is `False`, or the pool is full, the client is discarded.
+        """
+        idle = self._expire(key)
+        if not reusable or len(idle) >= self._size:
+            return
+        idle.append((time.monotonic(), client))
+
+    async def fill(self, key: Hashable, factory: Callable[[str], T]) -> None:
+        """
+        Create clients until `size` are ready for a key.
+
+        Errors are logged, a failed fill only costs the latency of the next call.
+        """
+        if key in self._filling:
+            return
+        self._filling.add(key)
+        try:
+            idle = self._expire(key)
+            while len(idle) < self._size:
+                client = self._create(factory, await self.token())
+                idle.append((time.monotonic(), client))
+        except Exception:
+            logger.exception("Failed to create warm Speech clients for %s", key)
+        finally:
+            self._filling.discard(key)
+
+    def _create(self, factory: Callable[[str], T], token: str) -> T:
+        """
+        Create a client, and open its connection without waiting for a request.
+        """
+        client = factory(token)
+        if isinstance(client, SpeechRecognizer):
+            connection = Connection.from_recognizer(client)
+        else:
+            connection = Connection.from_speech_synthesizer(client)
+        connection.open(for_continuous_recognition=isinstance(client, SpeechRecognizer))
+        # Keep the connection with its client
+        self._connections[client] = connection
+        self._live.add(client)
+        return client
+
+    def _pop(self, key: Hashable) -> SpeechRecognizer | SpeechSynthesizer | None:
+        """
+        Take the most recently used client of a key, its connection is the most likely to be open.
+        """
+        idle = self._expire(key)
+        if not idle:
+            return None
+        _, client = idle.pop()
+        return client
+
+    def _expire(
+        self, key: Hashable
+    ) -> deque[tuple[float, SpeechRecognizer | SpeechSynthesizer]]:
+        """
+        Discard the clients idle for too long, the oldest are first.
+        """
+        idle = self._idle.setdefault(key, deque())
+        deadline = time.monotonic() - self._idle_ttl_sec
+        while idle and idle[0][0] < deadline:
+            idle.popleft()
+        return idle
+
+    async def _refresh(self) -> None:
+        """
+        Fetch a new token, then apply it to the live clients.
+
+        Concurrent callers wait for a single fetch.
+        """
+        if not self._refresh_lock:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Already refreshed by a concurrent caller
+            if (
+                self._token
+                and self._token.expires_on - self._refresh_margin_sec > time.time()
+            ):
+                return
+            self._token = await (await credential()).get_token(_SCOPE)
+            token = self._format(self._token)
+            for client in self._live:
+                client.authorization_token = token
+            logger.debug("Speech token refreshed, for %i clients", len(self._live))
+
+    async def _refresh_loop(self) -> None:
+        """
+        Refresh the token before it expires, as long as the process runs.
+        """
+        while True:
+            assert self._token
+            await asyncio.sleep(
+                max(
+                    self._token.expires_on - self._refresh_margin_sec - time.time(),
+                    0,
+                )
+            )
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception("Failed to refresh the Speech token, retrying")
+                await asyncio.sleep(10)
+
+    def _format(self, token: AccessToken) -> str:
+        return f"aad#{self._resource_id}#{token.token}"
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        """
+        Run a task in the background, keeping a reference until it is done.
+        """
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
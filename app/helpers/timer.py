@@ -0,0 +1,160 @@
+import asyncio
+import math
+import time
+from collections.abc import Callable
+
+from app.helpers.logging import logger
+
+
+class TimerHandle:
+    """
+    Timer scheduled in a `TimerWheel`.
+    """
+
+    _callback: Callable[[], None]
+    _tick: int
+    _wheel: "TimerWheel"
+    cancelled: bool
+
+    def __init__(self, callback: Callable[[], None], tick: int, wheel: "TimerWheel"):
+        self._callback = callback
+        self._tick = tick
+        self._wheel = wheel
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Cancel the timer, in O(1). Cancelling a fired or cancelled timer does nothing.
+        """
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._wheel._remove(self)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel, shared by all the calls of a process.
+
+    Timers are stored in a ring of slots, one per tick, a timer further than a full turn waits in its slot for the next turns. Scheduling and cancelling are O(1) and do not allocate tasks, so the call state machines can arm and disarm their timers on every speech transition.
+
+    A single loop callback per process drives the wheel, only while timers are pending. Timers fire in the event loop, with a precision of one tick. Callbacks must not block.
+
+    The wheel can also be driven manually with `advance`, with an injected clock, for deterministic tests.
+    """
+
+    _clock: Callable[[], float]
+    _count: int
+    _driver: asyncio.TimerHandle | None
+    _slots: list[set[TimerHandle]]
+    _tick: int
+    _tick_sec: float
+
+    def __init__(
+        self,
+        slots: int,
+        tick_ms: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the wheel.
+
+        Parameters:
+        - `slots`: Number of ticks in a turn of the wheel.
+        - `tick_ms`: Duration of a tick, the timer precision.
+        - `clock`: Monotonic clock, in seconds.
+        """
+        self._clock = clock
+        self._count = 0
+        self._driver = None
+        self._slots = [set() for _ in range(slots)]
+        self._tick_sec = tick_ms / 1000
+        self._tick = int(clock() / self._tick_sec + 1e-9)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def now(self) -> float:
+        """
+        Current time of the wheel clock, in seconds.
+        """
+        return self._clock()
+
+    def schedule(self, deadline: float, callback: Callable[[], None]) -> TimerHandle:
+        """
+        Schedule a callback at a deadline, in seconds of the wheel clock.
+
+        Returns a handle to cancel the timer.
+        """
+        # Round up, a timer never fires early, and a past deadline fires at the next tick
+        tick = max(math.ceil(deadline / self._tick_sec - 1e-9), self._tick + 1)
+        handle = TimerHandle(
+            callback=callback,
+            tick=tick,
+            wheel=self,
+        )
+        self._slots[tick % len(self._slots)].add(handle)
+        self._count += 1
+        self._arm()
+        return handle
+
+    def advance(self, now: float) -> None:
+        """
+        Fire the timers expired at a time, in order of deadline.
+        """
+        target = int(now / self._tick_sec + 1e-9)  # Tolerate the float rounding
+
+        # Nothing to fire, jump straight to the target
+        if not self._count:
+            self._tick = max(self._tick, target)
+            return
+
+        # Visit each slot at most once, a larger gap is a full turn
+        first = self._tick + 1
+        last = min(target, self._tick + len(self._slots))
+        due: list[TimerHandle] = []
+        for tick in range(first, last + 1):
+            slot = self._slots[tick % len(self._slots)]
+            due.extend(handle for handle in slot if handle._tick <= target)
+        self._tick = max(self._tick, target)
+
+        # Fire, a callback may schedule or cancel other timers
+        for handle in sorted(due, key=lambda handle: handle._tick):
+            if handle.cancelled:
+                continue
+            handle.cancelled = True
+            self._remove(handle)
+            try:
+                handle._callback()
+            except Exception:
+                logger.exception("Timer callback failed")
+
+    def _remove(self, handle: TimerHandle) -> None:
+        """
+        Remove a timer from its slot.
+        """
+        self._slots[handle._tick % len(self._slots)].discard(handle)
+        self._count -= 1
+
+        # Stop the driver when idle
+        if not self._count and self._driver:
+            self._driver.cancel()
+            self._driver = None
+
+    def _arm(self) -> None:
+        """
+        Start the driver, if timers are pending.
+        """
+        if self._driver or not self._count:
+            return
+        self._driver = asyncio.get_running_loop().call_later(
+            self._tick_sec, self._on_tick
+        )
+
+    def _on_tick(self) -> None:
+        """
+        Advance the wheel to the current time, then wait for the next tick.
+        """
+        self._driver = None
+        self.advance(self._clock())
+        self._arm()
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+
+from azure.communication.callautomation import SsmlSource
+
+from app.helpers.logging import logger
+from app.persistence.icache import ICache
+
+
+class TtsCache:
+    """
+    Cache of synthesized speech, as raw PCM 16-bit, 1 channel, at the synthesizer sample rate.
+
+    Audio is keyed by the SSML, the custom voice endpoint and the sample rate, so by the text, the voice, the language, the style, the prosody rate and the audio format.
+
+    Two levels are used:
+
+    - A local file store, memory-mapped, the pages are shared by the workers of the host and read without copy
+    - The remote cache (e.g. Redis), shared by the hosts, it fills the local store on a miss
+    """
+
+    _cache: ICache
+    _maps: dict[str, mmap.mmap]
+    _path: Path
+    _sample_rate: int
+    _ttl_sec: int
+
+    def __init__(self, cache: ICache, path: str, sample_rate: int, ttl_sec: int):
+        """
+        Initialize the cache.
+
+        Parameters:
+        - `cache`: Remote cache, shared by the hosts.
+        - `path`: Folder of the local file store, created if missing.
+        - `sample_rate`: Sample rate of the synthesized audio, in Hz.
+        - `ttl_sec`: Time to live of the audio in the remote cache.
+        """
+        self._cache = cache
+        self._maps = {}
+        self._path = Path(path)
+        self._sample_rate = sample_rate
+        self._ttl_sec = ttl_sec
+        self._path.mkdir(
+            exist_ok=True,
+            parents=True,
+        )
+
+    def key(self, ssml: SsmlSource) -> str:
+        """
+        Build the key of a synthesized SSML.
+        """
+        text = f"{ssml.custom_voice_endpoint_id}-{self._sample_rate}-{ssml.ssml_text}"
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    async def get(self, key: str) -> memoryview | None:
+        """
+        Get the audio of a key.
+
+        The view is read-only and stays valid for the life of the process. Returns `None` if the audio is not cached.
+        """
+        # Try the local store
+        audio = self._local_get(key)
+        if audio is not None:
+            return audio
+
+        # Try the remote cache, then store locally
+        remote = await self._cache.get(self._remote_key(key))
+        if not remote:
+            return None
+        await asyncio.to_thread(self._local_set, key, remote)
+        return self._local_get(key) or memoryview(remote)
+
+    async def set(self, key: str, pcm: bytes) -> None:
+        """
+        Store the audio of a key, locally and in the remote cache.
+        """
+        if not pcm:
+            return
+        await asyncio.to_thread(self._local_set, key, pcm)
+        await self._cache.set(
+            key=self._remote_key(key),
+            ttl_sec=self._ttl_sec,
+            value=pcm,
+        )
+
+    def _local_get(self, key: str) -> memoryview | None:
+        """
+        Get the audio of a key from the local store, mapped in memory on first access.
+        """
+        audio = self._maps.get(key)
+        if audio is None:
+            try:
+                with (self._path / f"{key}.pcm").open("rb") as f:
+                    audio = mmap.mmap(
+                        access=mmap.ACCESS_READ,
+                        fileno=f.fileno(),
+                        length=0,
+                    )
+            # Missing or empty file
+            except (FileNotFoundError, ValueError):
+                return None
+            self._maps[key] = audio
+        return memoryview(audio)
+
+    def _local_set(self, key: str, pcm: bytes) -> None:
+        """
+        Write the audio of a key in the local store.
+
+        The file is replaced atomically, a concurrent reader never sees a partial audio.
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self._path,
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pcm)
+            Path(tmp_path).replace(self._path / f"{key}.pcm")
+        except OSError:
+            logger.exception("Failed to store synthesized audio locally")
+            Path(tmp_path).unlink(missing_ok=True)
+
+    @staticmethod
+    def _remote_key(key: str) -> str:
+        return f"{__name__}-{key}"
+
+
+async def prewarm() -> None:
+    """
+    Synthesize the fixed prompts, for each available language, in the cache.
+
+    Audio already cached is skipped, so the command can be run at each deployment.
+    """
+    from app.helpers.call_utils import tts_cache_fill
+    from app.helpers.config import CONFIG
+    from app.models.call import CallInitiateModel, CallStateModel
+
+    # Prompts only depend on the bot and the language, the bot calls itself
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number=CONFIG.communication_services.phone_number,
+        ),
+    )
+    for lang in call.initiate.lang.availables:
+        call.lang = lang.short_code
+        texts = await CONFIG.prompts.tts.variants(call)
+        logger.info("Pre-warming %i TTS prompts in %s", len(texts), lang.short_code)
+        for text in texts:
+            await tts_cache_fill(
+                call=call,
+                text=text,
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(prewarm())
@@ -0,0 +1,170 @@
+import contextvars
+import time
+from collections import deque
+from collections.abc import Callable
+from enum import Enum
+
+from app.helpers.logging import logger
+from app.helpers.media import PlayoutMark
+from app.helpers.monitoring import (
+    call_tts_cancelled,
+    call_tts_queue_latency,
+    counter_add,
+    gauge_set,
+)
+
+
+class TtsLaneEnum(str, Enum):
+    """
+    Priority lanes of the synthesis requests, the first lanes are sent first.
+    """
+
+    SYSTEM = "system"
+    """Fixed prompts, like the welcome, the timeouts, the errors and the goodbye."""
+    CONTENT = "content"
+    """LLM answer and tools phrases."""
+
+
+class _Utterance:
+    """
+    Synthesis request, waiting to be sent.
+    """
+
+    context: contextvars.Context  # Context of the caller, for the metrics
+    lane: TtsLaneEnum
+    mark: PlayoutMark | None
+    queued_at: float
+    speak: Callable[[], None]
+    turn: str | None
+
+    def __init__(
+        self,
+        lane: TtsLaneEnum,
+        mark: PlayoutMark | None,
+        speak: Callable[[], None],
+        turn: str | None,
+    ):
+        self.context = contextvars.copy_context()
+        self.lane = lane
+        self.mark = mark
+        self.queued_at = time.monotonic()
+        self.speak = speak
+        self.turn = turn
+
+
+class TtsScheduler:
+    """
+    Synthesis requests of a call, sent in order to the synthesizer.
+
+    Requests are queued, then sent when the synthesizer has room:
+
+    - FIFO within a lane, the system prompts are sent before the LLM content
+    - At most `max_in_flight` requests are sent and not completed, the next ones wait
+    - Requests of a turn not sent yet can be cancelled, like on barge-in, the other turns are kept
+
+    The time a request waited in the queue is reported, per lane.
+
+    Not thread-safe, must be used from the event loop.
+    """
+
+    _in_flight: int
+    _lanes: dict[TtsLaneEnum, deque[_Utterance]]
+    _max_in_flight: int
+
+    def __init__(self, max_in_flight: int):
+        """
+        Initialize the scheduler.
+
+        Parameters:
+        - `max_in_flight`: Requests sent and not completed, at most.
+        """
+        self._in_flight = 0
+        self._lanes = {lane: deque() for lane in TtsLaneEnum}
+        self._max_in_flight = max_in_flight
+
+    @property
+    def idle(self) -> bool:
+        """
+        True if no request is queued nor being synthesized.
+        """
+        return not self._in_flight and not any(self._lanes.values())
+
+    def submit(
+        self,
+        speak: Callable[[], None],
+        lane: TtsLaneEnum = TtsLaneEnum.CONTENT,
+        mark: PlayoutMark | None = None,
+        turn: str | None = None,
+    ) -> None:
+        """
+        Queue a request, it is sent as soon as the synthesizer has room.
+
+        Parameters:
+        - `speak`: Send the request to the synthesizer.
+        - `lane`: Priority lane.
+        - `mark`: Playout mark of the request, resolved if it is cancelled.
+        - `turn`: Turn the request belongs to, to cancel it.
+        """
+        self._lanes[lane].append(
+            _Utterance(
+                lane=lane,
+                mark=mark,
+                speak=speak,
+                turn=turn,
+            )
+        )
+        self._pump()
+
+    def done(self) -> None:
+        """
+        Notify a request was completed or cancelled by the synthesizer, then send the next ones.
+        """
+        self._in_flight = max(0, self._in_flight - 1)
+        self._pump()
+
+    def cancel(self, turn: str) -> int:
+        """
+        Drop the requests of a turn not sent yet.
+
+        Their playout marks are resolved, they will never be played.
+
+        Returns the number of requests dropped.
+        """
+        dropped = 0
+        for queue in self._lanes.values():
+            kept = deque(utterance for utterance in queue if utterance.turn != turn)
+            for utterance in queue:
+                if utterance.turn != turn:
+                    continue
+                dropped += 1
+                if utterance.mark:
+                    utterance.mark.played(time.monotonic())
+            queue.clear()
+            queue.extend(kept)
+
+        if dropped:
+            logger.debug("Cancelled %i TTS requests of turn %s", dropped, turn)
+            counter_add(
+                metric=call_tts_cancelled,
+                value=dropped,
+            )
+        return dropped
+
+    def _pump(self) -> None:
+        """
+        Send the queued requests, by lane priority, while the synthesizer has room.
+        """
+        while self._in_flight < self._max_in_flight:
+            utterance = next(
+                (queue.popleft() for queue in self._lanes.values() if queue), None
+            )
+            if not utterance:
+                return
+            self._in_flight += 1
+            utterance.context.run(
+                gauge_set,
+                attributes={"tts.lane": utterance.lane.value},
+                metric=call_tts_queue_latency,
+                value=time.monotonic() - utterance.queued_at,
+            )
+            utterance.speak()
@@ -0,0 +1,345 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from enum import Enum
+
+from app.helpers.logging import logger
+from app.helpers.timer import TimerHandle, TimerWheel
+from app.models.call import CallStateModel
+
+
+class TurnStateEnum(str, Enum):
+    ANSWERED = "answered"
+    """User turn is over and the answer started, waiting for the user or the phone silence timeout."""
+    SILENCE = "silence"
+    """User stopped speaking, waiting for the silence timeout to end the turn."""
+    SPEECH = "speech"
+    """User is speaking."""
+    START = "start"
+    """Call started, no frame received yet."""
+
+
+class TurnTaking:
+    """
+    Turn-taking state machine, for a single call.
+
+    Driven by the speech decision of each audio frame, with its timestamp. Timeouts are timers of the shared wheel, armed and disarmed on the state transitions, never on each frame:
+
+    - Speech longer than `cutoff_ms` stops the bot, to let the user speak
+    - Silence longer than `silence_ms` ends the user turn, and triggers the answer
+    - Then, each `phone_silence_sec` without interaction triggers the phone silence timeout
+
+    Callbacks run as tasks, so a slow callback never delays the frames. The response callback still running when the user speaks again is cancelled, it must protect the commit of the recognition from the cancellation. Timeouts are snapshotted when the call starts, a change of the features applies to the next calls.
+    """
+
+    _call: CallStateModel
+    _callbacks: set[asyncio.Task]
+    _cutoff_armed: bool
+    _cutoff_sec: float
+    _cutoff_timer: TimerHandle | None
+    _phone_silence_sec: int
+    _phone_silence_start: datetime | None
+    _phone_silence_timer: TimerHandle | None
+    _response_callback: Callable[[], Awaitable[None]]
+    _response_task: asyncio.Task | None
+    _silence_sec: float
+    _silence_timer: TimerHandle | None
+    _state: TurnStateEnum
+    _stop_callback: Callable[[], Awaitable[None]]
+    _timeout_callback: Callable[[], Awaitable[None]]
+    _wheel: TimerWheel
+
+    def __init__(  # noqa: PLR0913
+        self,
+        call: CallStateModel,
+        cutoff_ms: int,
+        phone_silence_sec: int,
+        response_callback: Callable[[], Awaitable[None]],
+        silence_ms: int,
+        stop_callback: Callable[[], Awaitable[None]],
+        timeout_callback: Callable[[], Awaitable[None]],
+        wheel: TimerWheel,
+    ):
+        """
+        Initialize the state machine.
+
+        Parameters:
+        - `call`: Call, to check its progress and last interaction.
+        - `cutoff_ms`: Speech duration before stopping the bot.
+        - `phone_silence_sec`: Silence duration before the phone silence timeout.
+        - `response_callback`: Triggered when the user turn ends.
+        - `silence_ms`: Silence duration before ending the user turn.
+        - `stop_callback`: Triggered when the bot must stop speaking.
+        - `timeout_callback`: Triggered on the phone silence timeout.
+        - `wheel`: Timer wheel, shared by the calls.
+        """
+        self._call = call
+        self._callbacks = set()
+        self._cutoff_armed = False
+        self._cutoff_sec = cutoff_ms / 1000
+        self._cutoff_timer = None
+        self._phone_silence_sec = phone_silence_sec
+        self._phone_silence_start = None
+        self._phone_silence_timer = None
+        self._response_callback = response_callback
+        self._response_task = None
+        self._silence_sec = silence_ms / 1000
+        self._silence_timer = None
+        self._state = TurnStateEnum.START
+        self._stop_callback = stop_callback
+        self._timeout_callback = timeout_callback
+        self._wheel = wheel
+
+    @property
+    def state(self) -> TurnStateEnum:
+        return self._state
+
+    def on_frame(self, is_speech: bool, now: float) -> None:
+        """
+        Update the state with an audio frame.
+
+        Parameters:
+        - `is_speech`: True if the user speaks in the frame.
+        - `now`: Frame timestamp, in seconds of the wheel clock.
+        """
+        # Silence, start the end of turn timeout, only once per turn
+        if not is_speech:
+            if self._state in (TurnStateEnum.START, TurnStateEnum.SPEECH):
+                self._state = TurnStateEnum.SILENCE
+                self._silence_timer = self._wheel.schedule(
+                    callback=self._on_silence,
+                    deadline=now + self._silence_sec,
+                )
+            return
+
+        # Voice detected, the user turn continues, the answer to the previous words is abandoned
+        if self._state != TurnStateEnum.SPEECH:
+            self._state = TurnStateEnum.SPEECH
+            self._cancel_silence()
+            self._cancel_response()
+
+        # Start the bot cutoff timeout, only once per turn
+        if not self._cutoff_armed:
+            self._cutoff_armed = True
+            self._cutoff_timer = self._wheel.schedule(
+                callback=self._on_cutoff,
+                deadline=now + self._cutoff_sec,
+            )
+
+    def close(self) -> None:
+        """
+        Cancel the timers and the running callbacks.
+        """
+        self._cancel_silence()
+        if self._cutoff_timer:
+            self._cutoff_timer.cancel()
+            self._cutoff_timer = None
+        for task in self._callbacks:
+            task.cancel()
+
+    def _on_cutoff(self) -> None:
+        """
+        Stop the TTS, the user speaks for too long.
+        """
+        self._cutoff_timer = None
+        logger.info("Stoping TTS after %i ms", self._cutoff_sec * 1000)
+        self._spawn(self._stop_callback())
+
+    def _on_silence(self) -> None:
+        """
+        End the user turn, then wait for the phone silence timeout.
+        """
+        self._silence_timer = None
+        self._state = TurnStateEnum.ANSWERED
+
+        # Cancel the cutoff, the next turn starts a new one
+        if self._cutoff_timer:
+            self._cutoff_timer.cancel()
+            self._cutoff_timer = None
+        self._cutoff_armed = False
+
+        # Flush the audio buffer
+        logger.debug("Flushing audio buffer after %i ms", self._silence_sec * 1000)
+        self._response_task = self._spawn(self._response_callback())
+
+        # Wait for silence and trigger timeout
+        self._arm_phone_silence()
+
+    def _on_phone_silence(self) -> None:
+        """
+        Trigger the phone silence timeout, if no interaction happened in the meantime.
+        """
+        self._phone_silence_timer = None
+
+        # Stop if the call ended
+        if not self._call.in_progress:
+            return
+
+        # Cancel if an interaction happened in the meantime
+        if (
+            self._call.last_interaction_at
+            and self._phone_silence_start
+            and self._call.last_interaction_at
+            + timedelta(seconds=self._phone_silence_sec)
+            > self._phone_silence_start
+        ):
+            logger.debug("Message sent in the meantime, canceling this silence timeout")
+
+        # Trigger the timeout
+        else:
+            logger.info("Silence triggered after %i sec", self._phone_silence_sec)
+            self._spawn(self._timeout_callback())
+
+        # Wait for the next timeout
+        self._arm_phone_silence()
+
+    def _arm_phone_silence(self) -> None:
+        """
+        Start the phone silence timeout, from now.
+        """
+        self._phone_silence_start = datetime.now(UTC)
+        self._phone_silence_timer = self._wheel.schedule(
+            callback=self._on_phone_silence,
+            deadline=self._wheel.now() + self._phone_silence_sec,
+        )
+
+    def _cancel_silence(self) -> None:
+        """
+        Cancel the end of turn and the phone silence timeouts.
+        """
+        if self._silence_timer:
+            self._silence_timer.cancel()
+            self._silence_timer = None
+        if self._phone_silence_timer:
+            self._phone_silence_timer.cancel()
+            self._phone_silence_timer = None
+
+    def _cancel_response(self) -> None:
+        """
+        Cancel the response callback, if still running.
+        """
+        if self._response_task:
+            self._response_task.cancel()
+            self._response_task = None
+
+    def _spawn(self, coro: Awaitable[None]) -> asyncio.Task:
+        """
+        Run a callback in the background, keeping a reference until it is done.
+        """
+        task = asyncio.ensure_future(coro)
+        self._callbacks.add(task)
+        task.add_done_callback(self._on_callback_done)
+        return task
+
+    def _on_callback_done(self, task: asyncio.Task) -> None:
+        """
+        Release a callback, and report its failure.
+        """
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error("Turn callback failed", exc_info=task.exception())
+
+
+class AnswerSupervisor:
+    """
+    Supervise the answer of a turn, while the LLM is processing it.
+
+    The supervisor waits on the answer, the timeouts and the loading ticks at once, and reacts as soon as the first of them is done, never on a polling interval:
+
+    - Answer done, the turn ends immediately
+    - Hard timeout reached, the answer is abandoned
+    - Soft timeout reached while the bot is silent, the timeout prompt is spoken, once
+    - Each `loading_sec` while the bot is silent, the loading sound is started
+
+    Once the bot speaks, the soft timeout and the loading sound are disabled for the rest of the turn.
+    """
+
+    _hard_timeout_sec: float
+    _loading_callback: Callable[[], None]
+    _loading_sec: float
+    _soft_timeout_callback: Callable[[], Awaitable[None]]
+    _soft_timeout_sec: float
+    _speaking: Callable[[], bool]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        hard_timeout_sec: float,
+        loading_callback: Callable[[], None],
+        loading_sec: float,
+        soft_timeout_callback: Callable[[], Awaitable[None]],
+        soft_timeout_sec: float,
+        speaking: Callable[[], bool],
+    ):
+        """
+        Initialize the supervisor.
+
+        Parameters:
+        - `hard_timeout_sec`: Duration before abandoning the answer.
+        - `loading_callback`: Start the loading sound.
+        - `loading_sec`: Interval of the loading sound, while the bot is silent.
+        - `soft_timeout_callback`: Speak the timeout prompt.
+        - `soft_timeout_sec`: Duration before speaking the timeout prompt, if the bot is silent.
+        - `speaking`: True if the bot started to speak the answer.
+        """
+        self._hard_timeout_sec = hard_timeout_sec
+        self._loading_callback = loading_callback
+        self._loading_sec = loading_sec
+        self._soft_timeout_callback = soft_timeout_callback
+        self._soft_timeout_sec = soft_timeout_sec
+        self._speaking = speaking
+
+    async def wait(self, answer: asyncio.Future) -> bool:
+        """
+        Wait for the answer, handling the timeouts and the loading sound in the meantime.
+
+        The answer is not cancelled, nor its result consumed.
+
+        Returns `True` if the answer is done, `False` if the hard timeout is reached.
+        """
+        hard_timeout = asyncio.ensure_future(asyncio.sleep(self._hard_timeout_sec))
+        soft_timeout = asyncio.ensure_future(asyncio.sleep(self._soft_timeout_sec))
+        loading = asyncio.ensure_future(asyncio.sleep(self._loading_sec))
+        soft_timeout_triggered = False
+        try:
+            while True:
+                # Loading and timeout prompt only matter while the bot is silent
+                waiting = {answer, hard_timeout}
+                if not self._speaking():
+                    waiting.add(loading)
+                    if not soft_timeout_triggered:
+                        waiting.add(soft_timeout)
+                await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                # Answer is done
+                if answer.done():
+                    return True
+
+                # Hard timeout is reached
+                if hard_timeout.done():
+                    logger.warning(
+                        "Hard timeout of %ss reached", self._hard_timeout_sec
+                    )
+                    return False
+
+                # Bot started to speak in the meantime
+                if self._speaking():
+                    continue
+
+                # Speak when soft timeout is reached
+                if soft_timeout.done() and not soft_timeout_triggered:
+                    logger.warning(
+                        "Soft timeout of %ss reached", self._soft_timeout_sec
+                    )
+                    soft_timeout_triggered = True
+                    await self._soft_timeout_callback()
+
+                # Do not play timeout prompt plus loading, it can be frustrating for the user
+                # Loading sound loops until the first speech frame
+                elif loading.done():
+                    loading = asyncio.ensure_future(asyncio.sleep(self._loading_sec))
+                    self._loading_callback()
+
+        finally:
+            hard_timeout.cancel()
+            loading.cancel()
+            soft_timeout.cancel()
@@ -0,0 +1,141 @@
+import numpy as np
+
+
+class VadEngine:
+    """
+    Voice activity detection (VAD), with a noise floor adapted to the phone line.
+
+    Each frame is described by three features, computed for a whole batch of frames at once:
+
+    - Energy, compared to the line noise floor, in dB
+    - Zero-crossing rate, low for voiced speech, high for hiss and white noise
+    - Spectral flatness, low for the harmonics of a voice, close to 1 for noise
+
+    The noise floor follows the quiet frames, it falls fast and rises slowly, so speech does not raise it. Decisions are smoothed: speech starts after `onset_ms` of voiced frames, is kept with a lower margin (hysteresis), and lasts `hangover_ms` after the last voiced frame, to bridge the pauses between syllables.
+
+    An engine is stateful and dedicated to a single call. Frames must be processed in order.
+    """
+
+    _flatness_max: float
+    _floor_db: float | None
+    _floor_fall: float
+    _floor_rise: float
+    _hangover: int
+    _hangover_frames: int
+    _hysteresis_db: float
+    _min_level_db: float
+    _onset: int
+    _onset_frames: int
+    _speaking: bool
+    _window: np.ndarray
+    _zcr_max: float
+
+    def __init__(  # noqa: PLR0913
+        self,
+        flatness_max: float,
+        frame_size: int,
+        hangover_ms: int,
+        hysteresis_db: float,
+        min_level_db: float,
+        noise_fall_ms: int,
+        noise_rise_ms: int,
+        onset_ms: int,
+        sample_rate: int,
+        zcr_max: float,
+    ):
+        """
+        Initialize the engine.
+
+        Parameters:
+        - `flatness_max`: Highest spectral flatness of a voiced frame, between 0 and 1.
+        - `frame_size`: Number of samples per frame.
+        - `hangover_ms`: Speech kept after the last voiced frame.
+        - `hysteresis_db`: Margin reduction to stay in speech, once started.
+        - `min_level_db`: Lowest level of speech, in dBFS, quieter frames are line silence.
+        - `noise_fall_ms`: Time constant of the noise floor when the line gets quieter.
+        - `noise_rise_ms`: Time constant of the noise floor when the line gets noisier.
+        - `onset_ms`: Voiced audio required to start speech, filters out clicks.
+        - `sample_rate`: Audio sample rate in Hz.
+        - `zcr_max`: Highest zero-crossing rate of a voiced frame, per sample.
+        """
+        frame_ms = frame_size / sample_rate * 1000
+        self._flatness_max = flatness_max
+        self._floor_db = None
+        self._floor_fall = 1 - np.exp(-frame_ms / noise_fall_ms)
+        self._floor_rise = 1 - np.exp(-frame_ms / noise_rise_ms)
+        self._hangover = 0
+        self._hangover_frames = round(hangover_ms / frame_ms)
+        self._hysteresis_db = hysteresis_db
+        self._min_level_db = min_level_db
+        self._onset = 0
+        self._onset_frames = max(1, round(onset_ms / frame_ms))
+        self._speaking = False
+        self._window = np.hanning(frame_size).astype(np.float32)
+        self._zcr_max = zcr_max
+
+    @property
+    def noise_floor_db(self) -> float | None:
+        """
+        Current noise floor of the line, in dBFS, `None` before the first frame.
+        """
+        return self._floor_db
+
+    def process(self, frames: np.ndarray, snr_db: float) -> np.ndarray:
+        """
+        Detect the speech in a batch of frames.
+
+        Frames are float (-1.0 to 1.0), as a 2D array of shape (frames, frame size). A single frame is a batch of one.
+
+        Parameters:
+        - `frames`: Frames to evaluate, in order.
+        - `snr_db`: Margin above the noise floor to start speech.
+
+        Returns a boolean array, True for each frame where the user is speaking.
+        """
+        # Features, vectorized over the batch
+        energy = np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+        level_db = 10 * np.log10(energy + 1e-12)
+        crossings = np.count_nonzero(
+            np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]),
+            axis=1,
+        )
+        zcr = crossings / (frames.shape[1] - 1)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        voiced = (
+            (level_db >= self._min_level_db)
+            & (zcr <= self._zcr_max)
+            & (flatness <= self._flatness_max)
+        )
+
+        # Decisions, sequential as each frame updates the state
+        speech = np.empty(len(frames), dtype=bool)
+        floor_db = self._floor_db
+        for i, level in enumerate(level_db.tolist()):
+            if floor_db is None:
+                floor_db = level
+
+            # Louder than the noise floor, with a lower margin once speaking
+            margin_db = snr_db - (self._hysteresis_db if self._speaking else 0)
+            active = bool(voiced[i]) and level >= floor_db + margin_db
+
+            if active:
+                self._onset += 1
+                if self._onset >= self._onset_frames:
+                    self._speaking = True
+                    self._hangover = self._hangover_frames
+            else:
+                self._onset = 0
+                if self._hangover:
+                    self._hangover -= 1
+                else:
+                    self._speaking = False
+
+                # Track the noise floor on the frames without voice
+                rate = self._floor_fall if level < floor_db else self._floor_rise
+                floor_db += rate * (level - floor_db)
+
+            speech[i] = self._speaking
+
+        self._floor_db = floor_db
+        return speech
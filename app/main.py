@@ -1,17 +1,17 @@
 import asyncio
 import json
 import time
-from base64 import b64decode, b64encode
 from contextlib import asynccontextmanager, suppress
 from datetime import timedelta
 from http import HTTPStatus
 from os import getenv
-from typing import Annotated, Any
+from typing import Annotated
 from urllib.parse import quote_plus, urljoin
 from uuid import UUID
 
 import jwt
 import mistune
+from aiojobs import Scheduler
 from azure.communication.callautomation import (
     MediaStreamingAudioChannelType,
     MediaStreamingContentType,
@@ -56,14 +56,27 @@ from app.helpers.call_events import (
     on_sms_received,
     on_transfer_error,
 )
-from app.helpers.call_utils import ContextEnum as CallContextEnum
+from app.helpers.call_utils import (
+    ContextEnum as CallContextEnum,
+    speech_prewarm,
+    stream_audio_format,
+)
+from app.helpers.channel import AudioChannel
 from app.helpers.config import CONFIG
 from app.helpers.http import aiohttp_session, azure_transport
 from app.helpers.logging import logger
+from app.helpers.media import (
+    STOP_AUDIO_MESSAGE,
+    AudioMetadata,
+    PlayoutMark,
+    decode_audio_data,
+    encode_audio_data,
+)
 from app.helpers.monitoring import (
     SpanAttributeEnum,
     call_frames_in_latency,
     call_frames_out_latency,
+    call_setup_latency,
     gauge_set,
     tracer,
 )
@@ -79,7 +92,7 @@ from app.persistence.azure_queue_storage import (
 
 # First log
 logger.info(
-    "swaraaus v%s",  
+    "swaraaus v%s",
     CONFIG.version,
 )
 
@@ -133,6 +146,9 @@ logger.info("Using callback URL %s", _COMMUNICATIONSERVICES_CALLABACK_TPL)
 async def lifespan(app: FastAPI):  # noqa: ARG001
     queue_tasks = None
 
+    # Warm up the Speech clients, without delaying the startup
+    prewarm_task = asyncio.create_task(_speech_prewarm())
+
     try:
         queue_tasks = asyncio.gather(
             _call_queue.trigger(
@@ -156,6 +172,7 @@ async def lifespan(app: FastAPI):  # noqa: ARG001
 
     # Cancel tasks
     finally:
+        prewarm_task.cancel()
         if queue_tasks:
             queue_tasks.cancel()
 
@@ -163,6 +180,25 @@ async def lifespan(app: FastAPI):  # noqa: ARG001
     await (await aiohttp_session()).close()
 
 
+async def _speech_prewarm() -> None:
+    """
+    Create the Speech clients ahead, for each available language.
+    """
+    # Clients only depend on the language and the voice
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number=CONFIG.communication_services.phone_number,
+        ),
+    )
+    for lang in call.initiate.lang.availables:
+        call.lang = lang.short_code
+        await speech_prewarm(
+            call=call,
+            sample_rate=CONFIG.audio.sample_rate,
+        )
+
+
 # FastAPI
 api = FastAPI(
     contact={
@@ -406,6 +442,7 @@ async def call_post(request: Request) -> CallGetModel:
     automation_client = await _use_automation_client()
     streaming_options = MediaStreamingOptions(
         audio_channel_type=MediaStreamingAudioChannelType.UNMIXED,
+        audio_format=stream_audio_format(),
         content_type=MediaStreamingContentType.AUDIO,
         start_media_streaming=False,
         transport_type=MediaStreamingTransportType.WEBSOCKET,
@@ -591,112 +628,58 @@ async def communicationservices_wss_post(
     # Accept connection
     await websocket.accept()
     logger.info("WebSocket connection established")
+    accepted_at = time.monotonic()
 
     # Client SDK
     automation_client = await _use_automation_client()
 
     # Queues
-    audio_in: asyncio.Queue[bytes] = asyncio.Queue()
-    audio_out: asyncio.Queue[bytes | bool] = asyncio.Queue()
-
-    async def _consume_audio() -> None:
-        """
-        Consume audio data from the WebSocket.
-        """
-        logger.debug("Audio data consumer started")
-
-        # Loop until the WebSocket is disconnected
-        with suppress(WebSocketDisconnect):
-            start: float | None = None
-            async for event in websocket.iter_json():
-                # TODO: Handle configuration event (audio format, sample rate, etc.)
-                # Skip non-audio events
-                if "kind" not in event or event["kind"] != "AudioData":
-                    continue
-
-                # Filter out silent audio
-                audio_data: dict[str, Any] = event.get("audioData", {})
-                audio_base64: str | None = audio_data.get("data", None)
-                audio_silent: bool | None = audio_data.get("silent", True)
-                if audio_silent or not audio_base64:
-                    continue
-
-                # Queue audio
-                await audio_in.put(b64decode(audio_base64))
-
-                # Report the frames in latency and reset the timer
-                if start:
-                    gauge_set(
-                        metric=call_frames_in_latency,
-                        value=time.monotonic() - start,
-                    )
-                start = time.monotonic()
+    audio_in: AudioChannel[bytes] = CONFIG.audio.channel_in.instance(name="in")
+    audio_out: AudioChannel[bytes | bool | PlayoutMark] = (
+        CONFIG.audio.channel_out.instance(name="out")
+    )
 
-        logger.debug("Audio data consumer stopped")
+    # Sample rate of the stream, announced by its first message
+    sample_rate: asyncio.Future[int] = asyncio.get_running_loop().create_future()
 
-    async def _send_audio() -> None:
+    async def _process_audio(scheduler: Scheduler) -> None:
         """
-        Send audio data to the WebSocket
+        Process audio, once the stream format is known.
         """
-        logger.debug("Audio data sender started")
-
-        # Loop until the WebSocket is disconnected
-        with suppress(WebSocketDisconnect):
-            start: float | None = None
-            while True:
-                # Get audio
-                audio_data = await audio_out.get()
-                audio_out.task_done()
-
-                # Send audio
-                if isinstance(audio_data, bytes):
-                    await websocket.send_json(
-                        {
-                            "kind": "AudioData",
-                            "audioData": {
-                                "data": b64encode(audio_data).decode("utf-8"),
-                            },
-                        }
-                    )
-
-                # Stop audio
-                elif audio_data is False:
-                    logger.debug("Stop audio event received, stopping audio")
-                    await websocket.send_json(
-                        {
-                            "kind": "StopAudio",
-                            "stopAudio": {},
-                        }
-                    )
-
-                # Report the frames out latency and reset the timer
-                if start:
-                    gauge_set(
-                        metric=call_frames_out_latency,
-                        value=time.monotonic() - start,
-                    )
-                start = time.monotonic()
+        # Stream ended before its format, nothing to process
+        try:
+            audio_sample_rate = await sample_rate
+        except WebSocketDisconnect:
+            return
 
-        logger.debug("Audio data sender stopped")
+        await on_audio_connected(
+            audio_in=audio_in,
+            audio_out=audio_out,
+            audio_sample_rate=audio_sample_rate,
+            call=call,
+            client=automation_client,
+            post_callback=_trigger_post_event,
+            scheduler=scheduler,
+            training_callback=_trigger_training_event,
+        )
 
     async with get_scheduler() as scheduler:
         await asyncio.gather(
             # Consume audio from the WebSocket
-            _consume_audio(),
-            # Send audio to the WebSocket
-            _send_audio(),
-            # Process audio
-            # TODO: Dynamically set the audio format
-            on_audio_connected(
+            _communicationservices_consume_audio(
                 audio_in=audio_in,
+                sample_rate=sample_rate,
+                websocket=websocket,
+            ),
+            # Send audio to the WebSocket
+            _communicationservices_send_audio(
+                accepted_at=accepted_at,
                 audio_out=audio_out,
-                audio_sample_rate=16000,
-                call=call,
-                client=automation_client,
-                post_callback=_trigger_post_event,
-                scheduler=scheduler,
-                training_callback=_trigger_training_event,
+                sample_rate=sample_rate,
+                websocket=websocket,
             ),
+            # Process audio
+            _process_audio(scheduler),
         )
 
 
@@ -736,6 +719,155 @@ async def communicationservices_callback_post(
     )
 
 
+async def _communicationservices_consume_audio(
+    audio_in: AudioChannel[bytes],
+    sample_rate: asyncio.Future[int],
+    websocket: WebSocket,
+) -> None:
+    """
+    Consume audio data from the WebSocket.
+    """
+    logger.debug("Audio data consumer started")
+
+    # Loop until the WebSocket is disconnected
+    try:
+        with suppress(WebSocketDisconnect):
+            start: float | None = None
+            while True:
+                # Read raw frames, text or binary, the JSON is parsed by the media codec
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                payload: str | bytes | None = message.get("text") or message.get(
+                    "bytes"
+                )
+                if not payload:
+                    continue
+
+                # Skip the metadata, non-audio events and silent audio
+                if not await _communicationservices_media_message(
+                    audio_in=audio_in,
+                    payload=payload,
+                    sample_rate=sample_rate,
+                ):
+                    continue
+
+                # Report the frames in latency and reset the timer
+                if start:
+                    gauge_set(
+                        metric=call_frames_in_latency,
+                        value=time.monotonic() - start,
+                    )
+                start = time.monotonic()
+
+    # Unblock the other tasks, if the stream ended before its format
+    finally:
+        if not sample_rate.done():
+            sample_rate.set_exception(WebSocketDisconnect())
+
+    logger.debug("Audio data consumer stopped")
+
+
+async def _communicationservices_send_audio(
+    accepted_at: float,
+    audio_out: AudioChannel[bytes | bool | PlayoutMark],
+    sample_rate: asyncio.Future[int],
+    websocket: WebSocket,
+) -> None:
+    """
+    Send audio data to the WebSocket
+    """
+    logger.debug("Audio data sender started")
+
+    # Loop until the WebSocket is disconnected
+    with suppress(WebSocketDisconnect):
+        # Audio is sent at real-time rate, with a small lead
+        pacer = CONFIG.audio.pacer.instance(sample_rate=await sample_rate)
+
+        start: float | None = None
+        while True:
+            # Get audio, or wake up when the next batch is due
+            try:
+                audio_data = await asyncio.wait_for(
+                    fut=audio_out.get(),
+                    timeout=pacer.wait_time(time.monotonic()),
+                )
+            except TimeoutError:
+                audio_data = None
+
+            # Queue audio
+            if isinstance(audio_data, bytes):
+                pacer.push(audio_data, time.monotonic())
+
+            # Track the end of an utterance, once its audio is sent
+            elif isinstance(audio_data, PlayoutMark):
+                pacer.mark(audio_data, time.monotonic())
+
+            # Stop audio
+            elif audio_data is False:
+                logger.debug("Stop audio event received, stopping audio")
+                pacer.clear(time.monotonic())
+                await websocket.send_text(STOP_AUDIO_MESSAGE)
+
+            # Send the due audio
+            while batch := pacer.pop(time.monotonic()):
+                await websocket.send_text(encode_audio_data(batch))
+
+                # Report the frames out latency and reset the timer
+                if start:
+                    gauge_set(
+                        metric=call_frames_out_latency,
+                        value=time.monotonic() - start,
+                    )
+                # Report the setup latency, on the first frame
+                else:
+                    gauge_set(
+                        metric=call_setup_latency,
+                        value=time.monotonic() - accepted_at,
+                    )
+                start = time.monotonic()
+
+    logger.debug("Audio data sender stopped")
+
+
+async def _communicationservices_media_message(
+    audio_in: AudioChannel[bytes],
+    payload: str | bytes,
+    sample_rate: asyncio.Future[int],
+) -> bool:
+    """
+    Handle a message of the media WebSocket.
+
+    Resolves the stream sample rate, from the audio metadata, or the requested one if the stream starts with audio.
+
+    Returns True if audio was queued.
+    """
+    audio_data = decode_audio_data(payload)
+
+    # Configure the audio format, sent once before the audio
+    if isinstance(audio_data, AudioMetadata):
+        if audio_data.encoding != "PCM" or audio_data.channels != 1:
+            raise ValueError(
+                f"Expected PCM 16-bit, 1 channel, got {audio_data.encoding}, {audio_data.channels} channels."
+            )
+        logger.info("Audio stream at %i Hz", audio_data.sample_rate)
+        if not sample_rate.done():
+            sample_rate.set_result(audio_data.sample_rate)
+        return False
+
+    # Stream without metadata, it is in the requested format
+    if not sample_rate.done():
+        sample_rate.set_result(CONFIG.audio.stream_sample_rate)
+
+    # Skip non-audio events and silent audio
+    if not audio_data:
+        return False
+
+    # Queue audio
+    await audio_in.put(audio_data)
+    return True
+
+
 # TODO: Refacto, too long (and remove PLR0912/PLR0915 ignore)
 async def _communicationservices_event_worker(
     call_id: UUID,
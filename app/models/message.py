@@ -1,4 +1,6 @@
+import json
 import re
+from collections.abc import Callable
 from datetime import UTC, datetime
 from enum import Enum
 
@@ -9,7 +11,7 @@ from openai.types.chat import (
     ChatCompletionUserMessageParam,
 )
 from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 _FUNC_NAME_SANITIZER_R = r"[^a-zA-Z0-9_-]"
 _MESSAGE_ACTION_R = r"(?:action=*([a-z_]*))? *(.*)"
@@ -103,6 +105,10 @@ class MessageModel(BaseModel):
     persona: PersonaEnum
     style: StyleEnum = StyleEnum.NONE
     tool_calls: list[ToolModel] = []
+    # Private fields
+    _tokens: dict[str, tuple[tuple, int]] = PrivateAttr(
+        default_factory=dict
+    )  # Token cost per encoding, with the fields it was counted on
 
     @field_validator("created_at")
     @classmethod
@@ -116,6 +122,38 @@ class MessageModel(BaseModel):
             return created_at.replace(tzinfo=UTC)
         return created_at
 
+    def tokens(self, encoding: str, count: Callable[[str], int]) -> int:
+        """
+        Get the token cost of the message in a prompt, for an encoding.
+
+        The cost is cached per encoding, and counted again only if the message changed since, like when the content is merged or a tool call is completed.
+
+        Parameters:
+        - `encoding`: Name of the encoding, the cache key.
+        - `count`: Count the tokens of a text, with the encoding.
+        """
+        fingerprint = (
+            self.action,
+            self.content,
+            self.persona,
+            self.style,
+            *(
+                (
+                    tool_call.content,
+                    tool_call.function_arguments,
+                    tool_call.function_name,
+                    tool_call.tool_id,
+                )
+                for tool_call in self.tool_calls
+            ),
+        )  # Fields rendered by `to_openai`, cheap to compare as strings are shared
+        cached = self._tokens.get(encoding)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        tokens = count("".join([json.dumps(x) for x in self.to_openai()]))
+        self._tokens[encoding] = (fingerprint, tokens)
+        return tokens
+
     def to_openai(
         self,
     ) -> list[
@@ -0,0 +1,312 @@
+import time
+
+import numpy as np
+import pytest
+from aiojobs import Scheduler
+from pytest_assume.plugin import assume
+
+from app.helpers.aec import IAecEngine, ReferenceAligner
+from app.helpers.call_utils import AECStream
+from app.helpers.config import CONFIG
+from app.helpers.config_models.audio import AecEngineEnum
+from app.helpers.dsp import RingBuffer
+from app.helpers.logging import logger
+
+_DELAY_TOLERANCE_MS = 50  # Estimated delay is the true one minus the safety margin
+_FRAME_SIZE = 320  # 20 ms at 16 kHz
+_MAX_UNALIGNED_ERLE_DB = 6  # Echo out of the filter reach
+_MIN_ALIGNED_ERLE_DB = 20
+_SAMPLE_RATE = 16000
+
+
+def _echo_scenario(
+    duration_sec: int,
+    delay_ms: int = 25,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generate a synthetic echo scenario.
+
+    Reference is a speech-like colored noise, microphone is the reference through a delayed and reverberated echo path, plus a low background noise.
+
+    Returns a tuple with the microphone and the reference signals.
+    """
+    rng = np.random.default_rng(42)
+    samples = duration_sec * _SAMPLE_RATE
+    # Reference, low-passed white noise
+    reference = np.convolve(
+        rng.standard_normal(samples),
+        np.ones(8) / 8,
+        mode="same",
+    ).astype(np.float32)
+    reference *= 0.3
+    # Echo path, delayed with a short reverberation
+    delay = int(delay_ms / 1000 * _SAMPLE_RATE)
+    echo_path = np.zeros(delay + 1200, dtype=np.float32)
+    echo_path[delay] = 0.6
+    echo_path[delay + 20] = -0.3
+    echo_path[delay + 400 : delay + 500] = rng.standard_normal(100) * 0.02
+    mic = np.convolve(reference, echo_path)[:samples].astype(np.float32)
+    mic += rng.standard_normal(samples).astype(np.float32) * 1e-3
+    return mic, reference
+
+
+def _run_engine(
+    engine: AecEngineEnum,
+    mic: np.ndarray,
+    reference: np.ndarray,
+    aligner: ReferenceAligner | None = None,
+) -> tuple[np.ndarray, float]:
+    """
+    Run an echo cancellation engine over a whole scenario, frame by frame.
+
+    Returns a tuple with the output signal and the CPU time per frame in seconds.
+    """
+    aec = CONFIG.audio.aec.model_copy(update={"engine": engine}).instance(
+        frame_size=_FRAME_SIZE,
+        sample_rate=_SAMPLE_RATE,
+    )
+    frames = []
+    start = time.process_time()
+    for i in range(0, len(mic), _FRAME_SIZE):
+        mic_frame = mic[i : i + _FRAME_SIZE]
+        reference_frame = reference[i : i + _FRAME_SIZE]
+        if aligner:
+            reference_frame = aligner.align(mic_frame, reference_frame)
+        res = aec.process(mic_frame, reference_frame)
+        frames.append(mic_frame if res is None else res.copy())
+    duration = time.process_time() - start
+    return np.concatenate(frames), duration / len(frames)
+
+
+def _erle_db(mic: np.ndarray, out: np.ndarray) -> float:
+    """
+    Compute the echo return loss enhancement (ERLE) on the last second, after convergence.
+    """
+    last_sec = slice(-_SAMPLE_RATE, None)
+    return float(10 * np.log10(np.sum(mic[last_sec] ** 2) / np.sum(out[last_sec] ** 2)))
+
+
+@pytest.mark.parametrize(
+    "engine, min_erle_db",
+    [
+        pytest.param(
+            AecEngineEnum.NLMS,
+            20,
+            id="nlms",
+        ),
+        pytest.param(
+            AecEngineEnum.NOISEREDUCE,
+            6,
+            id="noisereduce",
+        ),
+    ],
+)
+def test_aec_cancellation(
+    engine: AecEngineEnum,
+    min_erle_db: float,
+) -> None:
+    """
+    Test the echo return loss enhancement (ERLE) of the echo cancellation engines.
+
+    Steps:
+    1. Generate an echo scenario
+    2. Run the engine over it
+    3. Measure the ERLE on the last second, after convergence
+    """
+    mic, reference = _echo_scenario(duration_sec=5)
+    out, _ = _run_engine(
+        engine=engine,
+        mic=mic,
+        reference=reference,
+    )
+
+    erle_db = _erle_db(mic, out)
+    logger.info("ERLE for %s: %.1f dB", engine.value, erle_db)
+    assume(erle_db >= min_erle_db)
+
+
+def test_aec_delay_alignment() -> None:
+    """
+    Test the echo is cancelled when its delay is longer than the canceller tail.
+
+    Steps:
+    1. Generate an echo scenario with a 300 ms delay
+    2. Run the engine over it, without and with the reference aligner
+    3. Check the estimated delay and the ERLE
+    """
+    delay_ms = 300
+    mic, reference = _echo_scenario(
+        delay_ms=delay_ms,
+        duration_sec=5,
+    )
+
+    # Without alignment, the echo is out of the filter reach
+    out, _ = _run_engine(
+        engine=AecEngineEnum.NLMS,
+        mic=mic,
+        reference=reference,
+    )
+    unaligned_erle_db = _erle_db(mic, out)
+
+    # With alignment, the bulk delay is compensated
+    aligner = CONFIG.audio.aec.aligner(
+        frame_size=_FRAME_SIZE,
+        sample_rate=_SAMPLE_RATE,
+    )
+    out, _ = _run_engine(
+        aligner=aligner,
+        engine=AecEngineEnum.NLMS,
+        mic=mic,
+        reference=reference,
+    )
+    aligned_erle_db = _erle_db(mic, out)
+
+    logger.info(
+        "ERLE with a %.0f ms delay: %.1f dB unaligned, %.1f dB aligned",
+        aligner.delay_ms,
+        unaligned_erle_db,
+        aligned_erle_db,
+    )
+    assume(delay_ms - _DELAY_TOLERANCE_MS <= aligner.delay_ms <= delay_ms)
+    assume(unaligned_erle_db < _MAX_UNALIGNED_ERLE_DB)
+    assume(aligned_erle_db >= _MIN_ALIGNED_ERLE_DB)
+
+
+def test_aec_benchmark() -> None:
+    """
+    Benchmark the CPU cost per frame of the echo cancellation engines.
+
+    Steps:
+    1. Generate an echo scenario
+    2. Run each engine over it
+    3. Compare the CPU time per frame
+
+    The adaptive filter should be cheaper than the noise reduction, which re-estimates the noise profile on each frame.
+    """
+    mic, reference = _echo_scenario(duration_sec=2)
+    costs = {}
+    for engine in AecEngineEnum:
+        _, costs[engine] = _run_engine(
+            engine=engine,
+            mic=mic,
+            reference=reference,
+        )
+        logger.info(
+            "CPU per frame for %s: %.3f ms (%.1f%% of the frame duration)",
+            engine.value,
+            costs[engine] * 1000,
+            costs[engine] / (_FRAME_SIZE / _SAMPLE_RATE) * 100,
+        )
+
+    assume(costs[AecEngineEnum.NLMS] < costs[AecEngineEnum.NOISEREDUCE])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_aec_reference_frames() -> None:
+    """
+    Test the reference stays aligned with the microphone, after the pipeline was late and after a barge-in.
+
+    Steps:
+    1. Play speech, each frame with its own value
+    2. Take the reference a few frames later, check the frames played meanwhile are dropped
+    3. Flush on barge-in, check the reference is silence
+    4. Play speech again, check its reference starts right away
+    """
+    frames = 10
+    late_frames = 4
+    async with Scheduler() as scheduler:
+        aec = AECStream(
+            in_raw_queue=CONFIG.audio.channel_in.instance(name="in"),
+            in_reference_queue=CONFIG.audio.channel_tts.instance(name="tts"),
+            out_queue=CONFIG.audio.channel_out.instance(name="out"),
+            sample_rate=_SAMPLE_RATE,
+            scheduler=scheduler,
+            stream_sample_rate=_SAMPLE_RATE,
+            tts_sample_rate=_SAMPLE_RATE,
+        )
+        frame_sec = aec._packet_duration_ms / 1000
+        speech = [bytes([i + 1]) * aec._packet_size for i in range(frames)]
+
+        # Pipeline late, the frames due meanwhile were played
+        await aec._play(b"".join(speech))
+        now = aec._aec_reference_frames[late_frames][0]  # Due time of the frame
+        assume(aec._pop_reference(now) == speech[late_frames])
+        assume(len(aec._aec_reference_frames) == frames - late_frames - 1)
+
+        # Barge-in, the speech left is never played
+        aec.flush()
+        assume(aec._pop_reference(now + frames * frame_sec) == aec._empty_packet)
+
+        # Next speech, played from now
+        await aec._play(speech[0])
+        assume(aec._pop_reference(time.monotonic()) == speech[0])
+
+
+class _FailingAecEngine(IAecEngine):
+    """
+    Engine failing on every frame.
+    """
+
+    def process(
+        self,
+        mic: np.ndarray,  # noqa: ARG002
+        reference: np.ndarray,  # noqa: ARG002
+    ) -> np.ndarray | None:
+        raise RuntimeError("Engine failure")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_aec_engine_failure() -> None:
+    """
+    Test the stream keeps forwarding the microphone when the engine fails.
+
+    Steps:
+    1. Replace the engine with one raising on every frame
+    2. Send microphone frames, each with its own value
+    3. Check the raw frames are all forwarded, in order
+    """
+    frames = 5
+    in_queue = CONFIG.audio.channel_in.instance(name="in")
+    async with Scheduler() as scheduler:
+        aec = AECStream(
+            in_raw_queue=in_queue,
+            in_reference_queue=CONFIG.audio.channel_tts.instance(name="tts"),
+            out_queue=CONFIG.audio.channel_out.instance(name="out"),
+            sample_rate=_SAMPLE_RATE,
+            scheduler=scheduler,
+            stream_sample_rate=_SAMPLE_RATE,
+            tts_sample_rate=_SAMPLE_RATE,
+        )
+        aec._aec = _FailingAecEngine()
+        speech = [bytes([i + 1]) * aec._packet_size for i in range(frames)]
+
+        async with aec:
+            for frame in speech:
+                await in_queue.put(frame)
+            received = [(await aec.pull_audio())[0] for _ in speech]
+
+        assume(received == speech)
+
+
+def test_ring_buffer() -> None:
+    """
+    Test the ring buffer keeps the latest samples, in order, across wrap-arounds.
+
+    Steps:
+    1. Write chunks of various sizes, including one longer than the capacity
+    2. Compare the view with the tail of the written signal, padded with the initial silence
+    """
+    capacity = 100
+    buffer = RingBuffer(capacity=capacity)
+    signal = np.concatenate(
+        [
+            np.zeros(capacity, dtype=np.float32),  # Initial silence
+            np.arange(1, 1000, dtype=np.float32),
+        ]
+    )
+    pointer = capacity
+    for size in (30, 50, 40, 99, 1, 250, 7, 100):
+        buffer.write(signal[pointer : pointer + size])
+        pointer += size
+        assume(np.array_equal(buffer.view(), signal[pointer - capacity : pointer]))
+        assume(np.array_equal(buffer.view(size=10), signal[pointer - 10 : pointer]))
@@ -1,8 +1,12 @@
+from pathlib import Path
+
 import pytest
+from azure.communication.callautomation import SsmlSource
 from pytest_assume.plugin import assume
 
 from app.helpers.config import CONFIG
 from app.helpers.config_models.cache import ModeEnum as CacheModeEnum
+from app.helpers.tts_cache import TtsCache
 
 
 @pytest.mark.parametrize(
@@ -55,3 +59,56 @@ async def test_acid(
 
     # Check point read
     assume(await cache.get(test_key) == test_value.encode())
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_tts_cache(
+    random_text: str,
+    tmp_path: Path,
+) -> None:
+    """
+    Test the TTS cache stores the audio locally and remotely.
+
+    Steps:
+    1. Check a missing audio
+    2. Store an audio, check it is read from the local store
+    3. Read it from another host, check it is filled from the remote cache
+    4. Check the same SSML at another sample rate has another key
+    """
+    CONFIG.cache.mode = CacheModeEnum.MEMORY
+    ssml = SsmlSource(ssml_text=random_text)
+    pcm = bytes(range(256)) * 10
+    cache = TtsCache(
+        cache=CONFIG.cache.instance(),
+        path=str(tmp_path / "host-1"),
+        sample_rate=16000,
+        ttl_sec=60,
+    )
+    key = cache.key(ssml)
+
+    # Check not exists
+    assume(await cache.get(key) is None)
+
+    # Insert, then read from the local store
+    await cache.set(key=key, pcm=pcm)
+    assume(await cache.get(key) == pcm)
+    assume((tmp_path / "host-1" / f"{key}.pcm").read_bytes() == pcm)
+
+    # Read from another host, from the remote cache
+    other = TtsCache(
+        cache=CONFIG.cache.instance(),
+        path=str(tmp_path / "host-2"),
+        sample_rate=16000,
+        ttl_sec=60,
+    )
+    assume(await other.get(key) == pcm)
+    assume((tmp_path / "host-2" / f"{key}.pcm").read_bytes() == pcm)
+
+    # Audio of another format is not shared
+    wideband = TtsCache(
+        cache=CONFIG.cache.instance(),
+        path=str(tmp_path / "host-1"),
+        sample_rate=24000,
+        ttl_sec=60,
+    )
+    assume(wideband.key(ssml) != key)
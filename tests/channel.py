@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.channel import AudioChannel, ChannelPolicyEnum
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_drop_oldest() -> None:
+    """
+    Test a full channel drops the oldest items.
+
+    Steps:
+    1. Put more items than the capacity
+    2. Check only the most recent ones are kept, in order
+    """
+    capacity = 3
+    channel = AudioChannel[int](
+        capacity=capacity,
+        name="test",
+        policy=ChannelPolicyEnum.DROP_OLDEST,
+    )
+    for i in range(5):
+        await channel.put(i)
+
+    assume(channel.qsize() == capacity)
+    assume([await channel.get() for _ in range(capacity)] == [2, 3, 4])
+    assume(channel.empty())
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_block() -> None:
+    """
+    Test a full channel makes the producer wait, without losing items.
+
+    Steps:
+    1. Fill the channel
+    2. Put one more item, check the producer waits
+    3. Get an item, check the producer resumes
+    """
+    channel = AudioChannel[int](
+        capacity=2,
+        name="test",
+        policy=ChannelPolicyEnum.BLOCK,
+    )
+    await channel.put(0)
+    await channel.put(1)
+    with pytest.raises(asyncio.QueueFull):
+        channel.put_nowait(2)
+
+    producer = asyncio.create_task(channel.put(2))
+    await asyncio.sleep(0.01)
+    assume(not producer.done())
+
+    assume(await channel.get() == 0)
+    await asyncio.wait_for(producer, timeout=1)
+    assume([await channel.get() for _ in range(2)] == [1, 2])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_flush() -> None:
+    """
+    Test a flush makes the queued items stale, and starts a new generation.
+
+    Steps:
+    1. Put items, flush the channel
+    2. Check the channel is empty and blocked producers resume
+    3. Put new items, check only them are returned
+    """
+    capacity = 3
+    channel = AudioChannel[int](
+        capacity=capacity,
+        name="test",
+        policy=ChannelPolicyEnum.BLOCK,
+    )
+    for i in range(capacity):
+        await channel.put(i)
+    producer = asyncio.create_task(channel.put(capacity))
+    await asyncio.sleep(0.01)
+
+    assume(channel.flush() == capacity)
+    assume(channel.generation == 1)
+    assume(channel.empty())
+    with pytest.raises(asyncio.QueueEmpty):
+        channel.get_nowait()
+
+    await asyncio.wait_for(producer, timeout=1)
+    await channel.put(4)
+    assume([await channel.get() for _ in range(2)] == [3, 4])
+    assume(channel.empty())
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_wait() -> None:
+    """
+    Test a consumer waits for an item, and ignores the stale ones.
+
+    Steps:
+    1. Start a consumer on an empty channel
+    2. Put and flush an item, check the consumer still waits
+    3. Put a new item, check the consumer gets it
+    """
+    channel = AudioChannel[int](
+        capacity=3,
+        name="test",
+        policy=ChannelPolicyEnum.DROP_OLDEST,
+    )
+    consumer = asyncio.create_task(channel.get())
+    await asyncio.sleep(0)
+    channel.put_nowait(0)
+    channel.flush()
+    await asyncio.sleep(0.01)
+    assume(not consumer.done())
+
+    channel.put_nowait(1)
+    assume(await asyncio.wait_for(consumer, timeout=1) == 1)
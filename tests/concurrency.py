@@ -0,0 +1,304 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
+import pytest
+from aiojobs import Scheduler
+from pytest_assume.plugin import assume
+
+from app.helpers import call_llm, call_utils, features
+from app.helpers.call_llm import load_llm_chat
+from app.helpers.call_utils import SttClient
+from app.helpers.channel import AudioChannel
+from app.helpers.config import CONFIG
+from app.helpers.logging import logger
+from app.helpers.media import PlayoutMark
+from app.models.call import CallInitiateModel, CallStateModel
+from tests.conftest import CallAutomationClientMock, StoreMock
+
+_FRAME_MS = 20
+_FRAME_SIZE = 640  # 20 ms of PCM 16-bit at 16 kHz
+_SAMPLE_RATE = 16000
+
+
+class SttClientMock(SttClient):
+    """
+    Speech-to-text client recording the audio it receives, without the Speech SDK.
+    """
+
+    frames: list[bytes]
+
+    async def __aenter__(self):
+        self.frames = []
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        pass
+
+    def push_audio(self, audio_data: bytes):
+        self.frames.append(audio_data)
+
+    async def pull_recognition(self) -> str:
+        return ""
+
+
+class SpeechSynthesizerStreamMock:
+    """
+    Text-to-speech client writing a call specific audio to the output stream, without the Speech SDK.
+    """
+
+    _audio: bytes
+    _out: AudioChannel[bytes]
+
+    def __init__(self, audio: bytes, out: AudioChannel[bytes]) -> None:
+        self._audio = audio
+        self._out = out
+
+    def speak_ssml_async(self, *args, **kwargs) -> None:  # noqa: ARG002
+        self._out.put_nowait(self._audio)
+
+    def stop_speaking_async(self) -> None:
+        pass
+
+
+class AudioChannelMock(AudioChannel[bytes]):
+    """
+    Audio channel counting the items dropped on overflow.
+    """
+
+    dropped: int = 0
+
+    def _drop_oldest(self) -> None:
+        self.dropped += 1
+        super()._drop_oldest()
+
+
+def _signature(index: int) -> bytes:
+    """
+    Build a quiet microphone frame, unique to a call.
+    """
+    return (index + 1).to_bytes(2, "little") * (_FRAME_SIZE // 2)
+
+
+async def _run_call(
+    duration_sec: float,
+    index: int,
+    scheduler: Scheduler,
+    stt_clients: dict[int, SttClientMock],
+) -> tuple[list[bytes], list[bytes], int]:
+    """
+    Run a synthetic call through the real-time pipeline.
+
+    The user sends quiet frames holding the call index, the bot answers with a silent speech whose length holds the call index.
+
+    Returns a tuple with the frames received by the speech-to-text, the audio sent to the user, and the number of microphone frames dropped by the input channel.
+    """
+    audio_in = AudioChannelMock(
+        capacity=CONFIG.audio.channel_in.capacity,
+        name="in",
+        policy=CONFIG.audio.channel_in.policy,
+    )
+    audio_out: AudioChannel[bytes | bool | PlayoutMark] = (
+        CONFIG.audio.channel_out.instance(name="out")
+    )
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number="+33612345678",  # pyright: ignore
+        ),
+        voice_id=f"dummy-{index}",
+    )
+
+    async def _send_frames() -> None:
+        frame = _signature(index)
+        start = time.monotonic()
+        for i in range(int(duration_sec * 1000 / _FRAME_MS)):
+            await audio_in.put(frame)
+            # Real-time rate, without drift
+            await asyncio.sleep(
+                max(0, start + (i + 1) * _FRAME_MS / 1000 - time.monotonic())
+            )
+
+    sent: list[bytes] = []
+
+    async def _receive_audio() -> None:
+        while True:
+            audio = await audio_out.get()
+            if isinstance(audio, bytes):
+                sent.append(audio)
+
+    chat = asyncio.create_task(
+        load_llm_chat(
+            audio_in=audio_in,
+            audio_out=audio_out,
+            audio_sample_rate=_SAMPLE_RATE,
+            automation_client=CallAutomationClientMock(
+                hang_up_callback=lambda: None,
+                play_media_callback=lambda _: None,
+                transfer_callback=lambda: None,
+            ),
+            call=call,
+            post_callback=lambda _: asyncio.sleep(0),
+            scheduler=scheduler,
+            training_callback=lambda _: asyncio.sleep(0),
+        )
+    )
+    receiver = asyncio.create_task(_receive_audio())
+    await _send_frames()
+    await asyncio.sleep(0.1)  # Let the pipeline drain
+    chat.cancel()
+    receiver.cancel()
+    return stt_clients[index].frames, sent, audio_in.dropped
+
+
+async def _run_calls(
+    calls: int,
+    duration_sec: float,
+    monkeypatch: pytest.MonkeyPatch,
+) -> list[tuple[list[bytes], list[bytes], int]]:
+    """
+    Run synthetic calls in parallel, on a single worker.
+
+    The Speech clients and the database are mocked, each call has its own audio signature.
+
+    Returns, for each call, the result of `_run_call`.
+    """
+    stt_clients: dict[int, SttClientMock] = {}
+
+    # Mock the Speech SDK, each client is bound to its call
+    def _stt_client(call: CallStateModel, **kwargs) -> SttClientMock:
+        index = int(call.voice_id.split("-")[-1])  # pyright: ignore
+        stt_clients[index] = SttClientMock(call=call, **kwargs)
+        return stt_clients[index]
+
+    @asynccontextmanager
+    async def _use_tts_client(
+        call: CallStateModel,
+        out: AudioChannel[bytes],
+    ) -> AsyncGenerator[SpeechSynthesizerStreamMock, None]:
+        index = int(call.voice_id.split("-")[-1])  # pyright: ignore
+        yield SpeechSynthesizerStreamMock(
+            audio=bytes(_FRAME_SIZE * (index + 1)),
+            out=out,
+        )
+
+    monkeypatch.setattr(call_llm, "SttClient", _stt_client)
+    monkeypatch.setattr(call_llm, "use_tts_client", _use_tts_client)
+    monkeypatch.setattr(call_llm, "_db", StoreMock())
+    monkeypatch.setattr(call_utils, "_db", StoreMock())
+
+    # Serve the features from the local cache, as once refreshed from App Configuration
+    for key, value in {
+        "answer_hard_timeout_sec": 60,
+        "answer_soft_timeout_sec": 30,
+        "llm_continuation_max": 2,
+        "llm_hedge_max_ms": 0,
+        "phone_silence_timeout_sec": 20,
+        "recognition_speculation_stable_ms": 0,
+        "recognition_stt_complete_timeout_ms": 100,
+        "vad_cutoff_timeout_ms": 250,
+        "vad_silence_timeout_ms": 500,
+        "vad_snr_margin_db": 10.0,
+    }.items():
+        await features._cache.set(
+            key=features._cache_key(key),
+            ttl_sec=60,
+            value=str(value),
+        )
+
+    async with Scheduler() as scheduler:
+        return await asyncio.gather(
+            *[
+                _run_call(
+                    duration_sec=duration_sec,
+                    index=index,
+                    scheduler=scheduler,
+                    stt_clients=stt_clients,
+                )
+                for index in range(calls)
+            ]
+        )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_concurrent_calls(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test concurrent calls on a single worker keep their audio state isolated.
+
+    Steps:
+    1. Run 10 calls in parallel, each with its own audio signature
+    2. Check each call only received its own audio, in both directions
+
+    The frame counts depend on the hardware, they are measured by `test_concurrent_calls_capacity`.
+    """
+    results = await _run_calls(
+        calls=10,
+        duration_sec=2,
+        monkeypatch=monkeypatch,
+    )
+
+    for index, (stt_frames, sent, _) in enumerate(results):
+        # Microphone frames, only the call signature, or silence when late
+        received = [f for f in stt_frames if f != bytes(_FRAME_SIZE)]
+        assume(received)
+        assume(all(f == _signature(index) for f in received))
+        # Speech, only the call speech
+        assume(sum(len(audio) for audio in sent) == _FRAME_SIZE * (index + 1))
+
+
+@pytest.mark.parametrize(
+    "calls",
+    [
+        pytest.param(
+            100,
+            id="100_calls",
+        ),
+        pytest.param(
+            200,
+            id="200_calls",
+        ),
+    ],
+)
+@pytest.mark.asyncio(loop_scope="session")
+async def test_concurrent_calls_capacity(
+    calls: int,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Benchmark the real-time capacity of a single worker.
+
+    Steps:
+    1. Run N calls in parallel
+    2. Measure the frames missing the 20 ms budget, replaced by silence
+    3. Count apart the frames dropped by the input channel, like while the call starts, they are not late
+
+    Nothing is asserted, the results depend on the hardware. The capacity is reported in the logs, as the frames on time ratio for the number of calls.
+    """
+    results = await _run_calls(
+        calls=calls,
+        duration_sec=2,
+        monkeypatch=monkeypatch,
+    )
+
+    streamed_frames = 0
+    late_frames = 0
+    dropped_frames = 0
+    for stt_frames, _, dropped in results:
+        received = [i for i, f in enumerate(stt_frames) if f != bytes(_FRAME_SIZE)]
+        dropped_frames += dropped
+        if not received:
+            continue
+        # Silence inserted while the call was streaming, the pipeline missed the frame budget
+        window = received[-1] - received[0] + 1
+        streamed_frames += window
+        late_frames += window - len(received)
+
+    on_time_ratio = 1 - late_frames / streamed_frames if streamed_frames else 0
+    logger.info(
+        "Capacity: %i concurrent calls, %.1f%% of the frames within the %i ms budget, %i frames dropped by the input channel",
+        calls,
+        on_time_ratio * 100,
+        _FRAME_MS,
+        dropped_frames,
+    )
@@ -2,7 +2,8 @@ import hashlib
 import random
 import string
 import xml.etree.ElementTree as ET
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, Callable
+from contextlib import asynccontextmanager
 from textwrap import dedent
 from typing import Any
 
@@ -182,6 +183,27 @@ class SpeechSynthesizerMock(SpeechSynthesizer):
         )
 
 
+class StoreMock:
+    """
+    Store keeping the calls in memory, without the database.
+    """
+
+    @asynccontextmanager
+    async def call_transac(self, *args, **kwargs) -> AsyncGenerator[None, None]:  # noqa: ARG002
+        yield
+
+
+class ClockMock:
+    """
+    Manual clock, time only moves when the test advances it.
+    """
+
+    now: float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+
 class DeepEvalAzureOpenAI(GPTModel):
     _cache: pytest.Cache
     _langchain_kwargs: dict[str, Any]
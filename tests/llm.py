@@ -27,6 +27,7 @@ from app.helpers.call_events import (
     on_play_started,
 )
 from app.helpers.call_llm import _continue_chat
+from app.helpers.call_utils import AECStream
 from app.helpers.config import CONFIG
 from app.helpers.logging import logger
 from app.models.call import CallStateModel
@@ -316,15 +317,25 @@ async def test_llm(  # noqa: PLR0913
                     )
                 )
 
-            # Respond
-            await _continue_chat(
-                call=call,
-                client=automation_client,
-                post_callback=_post_callback,
+            # Respond, the audio stream plays the loading sound while waiting
+            async with AECStream(
+                in_raw_queue=CONFIG.audio.channel_in.instance(name="in"),
+                in_reference_queue=CONFIG.audio.channel_tts.instance(name="tts"),
+                out_queue=CONFIG.audio.channel_out.instance(name="out"),
+                sample_rate=CONFIG.audio.sample_rate,
                 scheduler=scheduler,
-                training_callback=_training_callback,
-                tts_client=tts_client,
-            )
+                stream_sample_rate=CONFIG.audio.sample_rate,
+                tts_sample_rate=CONFIG.audio.tts_sample_rate,
+            ) as aec:
+                await _continue_chat(
+                    aec=aec,
+                    call=call,
+                    client=automation_client,
+                    post_callback=_post_callback,
+                    scheduler=scheduler,
+                    training_callback=_training_callback,
+                    tts_client=tts_client,
+                )
 
             # Play
             await on_play_started(
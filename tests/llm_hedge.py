@@ -0,0 +1,203 @@
+import asyncio
+from collections.abc import AsyncGenerator, Callable
+
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.llm_hedge import LatencyWindow, hedged_stream
+
+_DELAY_SEC = 0.05
+
+
+class BackendMock:
+    """
+    Backend streaming a few items, after a first item latency, or failing.
+    """
+
+    closed: bool
+    error: Exception | None
+    first_sec: float
+    name: str
+    started: bool
+
+    def __init__(
+        self,
+        first_sec: float,
+        name: str,
+        error: Exception | None = None,
+    ):
+        self.closed = False
+        self.error = error
+        self.first_sec = first_sec
+        self.name = name
+        self.started = False
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        self.started = True
+        try:
+            await asyncio.sleep(self.first_sec)
+            if self.error:
+                raise self.error
+            for i in range(3):
+                yield f"{self.name}-{i}"
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+    def factory(self) -> Callable[[], AsyncGenerator[str, None]]:
+        return self.stream
+
+
+async def _hedge(
+    primary: BackendMock,
+    backup: BackendMock,
+    delay_sec: float | None = _DELAY_SEC,
+) -> list[str]:
+    return [
+        item
+        async for item in hedged_stream(
+            backup=backup.factory(),
+            backup_name=backup.name,
+            delay_sec=delay_sec,
+            primary=primary.factory(),
+            primary_name=primary.name,
+        )
+    ]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize(
+    "primary_sec, backup_sec, delay_sec, expected, backup_started",
+    [
+        pytest.param(
+            0.01,
+            0.01,
+            _DELAY_SEC,
+            "slow",
+            False,
+            id="primary_on_time",
+        ),
+        pytest.param(
+            0.5,
+            0.01,
+            _DELAY_SEC,
+            "fast",
+            True,
+            id="backup_wins",
+        ),
+        pytest.param(
+            0.08,
+            0.5,
+            _DELAY_SEC,
+            "slow",
+            True,
+            id="primary_wins_after_hedge",
+        ),
+        pytest.param(
+            0.2,
+            0.01,
+            None,
+            "slow",
+            False,
+            id="disabled",
+        ),
+    ],
+)
+async def test_hedged_stream(
+    primary_sec: float,
+    backup_sec: float,
+    delay_sec: float | None,
+    expected: str,
+    backup_started: bool,
+) -> None:
+    """
+    Test the first backend to answer is streamed, the backup is only started once the primary is late.
+
+    Steps:
+    1. Stream from two backends, with their first item latencies
+    2. Check all the items are from the expected backend
+    3. Check the backup was only started if the primary was late, and both streams are closed
+    """
+    primary = BackendMock(first_sec=primary_sec, name="slow")
+    backup = BackendMock(first_sec=backup_sec, name="fast")
+    items = await _hedge(primary, backup, delay_sec)
+
+    assume(items == [f"{expected}-{i}" for i in range(3)])
+    assume(backup.started == backup_started)
+    assume(primary.closed)
+    assume(backup.closed == backup_started)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_hedged_stream_errors() -> None:
+    """
+    Test a backend failing before its first item lets the other one answer, the error is raised if both failed.
+
+    Steps:
+    1. Primary fails after the hedge started, check the backup is streamed
+    2. Both fail, check the primary error is raised
+    3. Primary fails before the hedge, check the error is raised without starting the backup
+    """
+    primary = BackendMock(first_sec=0.1, name="slow", error=ValueError("slow"))
+    backup = BackendMock(first_sec=0.2, name="fast")
+    assume(await _hedge(primary, backup) == [f"fast-{i}" for i in range(3)])
+
+    primary = BackendMock(first_sec=0.1, name="slow", error=ValueError("slow"))
+    backup = BackendMock(first_sec=0.2, name="fast", error=ValueError("fast"))
+    with pytest.raises(ValueError, match="slow"):
+        await _hedge(primary, backup)
+
+    primary = BackendMock(first_sec=0.01, name="slow", error=ValueError("slow"))
+    backup = BackendMock(first_sec=0.01, name="fast")
+    with pytest.raises(ValueError, match="slow"):
+        await _hedge(primary, backup)
+    assume(not backup.started)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_hedged_stream_close() -> None:
+    """
+    Test stopping the consumer closes the streamed backend.
+
+    Steps:
+    1. Read the first item, then close the stream
+    2. Check the backend is closed
+    """
+    primary = BackendMock(first_sec=0.01, name="slow")
+    backup = BackendMock(first_sec=0.01, name="fast")
+    stream = hedged_stream(
+        backup=backup.factory(),
+        backup_name=backup.name,
+        delay_sec=_DELAY_SEC,
+        primary=primary.factory(),
+        primary_name=primary.name,
+    )
+    assume(await anext(stream) == "slow-0")
+    await stream.aclose()
+    assume(primary.closed)
+
+
+def test_latency_window() -> None:
+    """
+    Test the percentile is estimated once enough latencies are known, on the recent ones.
+
+    Steps:
+    1. Add fewer latencies than required, check there is no estimate
+    2. Add 100 latencies, check the p95
+    3. Add more latencies than the window size, check the oldest are forgotten
+    """
+    quantile = 0.95
+    window = LatencyWindow(min_samples=20, size=100)
+    for i in range(10):
+        window.add(i / 100)
+    assume(window.percentile(quantile) is None)
+
+    # Latencies are the centiles, from 0 to 0.99 sec
+    for i in range(10, 100):
+        window.add(i / 100)
+    assume(window.percentile(quantile) == quantile)
+
+    slow_sec = 2
+    for _ in range(100):
+        window.add(slow_sec)
+    assume(window.percentile(0.5) == slow_sec)
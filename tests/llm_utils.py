@@ -0,0 +1,193 @@
+import time
+from collections.abc import Callable
+from textwrap import dedent
+from typing import Any
+
+import pytest
+from aiojobs import Scheduler
+from openai.types.chat import ChatCompletionToolParam
+from openai.types.shared_params.function_definition import FunctionDefinition
+from pydantic import TypeAdapter
+from pytest_assume.plugin import assume
+
+from app.helpers.config import CONFIG
+from app.helpers.config_models.conversation import LanguageEntryModel
+from app.helpers.llm_tools import DefaultPlugin
+from app.helpers.llm_utils import (
+    Parameters,
+    _default_values,
+    _jinja,
+    _param_annotations,
+    _parameter_description,
+    _remove_newlines,
+    _required_params,
+    _typed_signature,
+)
+from app.helpers.logging import logger
+from app.models.call import CallInitiateModel, CallStateModel
+from tests.conftest import CallAutomationClientMock, SpeechSynthesizerMock
+
+
+def _call() -> CallStateModel:
+    return CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number="+33612345678",  # pyright: ignore
+        ),
+        voice_id="dummy",
+    )
+
+
+def _plugin(call: CallStateModel, scheduler: Scheduler) -> DefaultPlugin:
+    """
+    Build a plugin, as at each turn of a call.
+    """
+
+    async def _noop(*args, **kwargs) -> None:
+        pass
+
+    return DefaultPlugin(
+        call=call,
+        client=CallAutomationClientMock(
+            hang_up_callback=lambda: None,
+            play_media_callback=lambda _: None,
+            transfer_callback=lambda: None,
+        ),
+        post_callback=_noop,
+        scheduler=scheduler,
+        tts_callback=_noop,
+        tts_client=SpeechSynthesizerMock(play_media_callback=lambda _: None),
+    )
+
+
+async def _legacy_render(source: str, call: CallStateModel) -> str:
+    return _remove_newlines(
+        await _jinja.from_string(dedent(source)).render_async(call=call)
+    )
+
+
+async def _legacy_schema(
+    func: Callable[..., Any], call: CallStateModel
+) -> ChatCompletionToolParam:
+    """
+    Previous implementation, introspection and templates compiled at each turn.
+    """
+    typed_signature = _typed_signature(func)
+    default_values = _default_values(typed_signature)
+    properties = {}
+    for name, value in _param_annotations(typed_signature).items():
+        schema = TypeAdapter(value).json_schema()
+        if name in default_values:
+            schema["default"] = default_values[name]
+        schema["description"] = await _legacy_render(
+            _parameter_description(name, value), call
+        )
+        properties[name] = schema
+    return ChatCompletionToolParam(
+        type="function",
+        function=FunctionDefinition(
+            description=await _legacy_render(func.__doc__ or "", call),
+            name=func.__name__,
+            parameters=Parameters(
+                properties=properties,
+                required=sorted(_required_params(typed_signature)),
+            ).model_dump(),
+        ),
+    )
+
+
+async def _legacy_to_openai(
+    plugin: DefaultPlugin, blacklist: frozenset[str]
+) -> list[ChatCompletionToolParam]:
+    return [
+        await _legacy_schema(func, plugin.call)
+        for func in plugin._available_functions(blacklist)
+    ]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize(
+    "blacklist",
+    [
+        pytest.param(frozenset(), id="all"),
+        pytest.param(frozenset({"end_call", "send_sms"}), id="blacklist"),
+    ],
+)
+async def test_tool_schemas(blacklist: frozenset[str]) -> None:
+    """
+    Test the compiled tool schemas are the same as the ones rendered at each turn.
+
+    Steps:
+    1. Render the tool schemas of a call
+    2. Compare with the previous implementation
+    """
+    async with Scheduler() as scheduler:
+        plugin = _plugin(_call(), scheduler)
+        assume(
+            await plugin.to_openai(blacklist)
+            == await _legacy_to_openai(plugin, blacklist)
+        )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_tool_schemas_cache() -> None:
+    """
+    Test the tool schemas are shared by the turns and the calls, until the call inputs of the templates change.
+
+    Steps:
+    1. Render the schemas of two plugins, for two calls with the same setup
+    2. Check the same schemas are returned
+    3. Change the available languages, check the schemas are rendered again
+    """
+    async with Scheduler() as scheduler:
+        first = await _plugin(_call(), scheduler).to_openai(frozenset())
+        call = _call()
+        call.messages = []  # Turn state is not read by the templates
+        assume(await _plugin(call, scheduler).to_openai(frozenset()) is first)
+
+        call.initiate.lang.availables.append(
+            LanguageEntryModel(
+                pronunciations_en=["French", "FR", "France"],
+                short_code="fr-FR",
+                voice="fr-FR-DeniseNeural",
+            )
+        )
+        updated = await _plugin(call, scheduler).to_openai(frozenset())
+        assume(updated is not first)
+        assume(
+            updated == await _legacy_to_openai(_plugin(call, scheduler), frozenset())
+        )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_tool_schemas_benchmark() -> None:
+    """
+    Benchmark the per-turn cost of the tool schemas, a new plugin is built at each turn.
+
+    Steps:
+    1. Render the schemas at each turn, as before
+    2. Get the compiled schemas at each turn
+    3. Compare the CPU time
+    """
+    iterations = 50
+    call = _call()
+
+    async with Scheduler() as scheduler:
+        start = time.process_time()
+        for _ in range(iterations):
+            await _legacy_to_openai(_plugin(call, scheduler), frozenset())
+        before = (time.process_time() - start) / iterations
+
+        await _plugin(call, scheduler).to_openai(frozenset())  # Warm the cache
+        start = time.process_time()
+        for _ in range(iterations):
+            await _plugin(call, scheduler).to_openai(frozenset())
+        after = (time.process_time() - start) / iterations
+
+    logger.info(
+        "Tool schemas per turn: %.2f ms before, %.3f ms after (x%.0f)",
+        before * 1000,
+        after * 1000,
+        before / after,
+    )
+    assume(after * 10 < before)
@@ -0,0 +1,415 @@
+import json
+import time
+from collections.abc import AsyncGenerator
+from functools import lru_cache
+from typing import Any, Literal
+
+import pytest
+import tiktoken
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionChunk,
+    ChatCompletionMessage,
+    ChatCompletionSystemMessageParam,
+)
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import (
+    Choice as ChunkChoice,
+    ChoiceDelta,
+)
+from openai.types.completion_usage import CompletionUsage, PromptTokensDetails
+from pytest_assume.plugin import assume
+
+from app.helpers import llm_worker
+from app.helpers.config import CONFIG
+from app.helpers.llm_worker import (
+    _completion_stream_worker,
+    _completion_sync_worker,
+    _count_tokens,
+    _encoding_name,
+    _limit_messages,
+)
+from app.helpers.logging import logger
+from app.models.message import (
+    ActionEnum as MessageActionEnum,
+    MessageModel,
+    PersonaEnum as MessagePersonaEnum,
+    StyleEnum as MessageStyleEnum,
+    ToolModel,
+)
+
+_MODEL = "gpt-4o"
+_SYSTEM = [
+    ChatCompletionSystemMessageParam(
+        content="Assistant is called Amélie and is working in a call center. " * 50,
+        role="system",
+    ),
+    ChatCompletionSystemMessageParam(
+        content="Today is Mon 15 Jul 2024, 12:43 (CEST).",
+        role="system",
+    ),
+]
+
+_PROMPT_TOKENS = 2048
+_CACHED_TOKENS = 1536
+_USAGE = CompletionUsage(
+    completion_tokens=3,
+    prompt_tokens=_PROMPT_TOKENS,
+    prompt_tokens_details=PromptTokensDetails(cached_tokens=_CACHED_TOKENS),
+    total_tokens=_PROMPT_TOKENS + 3,
+)
+
+
+class CompletionsMock:
+    """
+    Chat completions of the OpenAI SDK, answering "Hello world!" with the usage.
+
+    Streamed answers end with a chunk carrying the usage, without choices, as requested with `stream_options`.
+    """
+
+    async def create(self, **kwargs: Any) -> ChatCompletion | AsyncGenerator:
+        if kwargs.get("stream"):
+            assert kwargs["stream_options"] == {"include_usage": True}
+            return self._stream()
+        return ChatCompletion(
+            choices=[
+                Choice(
+                    finish_reason="stop",
+                    index=0,
+                    message=ChatCompletionMessage(
+                        content="Hello world!",
+                        role="assistant",
+                    ),
+                )
+            ],
+            created=0,
+            id="completion",
+            model=_MODEL,
+            object="chat.completion",
+            usage=_USAGE,
+        )
+
+    async def _stream(self) -> AsyncGenerator[ChatCompletionChunk, None]:
+        deltas: list[tuple[str, Literal["stop"] | None]] = [
+            ("Hello", None),
+            (" world!", "stop"),
+        ]
+        for content, finish_reason in deltas:
+            yield self._chunk(
+                choices=[
+                    ChunkChoice(
+                        delta=ChoiceDelta(content=content),
+                        finish_reason=finish_reason,
+                        index=0,
+                    )
+                ]
+            )
+        yield self._chunk(choices=[], usage=_USAGE)
+
+    def _chunk(self, **kwargs: Any) -> ChatCompletionChunk:
+        return ChatCompletionChunk(
+            created=0,
+            id="completion",
+            model=_MODEL,
+            object="chat.completion.chunk",
+            **kwargs,
+        )
+
+
+class ClientMock:
+    """
+    OpenAI client, with the chat completions only.
+    """
+
+    def __init__(self) -> None:
+        self.chat = self
+        self.completions = CompletionsMock()
+
+
+def _history(length: int) -> list[MessageModel]:
+    """
+    Build a conversation, alternating the customer and the assistant, with tool calls.
+    """
+    messages = []
+    for i in range(length):
+        if i % 2:
+            messages.append(
+                MessageModel(
+                    content=f"I understand, your router {i} is blinking red. Let me check the line.",
+                    persona=MessagePersonaEnum.ASSISTANT,
+                    style=MessageStyleEnum.CHEERFUL,
+                    tool_calls=[
+                        ToolModel(
+                            content=f"Line {i} is up",
+                            function_arguments=json.dumps({"line": i}),
+                            function_name="check_line",
+                            tool_id=f"call_{i}",
+                        )
+                    ]
+                    if i % 10 == 1
+                    else [],
+                )
+            )
+        else:
+            messages.append(
+                MessageModel(
+                    action=MessageActionEnum.TALK,
+                    content=f"Hello, my internet is down since {i} minutes, can you help me?",
+                    persona=MessagePersonaEnum.HUMAN,
+                )
+            )
+    return messages
+
+
+@lru_cache  # Previous implementation, cache keyed by the whole serialized message
+def _legacy_count_tokens(content: str, model: str) -> int:
+    return len(
+        tiktoken.get_encoding(tiktoken.encoding_name_for_model(model)).encode(content)
+    )
+
+
+def _legacy_limit_messages(
+    context_window: int,
+    max_messages: int,
+    messages: list[MessageModel],
+    system: list[ChatCompletionSystemMessageParam],
+) -> list:
+    """
+    Previous implementation, each message serialized and counted at each call.
+    """
+    counter = 0
+    selected_messages = []
+    tokens = 0
+    for message in system:
+        tokens += _legacy_count_tokens(json.dumps(message), _MODEL)
+        counter += 1
+    for message in messages[::-1]:
+        openai_message = message.to_openai()
+        new_tokens = _legacy_count_tokens(
+            "".join([json.dumps(x) for x in openai_message]),
+            _MODEL,
+        )
+        if tokens + new_tokens >= context_window:
+            break
+        if counter >= max_messages:
+            break
+        counter += 1
+        selected_messages += openai_message[::-1]
+        tokens += new_tokens
+    return [
+        *system,
+        *selected_messages[::-1],
+    ]
+
+
+@pytest.mark.parametrize(
+    "context_window, max_messages",
+    [
+        pytest.param(128000, 1000, id="all"),
+        pytest.param(128000, 20, id="max_messages"),
+        pytest.param(3000, 1000, id="context_window"),
+        pytest.param(10, 1000, id="system_only"),
+    ],
+)
+def test_limit_messages(context_window: int, max_messages: int) -> None:
+    """
+    Test the messages selected are the same as the previous implementation.
+
+    Steps:
+    1. Build a 200-message history
+    2. Limit it by the context window or the number of messages
+    3. Compare with the previous implementation
+    """
+    messages = _history(200)
+    assume(
+        _limit_messages(
+            context_window=context_window,
+            max_messages=max_messages,
+            max_tokens=None,
+            messages=messages,
+            model=_MODEL,
+            system=_SYSTEM,
+        )
+        == _legacy_limit_messages(
+            context_window=context_window,
+            max_messages=max_messages,
+            messages=messages,
+            system=_SYSTEM,
+        )
+    )
+
+
+def test_limit_messages_continuation() -> None:
+    """
+    Test the answer cut off is followed by the instruction to continue it, within the context window.
+
+    Steps:
+    1. Build a history ending with an answer cut off
+    2. Limit it with the continuation instruction as suffix
+    3. Check the prompt ends with the answer then the instruction
+    4. Check the instruction cost is taken from the history
+    """
+    continuation = CONFIG.prompts.llm.chat_continuation()
+    messages = [
+        *_history(200),
+        MessageModel(
+            content="I booked a technician for tomorrow between 8 and",
+            persona=MessagePersonaEnum.ASSISTANT,
+        ),
+    ]
+    kwargs = {
+        "context_window": 3000,
+        "max_tokens": 160,
+        "messages": messages,
+        "model": _MODEL,
+        "system": _SYSTEM,
+    }
+
+    prompt = _limit_messages(suffix=[continuation], **kwargs)
+    assume(prompt[-1] == continuation)
+    assume(prompt[-2] == messages[-1].to_openai()[0])
+    assume(len(prompt) - 1 <= len(_limit_messages(**kwargs)))
+
+
+def test_message_tokens_invalidation() -> None:
+    """
+    Test the token cost of a message is counted again once it changed.
+
+    Steps:
+    1. Count a message, then count it again
+    2. Change the content, then a tool call, and check the cost each time
+    """
+    encoding = _encoding_name(_MODEL)
+    calls = []
+
+    def _count(content: str) -> int:
+        calls.append(content)
+        return _count_tokens(content, encoding)
+
+    message = _history(2)[1]
+    first = message.tokens(encoding, _count)
+    assume(message.tokens(encoding, _count) == first)
+    assume(len(calls) == 1)
+
+    # Counted once again after each change
+    calls.clear()
+    message.content += " Please hold on."
+    second = message.tokens(encoding, _count)
+    assume(second > first)
+    assume(len(calls) == 1)
+
+    message.tool_calls.append(
+        ToolModel(
+            content="Technician booked",
+            function_arguments="{}",
+            function_name="book_technician",
+            tool_id="call_book",
+        )
+    )
+    calls.clear()
+    assume(message.tokens(encoding, _count) > second)
+    assume(len(calls) == 1)
+
+
+def test_limit_messages_benchmark() -> None:
+    """
+    Benchmark the context selection of a 200-message history, repeated as at each turn.
+
+    Steps:
+    1. Select the context with the previous implementation, warm cache
+    2. Select the context with the cached costs
+    3. Compare the CPU time
+    """
+    iterations = 200
+    messages = _history(200)
+
+    kwargs = {
+        "context_window": 128000,
+        "max_messages": 1000,
+        "messages": messages,
+        "system": _SYSTEM,
+    }
+    _legacy_limit_messages(**kwargs)  # Warm the cache
+    start = time.process_time()
+    for _ in range(iterations):
+        _legacy_limit_messages(**kwargs)
+    before = (time.process_time() - start) / iterations
+
+    _limit_messages(max_tokens=None, model=_MODEL, **kwargs)  # Warm the cache
+    start = time.process_time()
+    for _ in range(iterations):
+        _limit_messages(max_tokens=None, model=_MODEL, **kwargs)
+    after = (time.process_time() - start) / iterations
+
+    logger.info(
+        "Context selection of 200 messages: %.2f ms before, %.2f ms after (x%.1f)",
+        before * 1000,
+        after * 1000,
+        before / after,
+    )
+    assume(after < before)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize(
+    "streaming",
+    [
+        pytest.param(True, id="stream"),
+        pytest.param(False, id="single"),
+    ],
+)
+async def test_completion_usage(
+    monkeypatch: pytest.MonkeyPatch,
+    streaming: bool,
+) -> None:
+    """
+    Test the prompt cache usage of a completion is reported, streamed or not.
+
+    Steps:
+    1. Stream a completion, up to the chunk with the usage
+    2. Check the answer is complete
+    3. Check the cached ratio and tokens are reported, with the model
+    4. Run a sync completion, check it is reported the same way
+    """
+    platform = CONFIG.llm.selected(False).model_copy(update={"streaming": streaming})
+    metrics = []
+
+    async def _use_llm(*args, **kwargs) -> tuple[ClientMock, Any]:  # noqa: ARG001
+        return ClientMock(), platform
+
+    def _record(attributes: dict[str, str], metric: Any, value: float) -> None:
+        metrics.append((metric, attributes, value))
+
+    monkeypatch.setattr(llm_worker, "_use_llm", _use_llm)
+    monkeypatch.setattr(llm_worker, "counter_add", _record)
+    monkeypatch.setattr(llm_worker, "gauge_set", _record)
+    expected = [
+        (
+            llm_worker.call_llm_cached_ratio,
+            {"llm.model": platform.model},
+            _CACHED_TOKENS / _PROMPT_TOKENS,
+        ),
+        (
+            llm_worker.call_llm_cached_tokens,
+            {"llm.model": platform.model},
+            _CACHED_TOKENS,
+        ),
+    ]
+
+    deltas = [
+        delta
+        async for delta in _completion_stream_worker(
+            is_fast=False,
+            max_tokens=160,
+            messages=_history(2),
+            system=_SYSTEM,
+        )
+    ]
+    assume("".join(delta.content or "" for delta in deltas) == "Hello world!")
+    assume(metrics == expected)
+
+    metrics.clear()
+    assume(
+        await _completion_sync_worker(is_fast=False, system=_SYSTEM) == "Hello world!"
+    )
+    assume(metrics == expected)
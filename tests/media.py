@@ -0,0 +1,387 @@
+import json
+import time
+from base64 import b64decode, b64encode
+from collections.abc import Callable
+
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.logging import logger
+from app.helpers.media import (
+    STOP_AUDIO_MESSAGE,
+    AudioLoop,
+    AudioMetadata,
+    AudioPacer,
+    PlayoutMark,
+    decode_audio_data,
+    encode_audio_data,
+    wav_frames,
+)
+
+_FRAME = bytes(range(256)) * 2 + bytes(128)  # 20 ms of PCM 16-bit at 16 kHz
+_SAMPLE_RATE = 16000
+
+
+def _inbound_message(pcm: bytes, silent: bool = False) -> str:
+    """
+    Build an inbound media streaming message, as sent by Communication Services.
+    """
+    return json.dumps(
+        {
+            "kind": "AudioData",
+            "audioData": {
+                "data": b64encode(pcm).decode("utf-8"),
+                "participantRawID": "8:acs:00000000-0000-0000-0000-000000000000",
+                "silent": silent,
+                "timestamp": "2024-11-13T10:00:00.000Z",
+            },
+        }
+    )
+
+
+def _stdlib_round_trip(message: str) -> str:
+    """
+    Previous implementation, full JSON parse and serialization with the standard library.
+    """
+    event = json.loads(message)
+    pcm = b64decode(event["audioData"]["data"])
+    return json.dumps(
+        {
+            "kind": "AudioData",
+            "audioData": {
+                "data": b64encode(pcm).decode("utf-8"),
+            },
+        }
+    )
+
+
+def _codec_round_trip(message: str) -> str:
+    """
+    Media codec implementation.
+    """
+    pcm = decode_audio_data(message)
+    assert isinstance(pcm, bytes)
+    return encode_audio_data(pcm)
+
+
+def _frames_per_sec(func: Callable[[str], str], message: str) -> float:
+    """
+    Measure how many frames a single core can decode and encode per second.
+    """
+    iterations = 20000
+    start = time.process_time()
+    for _ in range(iterations):
+        func(message)
+    return iterations / (time.process_time() - start)
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        pytest.param(
+            _inbound_message(_FRAME),
+            _FRAME,
+            id="audio",
+        ),
+        pytest.param(
+            _inbound_message(_FRAME).encode(),
+            _FRAME,
+            id="audio_binary_frame",
+        ),
+        pytest.param(
+            _inbound_message(_FRAME, silent=True),
+            None,
+            id="silent",
+        ),
+        pytest.param(
+            json.dumps({"kind": "DtmfData", "dtmfData": {"data": "1"}}),
+            None,
+            id="not_audio",
+        ),
+    ],
+)
+def test_decode_audio_data(
+    message: str | bytes,
+    expected: bytes | None,
+) -> None:
+    """
+    Test the decoding of inbound media streaming messages.
+
+    Steps:
+    1. Decode a message
+    2. Compare the PCM audio with the expected one
+    """
+    assume(decode_audio_data(message) == expected)
+
+
+@pytest.mark.parametrize(
+    "metadata, expected_sample_rate",
+    [
+        pytest.param(
+            {
+                "channels": 1,
+                "encoding": "PCM",
+                "length": 960,
+                "sampleRate": 24000,
+                "subscriptionId": "00000000-0000-0000-0000-000000000000",
+            },
+            24000,
+            id="wideband",
+        ),
+        pytest.param(
+            {},
+            16000,
+            id="default",
+        ),
+    ],
+)
+def test_decode_audio_metadata(
+    metadata: dict,
+    expected_sample_rate: int,
+) -> None:
+    """
+    Test the decoding of the audio format, announced at the start of the stream.
+
+    Steps:
+    1. Decode a metadata message
+    2. Check the audio format, with the defaults of Communication Services for the missing fields
+    """
+    event = decode_audio_data(
+        json.dumps({"kind": "AudioMetadata", "audioMetadata": metadata})
+    )
+    assert isinstance(event, AudioMetadata)
+    assume(event.channels == 1)
+    assume(event.encoding == "PCM")
+    assume(event.sample_rate == expected_sample_rate)
+
+
+def test_encode_audio_data() -> None:
+    """
+    Test the outbound messages are the same as the standard library serialization.
+
+    Steps:
+    1. Encode a frame
+    2. Parse it back and compare with the expected message
+    """
+    assume(
+        json.loads(encode_audio_data(_FRAME))
+        == {
+            "kind": "AudioData",
+            "audioData": {
+                "data": b64encode(_FRAME).decode("utf-8"),
+            },
+        }
+    )
+    assume(json.loads(STOP_AUDIO_MESSAGE) == {"kind": "StopAudio", "stopAudio": {}})
+
+
+def test_audio_pacer() -> None:
+    """
+    Test the outbound audio is sent by batches, at real-time rate, with a bounded lead.
+
+    Steps:
+    1. Push 1 sec of audio at once, in odd-sized buffers
+    2. Simulate the sender loop over 2 sec, with a 5 ms clock
+    3. Check the batches sizes, the lead and the total audio sent
+    """
+    pacer = AudioPacer(
+        batch_ms=60,
+        lead_ms=120,
+        sample_rate=_SAMPLE_RATE,
+    )
+    audio = _FRAME * 50
+    for i in range(0, len(audio), 1000):
+        pacer.push(audio[i : i + 1000], now=0)
+
+    sent = 0
+    max_lead_sec = 0
+    batches = []
+    for tick in range(400):
+        now = tick * 0.005
+        while batch := pacer.pop(now):
+            batches.append(len(batch))
+            sent += len(batch)
+        # Audio sent minus audio played by the client
+        lead_sec = sent / len(_FRAME) * 0.02 - now
+        max_lead_sec = max(max_lead_sec, lead_sec)
+
+    assume(sent == len(audio))
+    assume(max_lead_sec <= 0.12 + 1e-6)
+    assume(
+        all(size == len(_FRAME) * 3 for size in batches[:-1])
+    )  # Last batch is the remainder
+    assume(pacer.wait_time(now=2) is None)
+
+
+def test_audio_pacer_partial_frame() -> None:
+    """
+    Test the last partial frame is sent once the synthesis paused.
+
+    Steps:
+    1. Push half a frame
+    2. Check nothing is sent until a frame duration elapsed
+    """
+    pacer = AudioPacer(
+        batch_ms=60,
+        lead_ms=120,
+        sample_rate=_SAMPLE_RATE,
+    )
+    pacer.push(_FRAME[:320], now=0)
+    assume(pacer.pop(now=0.01) is None)
+    assume(pacer.pop(now=0.02) == _FRAME[:320])
+
+
+def test_audio_pacer_clear() -> None:
+    """
+    Test the barge-in drops the queued audio and resets the playout clock.
+
+    Steps:
+    1. Push 1 sec of audio and send the first batches
+    2. Clear the pacer
+    3. Check nothing is left, and new audio is sent right away
+    """
+    pacer = AudioPacer(
+        batch_ms=60,
+        lead_ms=120,
+        sample_rate=_SAMPLE_RATE,
+    )
+    pacer.push(_FRAME * 50, now=0)
+    while pacer.pop(now=0):
+        pass
+    pacer.clear(now=0.05)
+    assume(pacer.wait_time(now=0.05) is None)
+    pacer.push(_FRAME * 3, now=0.05)
+    assume(pacer.pop(now=0.05) == _FRAME * 3)
+
+
+def test_audio_pacer_playout_mark() -> None:
+    """
+    Test an utterance mark is resolved once its last frame is sent, with the time the client plays it.
+
+    Steps:
+    1. Push two utterances of 200 ms, each followed by its mark
+    2. Simulate the sender loop, check each mark is resolved with the batch holding its last frame
+    3. Mark with nothing queued, check it is resolved at once
+    4. Push and mark, then clear, check the mark is resolved, the audio is dropped
+    """
+    pacer = AudioPacer(
+        batch_ms=60,
+        lead_ms=120,
+        sample_rate=_SAMPLE_RATE,
+    )
+    first, second = PlayoutMark(), PlayoutMark()
+    pacer.push(_FRAME * 10, now=0)
+    pacer.mark(first, now=0)
+    pacer.push(_FRAME * 10, now=0)
+    pacer.mark(second, now=0)
+    assume(first.played_at is None)
+
+    resolved: dict[str, float] = {}
+    for tick in range(100):
+        now = tick * 0.005
+        while pacer.pop(now):
+            for mark in (first, second):
+                if mark.played_at is not None and mark.id not in resolved:
+                    resolved[mark.id] = now
+    # Resolved once sent, ahead of the playout by at most the client lead
+    for mark in (first, second):
+        assume(0 <= (mark.played_at or 0) - resolved[mark.id] <= 0.12 + 1e-6)
+    # Played at the end of the batch holding the last frame
+    assume(first.played_at == pytest.approx(0.24))
+    assume(second.played_at == pytest.approx(0.4))
+
+    # Nothing queued
+    idle = PlayoutMark()
+    pacer.mark(idle, now=1)
+    assume(idle.played_at == 1)
+
+    # Barge-in
+    dropped = PlayoutMark()
+    pacer.push(_FRAME * 10, now=1)
+    pacer.mark(dropped, now=1)
+    cleared_at = 1.01
+    pacer.clear(now=cleared_at)
+    assume(dropped.played_at == cleared_at)
+
+
+def test_loading_sound_frames() -> None:
+    """
+    Test the loading sound is decoded in whole frames.
+
+    Steps:
+    1. Decode the public loading sound
+    2. Check the frames size, and they are cached for the next calls
+    """
+    frames = wav_frames(
+        path="public/loading.wav",
+        sample_rate=_SAMPLE_RATE,
+    )
+    assume(len(frames) > 0)
+    assume(all(len(frame) == len(_FRAME) for frame in frames))
+    assume(
+        wav_frames(
+            path="public/loading.wav",
+            sample_rate=_SAMPLE_RATE,
+        )
+        is frames
+    )
+
+
+def test_audio_loop() -> None:
+    """
+    Test the loading sound loops at real-time rate, and fades out when stopped.
+
+    Steps:
+    1. Start a loop of 3 frames, simulate the sender over 200 ms with a 5 ms clock
+    2. Check the frames are in loop order, with a bounded lead
+    3. Stop, check the last frame is faded out and nothing is due anymore
+    """
+    frames = tuple(
+        bytes([i + 1]) * len(_FRAME) for i in range(3)
+    )  # Distinct non-silent frames
+    loop = AudioLoop(
+        frames=frames,
+        lead_ms=60,
+    )
+    assume(loop.wait_time(now=0) is None)
+    loop.start(now=0)
+
+    sent: list[bytes] = []
+    max_lead_sec = 0
+    for tick in range(40):
+        now = tick * 0.005
+        while frame := loop.pop(now):
+            sent.append(frame)
+        max_lead_sec = max(max_lead_sec, len(sent) * 0.02 - now)
+
+    assume(sent == [frames[i % 3] for i in range(len(sent))])
+    assume(len(sent) == 200 // 20 + 60 // 20)  # Real-time plus the lead
+    assume(max_lead_sec <= 0.06 + 0.02 + 1e-6)
+
+    fade_out = loop.stop()
+    assume(fade_out is not None and len(fade_out) == len(_FRAME))
+    assume(fade_out is not None and fade_out[-2:] == bytes(2))  # Ends in silence
+    assume(not loop.active)
+    assume(loop.wait_time(now=1) is None)
+    assume(loop.stop() is None)
+
+
+def test_media_codec_benchmark() -> None:
+    """
+    Benchmark the frames per second per core of the media WebSocket path.
+
+    Steps:
+    1. Round-trip a frame with the standard library, as before
+    2. Round-trip a frame with the media codec
+    3. Compare the throughputs
+    """
+    message = _inbound_message(_FRAME)
+    before = _frames_per_sec(_stdlib_round_trip, message)
+    after = _frames_per_sec(_codec_round_trip, message)
+    logger.info(
+        "Media frames per second per core: %.0f before, %.0f after (x%.1f)",
+        before,
+        after,
+        after / before,
+    )
+    assume(after > before)
@@ -0,0 +1,81 @@
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from pytest_assume.plugin import assume
+
+from app.helpers.config import CONFIG
+from app.models.call import CallInitiateModel, CallStateModel
+from app.models.reminder import ReminderModel
+from app.models.training import TrainingModel
+
+
+def _call(phone_number: str) -> CallStateModel:
+    """
+    Build a call with its own customer, inquiry and reminders.
+    """
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number=phone_number,  # pyright: ignore
+        ),
+        voice_id="dummy",
+    )
+    call.inquiry["inquiry_description"] = f"Internet is down for {phone_number}"
+    call.reminders.append(
+        ReminderModel(
+            description=f"Call back {phone_number}",
+            due_date_time=datetime.now(UTC) + timedelta(days=1),
+            title="Call back",
+        )
+    )
+    return call
+
+
+def _training(content: str) -> TrainingModel:
+    return TrainingModel(
+        content=content,
+        id=uuid4(),
+        score=1,
+        title="Internal documentation",
+    )
+
+
+def test_chat_system_prefix() -> None:
+    """
+    Test the chat system prompt starts with the same messages, whatever the call and the turn.
+
+    Steps:
+    1. Build the chat system prompt of two calls, with different customers, inquiries, reminders, languages and trainings
+    2. Check all the messages but the last one are the same
+    3. Check the values of each call are only in the last message
+    """
+    first_call = _call("+33612345678")
+    second_call = _call("+33687654321")
+    second_call.lang = CONFIG.conversation.initiate.lang.availables[-1].short_code
+
+    first = CONFIG.prompts.llm.chat_system(
+        call=first_call,
+        trainings=[_training("Modems are lent, they must be returned.")],
+    )
+    second = CONFIG.prompts.llm.chat_system(
+        call=second_call,
+        trainings=[_training("Roaming packs are valid 7 days.")],
+    )
+
+    # Stable prefix
+    assume(len(first) == len(second))
+    assume(first[:-1] == second[:-1])
+
+    # Dynamic suffix
+    for call, messages in ((first_call, first), (second_call, second)):
+        prefix = " ".join(str(message["content"]) for message in messages[:-1])
+        context = str(messages[-1]["content"])
+        for value in (
+            call.initiate.phone_number,
+            call.inquiry["inquiry_description"],
+            call.reminders[0].description,
+        ):
+            assume(str(value) not in prefix)
+            assume(str(value) in context)
+    assume("Modems are lent" in str(first[-1]["content"]))
+    assume("Roaming packs" in str(second[-1]["content"]))
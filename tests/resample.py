@@ -0,0 +1,151 @@
+import time
+
+import numpy as np
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.logging import logger
+from app.helpers.resample import Resampler
+
+_CONVERSIONS = [
+    pytest.param(
+        8000,
+        16000,
+        id="pstn_to_pipeline",
+    ),
+    pytest.param(
+        16000,
+        8000,
+        id="pipeline_to_pstn",
+    ),
+    pytest.param(
+        24000,
+        16000,
+        id="hd_voice_to_pipeline",
+    ),
+    pytest.param(
+        16000,
+        24000,
+        id="pipeline_to_wideband_stream",
+    ),
+    pytest.param(
+        48000,
+        16000,
+        id="studio_voice_to_pipeline",
+    ),
+]
+_FRAME_MS = 20
+_LEVEL_TOLERANCE = 0.01  # Speech band level, relative to the input
+_MAX_CPU_PER_SEC = 0.01  # CPU time per second of audio, 1% of a core
+_MIN_REJECTION_DB = 60  # Attenuation of the frequencies above the output band
+
+
+def _tone(frequency: float, sample_rate: int, duration_sec: float = 1) -> np.ndarray:
+    """
+    Generate a sine tone, at half the full scale, in PCM 16-bit.
+    """
+    t = np.arange(int(duration_sec * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * frequency * t) * 16384).astype(np.int16)
+
+
+def _rms(samples: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+
+
+def _resample_frames(
+    resampler: Resampler, pcm: np.ndarray, frame_size: int
+) -> list[bytes]:
+    """
+    Resample a signal frame by frame, as the stream would.
+    """
+    return [
+        resampler.process(pcm[pointer : pointer + frame_size].tobytes())
+        for pointer in range(0, len(pcm), frame_size)
+    ]
+
+
+@pytest.mark.parametrize("from_rate, to_rate", _CONVERSIONS)
+def test_resampler_frames(from_rate: int, to_rate: int) -> None:
+    """
+    Test whole frames are resampled to whole frames, and the chunking does not change the audio.
+
+    Steps:
+    1. Resample 1 sec of a tone, in 20 ms frames
+    2. Check each output is a whole 20 ms frame at the output rate
+    3. Resample the same tone in a single chunk, then in odd-sized chunks, check the audio is the same
+    """
+    tone = _tone(1000, from_rate)
+    frames = _resample_frames(
+        resampler=Resampler(from_rate, to_rate),
+        pcm=tone,
+        frame_size=from_rate * _FRAME_MS // 1000,
+    )
+    assume(all(len(frame) == to_rate * _FRAME_MS // 1000 * 2 for frame in frames))
+
+    whole = Resampler(from_rate, to_rate).process(tone.tobytes())
+    odd = b"".join(_resample_frames(Resampler(from_rate, to_rate), tone, 333))
+    assume(b"".join(frames) == whole)
+    assume(odd == whole)
+
+
+@pytest.mark.parametrize("from_rate, to_rate", _CONVERSIONS)
+def test_resampler_quality(from_rate: int, to_rate: int) -> None:
+    """
+    Test the speech band is kept at the same level, and the frequencies above the output band do not fold back.
+
+    Steps:
+    1. Resample a 1 kHz tone, check its level is kept
+    2. When downsampling, resample a tone above the output Nyquist frequency, check it is attenuated by 60 dB at least
+    3. When the rates are the same, check the audio is untouched
+    """
+    tone = _tone(1000, from_rate)
+    resampled = np.frombuffer(
+        Resampler(from_rate, to_rate).process(tone.tobytes()), dtype=np.int16
+    )
+    settled = resampled[to_rate // 100 :]  # Skip the filter warm-up
+    assume(abs(_rms(settled) / _rms(tone) - 1) < _LEVEL_TOLERANCE)
+
+    if to_rate < from_rate:
+        alias = _tone(to_rate * 0.7, from_rate)
+        resampled = np.frombuffer(
+            Resampler(from_rate, to_rate).process(alias.tobytes()), dtype=np.int16
+        )
+        rejection_db = 20 * np.log10(
+            _rms(alias) / max(_rms(resampled[to_rate // 100 :]), 1e-3)
+        )
+        assume(rejection_db >= _MIN_REJECTION_DB)
+
+    passthrough = Resampler(from_rate, from_rate)
+    assume(passthrough.passthrough)
+    assume(passthrough.process(tone.tobytes()) == tone.tobytes())
+
+
+@pytest.mark.parametrize("from_rate, to_rate", _CONVERSIONS)
+def test_resampler_benchmark(from_rate: int, to_rate: int) -> None:
+    """
+    Benchmark the CPU cost of a conversion, on a stream of 20 ms frames.
+
+    Steps:
+    1. Resample 1 sec of a tone, in 20 ms frames, several times
+    2. Compare the CPU time with the audio duration
+
+    A stream should cost under 1% of a core, a process serves hundreds of calls, each with up to three conversions.
+    """
+    tone = _tone(1000, from_rate)
+    frame_size = from_rate * _FRAME_MS // 1000
+    resampler = Resampler(from_rate, to_rate)
+    _resample_frames(resampler, tone, frame_size)  # Warm up the filters
+
+    iterations = 20
+    start = time.process_time()
+    for _ in range(iterations):
+        _resample_frames(resampler, tone, frame_size)
+    cost = (time.process_time() - start) / iterations
+    logger.info(
+        "CPU per second of audio from %i Hz to %i Hz: %.2f ms (%.2f%% of a core)",
+        from_rate,
+        to_rate,
+        cost * 1000,
+        cost * 100,
+    )
+    assume(cost < _MAX_CPU_PER_SEC)
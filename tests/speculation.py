@@ -0,0 +1,137 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+from pytest_assume.plugin import assume
+
+from app.helpers.config import CONFIG
+from app.helpers.speculation import Speculator, normalize_transcript
+from app.helpers.timer import TimerWheel
+from app.models.call import CallInitiateModel, CallStateModel
+from app.models.message import MessageModel, PersonaEnum as MessagePersonaEnum
+from tests.conftest import ClockMock
+
+_STABLE_MS = 300
+
+
+class SpeculatorMock:
+    """
+    Speculator on a manually driven wheel, with a fake completion echoing the user message.
+    """
+
+    call: CallStateModel
+    clock: ClockMock
+    speculator: Speculator
+    started: list[str]
+    wheel: TimerWheel
+
+    def __init__(self):
+        self.call = CallStateModel(
+            initiate=CallInitiateModel(
+                **CONFIG.conversation.initiate.model_dump(),
+                phone_number="+33612345678",  # pyright: ignore
+            ),
+            voice_id="dummy",
+        )
+        self.clock = ClockMock()
+        self.started = []
+        self.wheel = TimerWheel(
+            clock=self.clock,
+            slots=64,
+            tick_ms=10,
+        )
+        self.speculator = Speculator(
+            call=self.call,
+            stable_ms=_STABLE_MS,
+            stream=self._stream,
+            wheel=self.wheel,
+        )
+
+    async def _stream(self, call: CallStateModel) -> AsyncGenerator[ChoiceDelta, None]:
+        text = call.messages[-1].content
+        self.started.append(text)
+        for word in text.split():
+            yield ChoiceDelta(content=f"{word} ")
+            await asyncio.sleep(0)
+
+    async def advance(self, sec: float) -> None:
+        self.clock.now = round(self.clock.now + sec, 6)
+        self.wheel.advance(self.clock.now)
+        # Let the completion run
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    def commit(self, text: str) -> None:
+        self.call.messages.append(
+            MessageModel(
+                content=text,
+                persona=MessagePersonaEnum.HUMAN,
+            )
+        )
+
+
+def test_normalize_transcript() -> None:
+    """
+    Test the normalization ignores case, punctuation and spacing.
+    """
+    assume(
+        normalize_transcript(" Hello,  I moved to 123 Main Street. ")
+        == normalize_transcript("hello I moved to 123 main street")
+    )
+    assume(normalize_transcript("I moved") != normalize_transcript("I moved out"))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_speculation_hit() -> None:
+    """
+    Test a stable partial transcript is speculated once, and its deltas are released when the final transcript matches.
+
+    Steps:
+    1. Feed changing partial transcripts, check nothing is speculated before they are stable
+    2. Wait for the stable duration, check the answer is speculated once
+    3. Commit a final transcript differing only by the punctuation, check the speculation is taken and its deltas replayed
+    """
+    mock = SpeculatorMock()
+    mock.speculator.on_transcript("I moved", final=False)
+    await mock.advance(0.1)
+    mock.speculator.on_transcript("I moved to Paris", final=False)
+    await mock.advance(0.2)
+    assume(mock.started == [])
+
+    await mock.advance(0.2)
+    assume(mock.started == ["I moved to Paris"])
+    mock.speculator.on_transcript("I moved to Paris", final=False)
+    await mock.advance(0.5)
+    assume(len(mock.started) == 1)
+
+    mock.commit("I moved to Paris.")
+    speculation = mock.speculator.take(mock.call)
+    assert speculation
+    deltas = [delta.content or "" async for delta in speculation.deltas()]
+    assume("".join(deltas) == "I moved to Paris ")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_speculation_miss() -> None:
+    """
+    Test a speculation is replaced when the transcript changes, and cancelled when the final transcript differs.
+
+    Steps:
+    1. Speculate on a final recognition, at once
+    2. Change the transcript, check a new speculation replaces it once stable
+    3. Commit a different final transcript, check no speculation is taken
+    """
+    mock = SpeculatorMock()
+    mock.speculator.on_transcript("I moved", final=True)
+    assume(mock.started == [])  # Stream starts with the task
+    await mock.advance(0)
+    assume(mock.started == ["I moved"])
+
+    mock.speculator.on_transcript("I moved to Lyon", final=False)
+    await mock.advance(_STABLE_MS / 1000)
+    assume(mock.started == ["I moved", "I moved to Lyon"])
+
+    mock.commit("I moved to Lille")
+    assume(mock.speculator.take(mock.call) is None)
+    assume(len(mock.wheel) == 0)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+from azure.core.credentials import AccessToken
+from pytest_assume.plugin import assume
+
+from app.helpers import speech_pool
+from app.helpers.speech_pool import SpeechPool
+
+
+class ConnectionMock:
+    """
+    Connection of a client, without the Speech SDK.
+    """
+
+    opened: bool = False
+
+    @classmethod
+    def from_speech_synthesizer(cls, *args, **kwargs) -> "ConnectionMock":  # noqa: ARG003
+        return cls()
+
+    def open(self, *args, **kwargs) -> None:  # noqa: ARG002
+        self.opened = True
+
+
+class ClientMock:
+    """
+    Speech client, recording the token it was built with.
+    """
+
+    authorization_token: str
+
+    def __init__(self, token: str) -> None:
+        self.authorization_token = token
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_speech_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test the pool hands out warm clients, refills in the background, and is bounded by size and idle TTL.
+
+    Steps:
+    1. Fill the pool, check `size` clients are created and connected
+    2. Acquire, check a warm client is returned, and the pool is refilled
+    3. Release more clients than the size, check the pool stays bounded
+    4. Release a non-reusable client, check it is discarded
+    5. Wait for the idle TTL, check the idle clients are discarded
+    """
+    monkeypatch.setattr(speech_pool, "Connection", ConnectionMock)
+    created: list[ClientMock] = []
+
+    def _factory(token: str) -> ClientMock:
+        created.append(ClientMock(token))
+        return created[-1]
+
+    size = 2
+    pool = SpeechPool(
+        idle_ttl_sec=1,
+        refresh_margin_sec=0,
+        resource_id="resource",
+        size=size,
+    )
+    pool._token = AccessToken("dummy", int(time.time()) + 3600)  # Skip the AAD auth
+    key = ("tts", "en-US")
+
+    try:
+        # Fill
+        await pool.fill(key, _factory)  # pyright: ignore
+        assume(len(created) == size)
+        assume(
+            all(
+                client.authorization_token == "aad#resource#dummy" for client in created
+            )
+        )
+        assume(
+            all(pool._connections[client].opened for client in created)  # pyright: ignore
+        )
+
+        # Acquire a warm client, then refill
+        client = await pool.acquire(key, _factory)  # pyright: ignore
+        assume(client is created[1])  # Most recently used first
+        await asyncio.sleep(0)
+        assume(len(created) == size + 1)
+        assume(len(pool._idle[key]) == size)
+
+        # Release, bounded by size
+        pool.release(key, client, reusable=True)  # pyright: ignore
+        assume(len(pool._idle[key]) == size)
+        other = await pool.acquire(key, _factory)  # pyright: ignore
+        pool.release(key, other, reusable=False)  # pyright: ignore
+        assume(other not in [client for _, client in pool._idle[key]])
+
+        # Expire the idle clients
+        await asyncio.sleep(1.1)
+        assume(pool._pop(key) is None)
+
+    finally:
+        if pool._refresh_task:
+            pool._refresh_task.cancel()
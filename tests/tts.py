@@ -0,0 +1,380 @@
+import math
+import random
+import time
+
+import pytest
+from aiojobs import Scheduler
+from pytest_assume.plugin import assume
+
+from app.helpers import call_utils
+from app.helpers.call_utils import SentenceSegmenter, TtsStream, tts_sentence_split
+from app.helpers.config import CONFIG
+from app.helpers.logging import logger
+from app.helpers.media import PlayoutMark
+from app.helpers.tts_scheduler import TtsLaneEnum, TtsScheduler
+from app.models.call import CallInitiateModel, CallStateModel
+from app.models.message import (
+    PersonaEnum as MessagePersonaEnum,
+    StyleEnum,
+    extract_message_style,
+)
+from tests.conftest import StoreMock
+
+
+class InputStreamMock:
+    """
+    Text input of a synthesis request, recording the text written.
+    """
+
+    closed: bool
+    texts: list[str]
+
+    def __init__(self) -> None:
+        self.closed = False
+        self.texts = []
+
+    def write(self, text: str) -> None:
+        assert not self.closed, "Text written after the request was closed"
+        self.texts.append(text)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class SpeechSynthesisRequestMock:
+    """
+    Text streaming synthesis request, without the Speech SDK.
+    """
+
+    input_stream: InputStreamMock
+
+    def __init__(self, *args, **kwargs) -> None:  # noqa: ARG002
+        self.input_stream = InputStreamMock()
+
+
+class SpeechSynthesizerTextMock:
+    """
+    Text-to-speech client recording the requests, in order, without the Speech SDK.
+    """
+
+    requests: list[SpeechSynthesisRequestMock | str]
+
+    def __init__(self) -> None:
+        self.requests = []
+
+    def speak_async(self, request: SpeechSynthesisRequestMock) -> None:
+        self.requests.append(request)
+
+    def speak_ssml_async(self, ssml: str) -> None:
+        self.requests.append(ssml)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_tts_stream(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test the LLM answer is streamed word by word, and styled sentences are spoken with SSML, in order.
+
+    Steps:
+    1. Feed an answer mixing sentences with and without style, token by token
+    2. Check the words are streamed before the end of the first sentence
+    3. Check the styled sentence closes the stream, is spoken with its style, and a new stream follows
+    4. Check each sentence is stored with its style
+    """
+    monkeypatch.setattr(
+        call_utils, "SpeechSynthesisRequest", SpeechSynthesisRequestMock
+    )
+    monkeypatch.setattr(call_utils, "_db", StoreMock())
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number="+33612345678",  # pyright: ignore
+        ),
+        voice_id="dummy",
+    )
+    tts_client = SpeechSynthesizerTextMock()
+    tokens = [
+        "sty",
+        "le=none",
+        " I under",
+        "stand,",
+        " you",
+        " moved. ",
+        "style=cheer",
+        "ful Let me",
+        " check. style",
+        "=none One moment",
+        ", please",
+    ]
+
+    async with Scheduler() as scheduler:
+        stream = TtsStream(
+            call=call,
+            scheduler=scheduler,  # pyright: ignore
+            tts_client=tts_client,  # pyright: ignore
+        )
+
+        # Style prefix is held back, then words are streamed as they complete
+        for token in tokens[:4]:
+            await stream.write(token)
+        assume(stream.started)
+        assume(len(tts_client.requests) == 1)
+        first = tts_client.requests[0]
+        assert isinstance(first, SpeechSynthesisRequestMock)
+        assume("".join(first.input_stream.texts) == "I ")
+
+        for token in tokens[4:]:
+            await stream.write(token)
+        await stream.flush()
+
+    # Requests are sent in the answer order, the styled sentence as SSML
+    assume(
+        [isinstance(request, str) for request in tts_client.requests]
+        == [False, True, False]
+    )
+    first, styled, last = tts_client.requests
+    assert isinstance(first, SpeechSynthesisRequestMock)
+    assert isinstance(styled, str)
+    assert isinstance(last, SpeechSynthesisRequestMock)
+    assume("".join(first.input_stream.texts) == "I understand, you moved.")
+    assume(first.input_stream.closed)
+    assume('style="cheerful"' in styled and "Let me check." in styled)
+    assume("".join(last.input_stream.texts) == "One moment, please")
+    assume(last.input_stream.closed)
+
+    # Sentences are stored with their style
+    messages = [
+        (message.style, message.content)
+        for message in call.messages
+        if message.persona == MessagePersonaEnum.ASSISTANT
+    ]
+    assume(
+        messages
+        == [
+            (StyleEnum.NONE, "I understand, you moved."),
+            (StyleEnum.CHEERFUL, "Let me check."),
+            (StyleEnum.NONE, "One moment, please"),
+        ]
+    )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_tts_stream_sentences(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test the streamed answer is split into sentences with the same rules as the sentence mode.
+
+    Steps:
+    1. Feed numbers and abbreviations, token by token
+    2. Check they do not end the sentence, and the sentences share a single request
+    3. Feed a sentence without punctuation longer than the TTS limit, check it is stored in pieces within the limit
+    """
+    monkeypatch.setattr(
+        call_utils, "SpeechSynthesisRequest", SpeechSynthesisRequestMock
+    )
+    monkeypatch.setattr(call_utils, "_db", StoreMock())
+    call = CallStateModel(
+        initiate=CallInitiateModel(
+            **CONFIG.conversation.initiate.model_dump(),
+            phone_number="+33612345678",  # pyright: ignore
+        ),
+        voice_id="dummy",
+    )
+    tts_client = SpeechSynthesizerTextMock()
+    limit = call_utils._MAX_CHARACTERS_PER_TTS
+    words = 200
+    tokens = ["The rate is 3", ".5% today. Ask Mr", ". Smith. ", *(["word "] * words)]
+
+    async with Scheduler() as scheduler:
+        stream = TtsStream(
+            call=call,
+            scheduler=scheduler,  # pyright: ignore
+            tts_client=tts_client,  # pyright: ignore
+        )
+        for token in tokens:
+            await stream.write(token)
+        await stream.flush()
+
+    # Sentences are streamed in a single request
+    assume(len(tts_client.requests) == 1)
+    request = tts_client.requests[0]
+    assert isinstance(request, SpeechSynthesisRequestMock)
+    assume(
+        "".join(request.input_stream.texts).startswith(
+            "The rate is 3.5% today. Ask Mr. Smith. word word"
+        )
+    )
+
+    # Sentences are stored, the long one in pieces
+    messages = [
+        message.content
+        for message in call.messages
+        if message.persona == MessagePersonaEnum.ASSISTANT
+    ]
+    assume(messages[:2] == ["The rate is 3.5% today.", "Ask Mr. Smith."])
+    assume(len(messages[2:]) == math.ceil(words * len("word ") / limit))
+    assume(all(len(message) <= limit for message in messages[2:]))
+    assume(" ".join(messages[2:]) == " ".join(["word"] * words))
+
+
+def _segment(tokens: list[str]) -> list[tuple[StyleEnum, str]]:
+    """
+    Run the tokens through the segmenter, then flush it.
+    """
+    segmenter = SentenceSegmenter()
+    segments = []
+    for token in tokens:
+        segments += segmenter.write(token)
+    return segments + segmenter.flush()
+
+
+def test_sentence_segmenter() -> None:
+    """
+    Test the answer is split into sentences with their style, whatever the token boundaries.
+
+    Steps:
+    1. Feed a style prefix spanning several tokens, check it is parsed
+    2. Feed numbers and abbreviations, check they do not end the sentence
+    3. Feed a sentence without punctuation longer than the TTS limit, check it is cut on a whitespace
+    """
+    # Style prefix across tokens
+    assume(
+        _segment(
+            ["sty", "le=cheer", "ful Hel", "lo! How", " are you?", " style=none Bye"]
+        )
+        == [
+            (StyleEnum.CHEERFUL, "Hello!"),
+            (StyleEnum.NONE, "How are you?"),
+            (StyleEnum.NONE, "Bye"),
+        ]
+    )
+
+    # Numbers and abbreviations
+    assume(
+        _segment(["The rate is 3", ".5% today. Ask Mr", ". Smith, e.g", ". now. Bye"])
+        == [
+            (StyleEnum.NONE, "The rate is 3.5% today."),
+            (StyleEnum.NONE, "Ask Mr. Smith, e.g. now."),
+            (StyleEnum.NONE, "Bye"),
+        ]
+    )
+
+    # Sentence above the TTS limit
+    limit = call_utils._MAX_CHARACTERS_PER_TTS
+    words = 200
+    segments = _segment(["word "] * words)
+    assume(len(segments) == math.ceil(words * len("word ") / limit))
+    assume(all(len(sentence) <= limit for _, sentence in segments))
+    assume(all(sentence.endswith("word") for _, sentence in segments))
+
+
+def test_sentence_segmenter_benchmark() -> None:
+    """
+    Benchmark the CPU cost per token of the sentence split, against the split of the whole unflushed text on each token.
+
+    Steps:
+    1. Generate an answer of 40 sentences, with and without style, in 4 characters tokens
+    2. Split it with both paths
+    3. Check the sentences are the same, and compare the CPU time per token
+
+    The segmenter scans each character once, it should be cheaper than splitting the text again on each token.
+    """
+    rand = random.Random(0)
+    words = (
+        "I understand you moved to a new address and want to update the contract"
+    ).split()
+    text = " ".join(
+        ("style=none " if i % 3 == 0 else "")
+        + " ".join(rand.choice(words) for _ in range(rand.randint(8, 30)))
+        + rand.choice([".", "!", "?"])
+        for i in range(40)
+    )
+    tokens = [text[i : i + 4] for i in range(0, len(text), 4)]
+    rounds = 20
+
+    def _split() -> list[tuple[StyleEnum, str]]:
+        content_full = ""
+        pointer = 0
+        segments = []
+        for token in tokens:
+            content_full += token
+            for sentence, length in tts_sentence_split(content_full[pointer:], False):
+                pointer += length
+                segments.append(extract_message_style(sentence))
+        if pointer < len(content_full):
+            segments.append(extract_message_style(content_full[pointer:]))
+        return segments
+
+    costs = {}
+    results = {}
+    for name, fn in {
+        "split": _split,
+        "segmenter": lambda: _segment(tokens),
+    }.items():
+        start = time.process_time()
+        for _ in range(rounds):
+            results[name] = fn()
+        costs[name] = (time.process_time() - start) / rounds / len(tokens)
+        logger.info("CPU per token for %s: %.2f µs", name, costs[name] * 1e6)
+
+    assume(
+        [sentence for _, sentence in results["segmenter"]]
+        == [sentence for _, sentence in results["split"]]
+    )
+    assume(costs["segmenter"] < costs["split"])
+
+
+def test_tts_scheduler() -> None:
+    """
+    Test the requests are sent in order, by priority, within the in-flight limit, and a turn can be cancelled alone.
+
+    Steps:
+    1. Queue LLM sentences of a turn, then a system prompt, check only the in-flight limit is sent
+    2. Complete the requests, check the system prompt goes before the sentences left, in FIFO
+    3. Queue the sentences of the next turn and a prompt out of any turn, cancel the turn
+    4. Check the turn is dropped with its marks resolved, and the prompt is kept
+    """
+    sent: list[str] = []
+    max_in_flight = 2
+    scheduler = TtsScheduler(max_in_flight=max_in_flight)
+
+    def _submit(
+        name: str,
+        lane: TtsLaneEnum = TtsLaneEnum.CONTENT,
+        mark: PlayoutMark | None = None,
+        turn: str | None = None,
+    ) -> None:
+        scheduler.submit(
+            lane=lane,
+            mark=mark,
+            speak=lambda: sent.append(name),
+            turn=turn,
+        )
+
+    # In-flight limit
+    for i in range(3):
+        _submit(f"a{i}", turn="a")
+    _submit("timeout", lane=TtsLaneEnum.SYSTEM, turn="a")
+    assume(sent == ["a0", "a1"])
+
+    # Priority, then FIFO
+    scheduler.done()
+    assume(sent == ["a0", "a1", "timeout"])
+    scheduler.done()
+    assume(sent == ["a0", "a1", "timeout", "a2"])
+    scheduler.done()
+    scheduler.done()
+    assume(scheduler.idle)
+
+    # Cancel a turn, the other requests are kept
+    marks = [PlayoutMark() for _ in range(4)]
+    for i, mark in enumerate(marks):
+        _submit(f"b{i}", mark=mark, turn="b")
+    _submit("silence", lane=TtsLaneEnum.SYSTEM)
+    assume(scheduler.cancel("b") == len(marks) - max_in_flight)
+    # Sent already, the marks are resolved by the playout
+    assume(all(mark.played_at is None for mark in marks[:max_in_flight]))
+    assume(all(mark.played_at is not None for mark in marks[max_in_flight:]))
+    scheduler.done()
+    scheduler.done()
+    assume(sent[-3:] == ["b0", "b1", "silence"])
+    scheduler.done()
+    assume(scheduler.idle)
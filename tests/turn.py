@@ -0,0 +1,324 @@
+import asyncio
+import time
+
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.config import CONFIG
+from app.helpers.timer import TimerWheel
+from app.helpers.turn import AnswerSupervisor, TurnStateEnum, TurnTaking
+from app.models.call import CallInitiateModel, CallStateModel
+from tests.conftest import ClockMock
+
+_ANSWER_LATENCY_MAX_SEC = 0.02
+_CUTOFF_MS = 200
+_FRAME_SEC = 0.02
+_PHONE_SILENCE_SEC = 5
+_SILENCE_MS = 500
+
+
+class TurnMock:
+    """
+    Turn-taking fed with synthetic frames, on a manually driven wheel.
+    """
+
+    calls: list[tuple[str, float]]
+    clock: ClockMock
+    turn: TurnTaking
+    wheel: TimerWheel
+
+    def __init__(self):
+        self.calls = []
+        self.clock = ClockMock()
+        self.wheel = TimerWheel(
+            clock=self.clock,
+            slots=64,
+            tick_ms=10,
+        )
+        call = CallStateModel(
+            initiate=CallInitiateModel(
+                **CONFIG.conversation.initiate.model_dump(),
+                phone_number="+33612345678",  # pyright: ignore
+            ),
+            in_progress=True,
+            voice_id="dummy",
+        )
+
+        def _callback(name: str):
+            async def wrapper() -> None:
+                self.calls.append((name, self.clock.now))
+
+            return wrapper
+
+        self.turn = TurnTaking(
+            call=call,
+            cutoff_ms=_CUTOFF_MS,
+            phone_silence_sec=_PHONE_SILENCE_SEC,
+            response_callback=_callback("response"),
+            silence_ms=_SILENCE_MS,
+            stop_callback=_callback("stop"),
+            timeout_callback=_callback("timeout"),
+            wheel=self.wheel,
+        )
+
+    async def feed(self, pattern: str) -> None:
+        """
+        Feed one frame per character, "s" for speech and "." for silence, then advance the clock by a frame.
+        """
+        for char in pattern:
+            self.turn.on_frame(
+                is_speech=char == "s",
+                now=self.clock.now,
+            )
+            self.clock.now = round(self.clock.now + _FRAME_SEC, 6)
+            self.wheel.advance(self.clock.now)
+            # Let the callbacks run
+            await asyncio.sleep(0)
+
+    def names(self) -> list[str]:
+        return [name for name, _ in self.calls]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_turn_answer() -> None:
+    """
+    Test an utterance followed by a silence stops the bot, then triggers the answer.
+
+    Steps:
+    1. Feed 100 ms of speech
+    2. Feed 600 ms of silence
+    3. Check the bot is stopped after the cutoff timeout, and the answer is triggered once, after the silence timeout
+    """
+    mock = TurnMock()
+    await mock.feed("s" * 5)
+    assume(mock.turn.state == TurnStateEnum.SPEECH)
+
+    await mock.feed("." * 30)
+    assume(mock.names() == ["stop", "response"])
+    assume(mock.calls[0][1] == pytest.approx(_CUTOFF_MS / 1000, abs=0.02))
+    assume(mock.calls[1][1] == pytest.approx(0.1 + _SILENCE_MS / 1000, abs=0.02))
+    assume(mock.turn.state == TurnStateEnum.ANSWERED)
+    assume(len(mock.wheel) == 1)  # Only the phone silence timeout
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_turn_cutoff() -> None:
+    """
+    Test a long utterance stops the bot once, and the pauses between words do not end the turn.
+
+    Steps:
+    1. Feed 1 s of speech, with pauses shorter than the silence timeout
+    2. Check the bot is stopped once, after the cutoff timeout, and no answer is triggered
+    3. Feed a silence, check the answer is triggered
+    4. Speak again, check a new cutoff is armed for the new turn
+    """
+    mock = TurnMock()
+    await mock.feed(("s" * 15 + "." * 10) * 2)
+    assume(mock.names() == ["stop"])
+    assume(mock.calls[0][1] == pytest.approx(_CUTOFF_MS / 1000, abs=0.02))
+
+    await mock.feed("." * 30)
+    assume(mock.names() == ["stop", "response"])
+
+    await mock.feed("s" * 15)
+    assume(mock.names() == ["stop", "response", "stop"])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_turn_resumed_speech() -> None:
+    """
+    Test the answer is abandoned when the user speaks again before the recognition is committed.
+
+    Steps:
+    1. Feed an utterance and a silence, the answer waits for the recognition
+    2. Speak again, check the answer is cancelled before its commit
+    3. Feed a silence, check the next answer is committed
+    """
+    mock = TurnMock()
+    recognition = asyncio.Event()
+
+    async def _response() -> None:
+        mock.calls.append(("response", mock.clock.now))
+        await recognition.wait()
+        mock.calls.append(("commit", mock.clock.now))
+
+    mock.turn._response_callback = _response
+    await mock.feed("s" * 5 + "." * 30)
+    assume(mock.names() == ["stop", "response"])
+
+    await mock.feed("s" * 5)
+    recognition.set()
+    await asyncio.sleep(0)
+    assume(mock.names() == ["stop", "response"])
+    assume(mock.turn.state == TurnStateEnum.SPEECH)
+
+    await mock.feed("." * 30)
+    await asyncio.sleep(0)
+    assume(mock.names() == ["stop", "response", "stop", "response", "commit"])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_turn_phone_silence() -> None:
+    """
+    Test the phone silence timeout repeats while the user stays silent, and is cancelled by speech.
+
+    Steps:
+    1. Feed a silence of 2 phone silence timeouts, after the answer
+    2. Check the timeout is triggered twice
+    3. Speak, then stay silent shorter than the timeout, check a new turn and no new timeout
+    """
+    mock = TurnMock()
+    frames = int((2 * _PHONE_SILENCE_SEC + _SILENCE_MS / 1000) / _FRAME_SEC) + 5
+    await mock.feed("." * frames)
+    assume(mock.names() == ["response", "timeout", "timeout"])
+
+    await mock.feed("s" * 5)
+    await mock.feed("." * int(_PHONE_SILENCE_SEC / 2 / _FRAME_SEC))
+    assume(mock.names() == ["response", "timeout", "timeout", "stop", "response"])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_turn_close() -> None:
+    """
+    Test closing the state machine cancels its timers.
+
+    Steps:
+    1. Feed speech then a short silence, arming the cutoff and the silence timeouts
+    2. Close, check the wheel is empty and no callback is triggered later
+    """
+    mock = TurnMock()
+    timers = 2  # Cutoff and silence timeouts
+    await mock.feed("s" * 3 + "." * 3)
+    assume(len(mock.wheel) == timers)
+
+    mock.turn.close()
+    assume(len(mock.wheel) == 0)
+    mock.wheel.advance(mock.clock.now + 60)
+    await asyncio.sleep(0)
+    assume(mock.calls == [])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_timer_wheel() -> None:
+    """
+    Test the wheel fires the timers in order of deadline, never early, including beyond a full turn.
+
+    Steps:
+    1. Schedule timers within and beyond a turn of the wheel, cancel one
+    2. Advance the clock by steps, and at once over several turns
+    3. Check the firing order and times
+    """
+    clock = ClockMock()
+    wheel = TimerWheel(
+        clock=clock,
+        slots=8,
+        tick_ms=10,
+    )
+    fired: list[tuple[str, float]] = []
+
+    def _timer(name: str):
+        return lambda: fired.append((name, clock.now))
+
+    wheel.schedule(deadline=0.035, callback=_timer("a"))
+    wheel.schedule(deadline=0.025, callback=_timer("b"))
+    wheel.schedule(deadline=0.105, callback=_timer("c"))  # Beyond a turn
+    wheel.schedule(deadline=0.5, callback=_timer("d")).cancel()
+    wheel.schedule(deadline=2, callback=_timer("e"))  # Several turns
+
+    for step in range(1, 12):
+        clock.now = step / 100
+        wheel.advance(clock.now)
+    assume(fired == [("b", 0.03), ("a", 0.04), ("c", 0.11)])
+
+    clock.now = 3
+    wheel.advance(clock.now)
+    assume([name for name, _ in fired] == ["b", "a", "c", "e"])
+    assume(len(wheel) == 0)
+
+
+class AnswerSupervisorMock:
+    """
+    Answer supervisor with short timeouts, recording its callbacks.
+    """
+
+    calls: list[str]
+    speaking: bool
+    supervisor: AnswerSupervisor
+
+    def __init__(self):
+        self.calls = []
+        self.speaking = False
+
+        async def _soft_timeout() -> None:
+            self.calls.append("soft_timeout")
+
+        self.supervisor = AnswerSupervisor(
+            hard_timeout_sec=0.5,
+            loading_callback=lambda: self.calls.append("loading"),
+            loading_sec=0.1,
+            soft_timeout_callback=_soft_timeout,
+            soft_timeout_sec=0.25,
+            speaking=lambda: self.speaking,
+        )
+
+
+@pytest.mark.parametrize(
+    "answer_sec",
+    [
+        pytest.param(
+            0.05,
+            id="before_loading",
+        ),
+        pytest.param(
+            0.33,
+            id="after_soft_timeout",
+        ),
+    ],
+)
+@pytest.mark.asyncio(loop_scope="session")
+async def test_answer_latency(answer_sec: float) -> None:
+    """
+    Test the turn ends as soon as the answer is done, whatever the timeouts and the loading sound did in the meantime.
+
+    Steps:
+    1. Answer after a delay, with the bot silent
+    2. Check the supervisor returns at once after the answer, not on a polling interval
+    """
+    mock = AnswerSupervisorMock()
+    done_at = 0.0
+
+    async def _answer() -> None:
+        nonlocal done_at
+        await asyncio.sleep(answer_sec)
+        done_at = time.monotonic()
+
+    answer = asyncio.create_task(_answer())
+    done = await mock.supervisor.wait(answer)
+    # Measured before the assumptions, each one inspects the stack
+    latency = time.monotonic() - done_at
+    assume(done)
+    assume(latency < _ANSWER_LATENCY_MAX_SEC)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_answer_timeouts() -> None:
+    """
+    Test the loading sound loops and the soft timeout is spoken once while the bot is silent, until the hard timeout.
+
+    Steps:
+    1. Never answer, with the bot silent
+    2. Check the loading sound ticks, and the timeout prompt is spoken once
+    3. Check the hard timeout abandons the answer, without cancelling it
+    4. Never answer, with the bot speaking, check nor loading nor timeout prompt is played
+    """
+    mock = AnswerSupervisorMock()
+    answer = asyncio.get_running_loop().create_future()
+    assume(not await mock.supervisor.wait(answer))
+    assume(mock.calls == ["loading", "loading", "soft_timeout", "loading", "loading"])
+    assume(not answer.cancelled())
+
+    mock = AnswerSupervisorMock()
+    mock.speaking = True
+    assume(not await mock.supervisor.wait(answer))
+    assume(mock.calls == [])
+    answer.cancel()
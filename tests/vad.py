@@ -0,0 +1,207 @@
+import time
+
+import numpy as np
+import pytest
+from pytest_assume.plugin import assume
+
+from app.helpers.config import CONFIG
+from app.helpers.logging import logger
+
+_FRAME_SIZE = 320  # 20 ms at 16 kHz
+_SAMPLE_RATE = 16000
+_MAX_CPU_PER_FRAME_SEC = 0.05 * _FRAME_SIZE / _SAMPLE_RATE  # 5% of the frame duration
+_MAX_FALSE_POSITIVES = 0.05  # False barge-ins
+_MIN_ACCURACY = 0.9
+
+
+def _speech(samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Generate a speech-like signal, of unit RMS.
+
+    Voiced syllables are harmonic series with a drifting pitch, separated by short pauses.
+    """
+    t = np.arange(samples) / _SAMPLE_RATE
+    # Pitch drifts around 150 Hz, as an intonation
+    pitch = 150 + 30 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(pitch) / _SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 20))
+    # Syllables of 150 to 300 ms, separated by pauses of 30 to 100 ms
+    envelope = np.zeros(samples)
+    cursor = 0
+    while cursor < samples:
+        length = int(rng.uniform(0.15, 0.3) * _SAMPLE_RATE)
+        envelope[cursor : cursor + length] = np.hanning(length)[: samples - cursor]
+        cursor += length + int(rng.uniform(0.03, 0.1) * _SAMPLE_RATE)
+    speech = voice * envelope
+    return speech / np.sqrt(np.mean(speech**2))
+
+
+def _labelled_scenario(
+    noise: str,
+    noise_rms: float,
+    speech_rms: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Generate a labelled phone line, alternating silences and utterances, over a background noise.
+
+    Returns a tuple with the frames, as a 2D array, the expected speech label of each frame, and the frames to score. The end of each utterance is followed by an unscored collar, as long as the hangover.
+    """
+    rng = np.random.default_rng(42)
+    # Silence, utterance, silence, utterance...
+    durations_sec = [1.5, 1.2, 1, 2, 0.8, 0.6, 1.5]
+    samples = int(sum(durations_sec) * _SAMPLE_RATE)
+    signal = np.zeros(samples)
+    labels = np.zeros(samples // _FRAME_SIZE, dtype=bool)
+    scored = np.ones(samples // _FRAME_SIZE, dtype=bool)
+    collar = CONFIG.audio.vad.hangover_ms * _SAMPLE_RATE // 1000 // _FRAME_SIZE
+    cursor = 0
+    for i, duration_sec in enumerate(durations_sec):
+        length = int(duration_sec * _SAMPLE_RATE)
+        if i % 2:
+            signal[cursor : cursor + length] = _speech(length, rng) * speech_rms
+            labels[cursor // _FRAME_SIZE : (cursor + length) // _FRAME_SIZE] = True
+            end = (cursor + length) // _FRAME_SIZE
+            scored[end : end + collar] = False
+        cursor += length
+
+    # Background noise, of the line
+    white = rng.standard_normal(samples)
+    if noise == "white":
+        background = white
+    elif noise == "hum":
+        # Brown noise, low-frequency rumble of a car or a fan
+        background = np.cumsum(white)
+        background -= np.convolve(background, np.ones(400) / 400, mode="same")
+    else:
+        raise ValueError(f"Unknown noise {noise}")
+    background *= noise_rms / np.sqrt(np.mean(background**2))
+    signal += background
+
+    frames = signal[: len(labels) * _FRAME_SIZE].reshape(-1, _FRAME_SIZE)
+    return frames.astype(np.float32), labels, scored
+
+
+def _fixed_threshold(frames: np.ndarray) -> np.ndarray:
+    """
+    Previous implementation, RMS compared to the default fixed threshold.
+    """
+    return np.sqrt(np.mean(frames**2, axis=1)) >= 0.5 / 10
+
+
+def _adaptive(frames: np.ndarray) -> np.ndarray:
+    """
+    VAD engine implementation, frame by frame as in real-time.
+    """
+    vad = CONFIG.audio.vad.instance(
+        frame_size=_FRAME_SIZE,
+        sample_rate=_SAMPLE_RATE,
+    )
+    return np.array([vad.process(frame[np.newaxis], snr_db=10)[0] for frame in frames])
+
+
+@pytest.mark.parametrize(
+    "noise, noise_rms, speech_rms",
+    [
+        pytest.param(
+            "white",
+            0.001,
+            0.03,
+            id="quiet_line",
+        ),
+        pytest.param(
+            "white",
+            0.003,
+            0.1,
+            id="clean_line",
+        ),
+        pytest.param(
+            "white",
+            0.06,
+            0.3,
+            id="noisy_line",
+        ),
+        pytest.param(
+            "hum",
+            0.08,
+            0.3,
+            id="hum_line",
+        ),
+    ],
+)
+def test_vad_benchmark(
+    noise: str,
+    noise_rms: float,
+    speech_rms: float,
+) -> None:
+    """
+    Benchmark the accuracy and the CPU cost of the VAD, on labelled phone lines.
+
+    Steps:
+    1. Generate a line with known utterances, over a background noise
+    2. Detect the speech with the fixed threshold, as before
+    3. Detect the speech with the VAD engine, frame by frame
+    4. Compare the frame accuracies, and measure the CPU time per frame
+    """
+    frames, labels, scored = _labelled_scenario(
+        noise=noise,
+        noise_rms=noise_rms,
+        speech_rms=speech_rms,
+    )
+    before = np.mean((_fixed_threshold(frames) == labels)[scored])
+
+    start = time.process_time()
+    detected = _adaptive(frames)
+    cpu_per_frame = (time.process_time() - start) / len(frames)
+    after = np.mean((detected == labels)[scored])
+    false_positives = np.mean(detected[~labels & scored])
+
+    logger.info(
+        "VAD accuracy, %s noise at %.3f RMS: %.1f%% before, %.1f%% after (%.1f%% false speech), %.0f µs CPU per frame",
+        noise,
+        noise_rms,
+        before * 100,
+        after * 100,
+        false_positives * 100,
+        cpu_per_frame * 1e6,
+    )
+    assume(after >= _MIN_ACCURACY)
+    assume(after >= before)
+    assume(false_positives <= _MAX_FALSE_POSITIVES)
+    assume(cpu_per_frame < _MAX_CPU_PER_FRAME_SEC)
+
+
+def test_vad_batch() -> None:
+    """
+    Test a batch gives the same decisions as the frames processed one at a time.
+
+    Steps:
+    1. Run the VAD frame by frame
+    2. Run another VAD by batches of 7 frames
+    3. Compare the decisions and the noise floors
+    """
+    frames, _, _ = _labelled_scenario(
+        noise="white",
+        noise_rms=0.01,
+        speech_rms=0.1,
+    )
+    single = CONFIG.audio.vad.instance(
+        frame_size=_FRAME_SIZE,
+        sample_rate=_SAMPLE_RATE,
+    )
+    batched = CONFIG.audio.vad.instance(
+        frame_size=_FRAME_SIZE,
+        sample_rate=_SAMPLE_RATE,
+    )
+
+    expected = np.array(
+        [single.process(frame[np.newaxis], snr_db=10)[0] for frame in frames]
+    )
+    actual = np.concatenate(
+        [
+            batched.process(frames[i : i + 7], snr_db=10)
+            for i in range(0, len(frames), 7)
+        ]
+    )
+
+    assume(np.array_equal(expected, actual))
+    assume(single.noise_floor_db == pytest.approx(batched.noise_floor_db))